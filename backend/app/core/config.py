@@ -1,13 +1,120 @@
+import os
 from pydantic_settings import BaseSettings
 from typing import Optional
 
 class Settings(BaseSettings):
     openai_api_key: str
+    openai_base_url: Optional[str] = None
     environment: str = "development"
     cors_origins: list[str] = ["http://localhost:3000"]
 
+    # Shared HTTP connection pool used by the OpenAI client
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    llm_keepalive_expiry: float = 60.0
+    llm_http2: bool = True
+    llm_timeout: float = 60.0
+    llm_warmup: bool = True
+    # Outbound LLM scheduler: concurrency ceiling and bounded wait queue, a
+    # deadline per call (queueing and retries included), jittered retries and
+    # a circuit breaker that fails fast to degraded responses
+    llm_max_concurrency: int = 32
+    llm_max_queue: int = 200
+    llm_deadline_seconds: float = 30.0
+    llm_max_retries: int = 2
+    llm_retry_base_seconds: float = 0.25
+    llm_retry_max_seconds: float = 4.0
+    llm_breaker_failures: int = 5
+    llm_breaker_cooldown_seconds: float = 30.0
+    # Per-call-site overrides of the model routes, e.g. {"question": {"model": "gpt-4o-mini", "slo_seconds": 2}};
+    # hedged calls send a duplicate once they pass their call site's p95 (capped at the SLO)
+    llm_routes: dict[str, dict] = {}
+    llm_hedging: bool = True
+    llm_hedge_min_samples: int = 20
+
+    # Session storage: "memory" (single worker) or "sqlite" (shared across workers)
+    session_backend: str = "memory"
+    session_db_path: str = "sessions.db"
+    # Idle sessions expire after the TTL; the in-memory cache also evicts
+    # least-recently-used sessions beyond the entry and byte ceilings
+    session_ttl_seconds: float = 3600.0
+    session_max_entries: int = 10000
+    session_max_bytes: int = 64 * 1024 * 1024
+    session_history_limit: int = 10
+    session_max_answer_chars: int = 2000
+
+    # Local answer classifiers decide on their own at or above this confidence
+    nlu_confidence_threshold: float = 0.75
+    # Generate the next question while the LLM validates the previous answer
+    speculative_validation: bool = True
+    # Token budget for the Q/A history in prompts; older pairs are compacted beyond it
+    prompt_history_token_budget: int = 600
+
+    # Cache of generated questions/conclusions keyed on normalized session context
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 5000
+    response_cache_ttl_seconds: float = 24 * 3600.0
+    response_cache_disk_path: Optional[str] = None
+
+    # JSON decision table for reboot recommendations; built-in rules when unset
+    reboot_rules_path: Optional[str] = None
+    # JSON follow-up question bank for fast mode and LLM outages; built-in bank when unset
+    question_bank_path: Optional[str] = None
+
+    # Backend-hosted throughput test: one random buffer served as zero-copy slices
+    speedtest_buffer_bytes: int = 4 * 1024 * 1024
+    speedtest_chunk_bytes: int = 256 * 1024
+    speedtest_max_bytes: int = 256 * 1024 * 1024
+    speedtest_result_ttl_seconds: float = 300.0
+
+    # WebSocket RTT/jitter/loss probe: frames per run, spacing and wait for late echoes
+    probe_count: int = 50
+    probe_max_count: int = 500
+    probe_interval_ms: float = 20.0
+    probe_grace_seconds: float = 1.0
+
+    # Sample sets at least this large are analysed in a worker thread, off the event loop
+    analysis_offload_samples: int = 5000
+
+    # Append-only record file of finished diagnostics; disabled when unset
+    history_path: Optional[str] = None
+
+    # Results of chat turns sent with an Idempotency-Key header are replayed to
+    # retries for this long
+    idempotency_ttl_seconds: float = 300.0
+    idempotency_max_entries: int = 10000
+
+    # Logging: JSON lines (or "text") written by a background thread through a
+    # bounded queue; records marked as sampled are kept for this share of sessions
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_queue_size: int = 10000
+    log_session_sample_rate: float = 0.1
+
+    # WebSocket chat: open connection ceiling per process, a ping after this
+    # long without traffic (keeps proxies from closing idle conversations),
+    # closing after this long without client frames, how long a send may wait
+    # on a slow client, and the largest accepted client frame
+    ws_max_connections: int = 20000
+    ws_heartbeat_seconds: float = 25.0
+    ws_idle_timeout_seconds: float = 1800.0
+    ws_send_timeout_seconds: float = 10.0
+    ws_max_message_bytes: int = 1024 * 1024
+
+    # Bulk diagnosis (POST /api/v1/diagnose/batch and python -m app.diagnose):
+    # rows in flight at once by default and at most, and the longest accepted line
+    batch_concurrency: int = 8
+    batch_max_concurrency: int = 64
+    batch_max_line_bytes: int = 1024 * 1024
+
+    # Optional shared secret for /api/v1/admin endpoints (sent as X-Admin-Token)
+    admin_token: Optional[str] = None
+
+    # Set by app/serverless.py: configuration comes from the environment only
+    serverless: bool = False
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
-
+# Serverless containers get their configuration from the platform; skip the .env lookup
+settings = Settings(_env_file=None) if os.environ.get("SERVERLESS", "").lower() in ("1", "true") else Settings()
@@ -0,0 +1,65 @@
+# fastjson.py
+"""JSON in and out of the chat routes without FastAPI's Python-level passes.
+
+By default FastAPI parses a body with json.loads and validates the
+resulting dicts, and encodes a response by validating it against the
+response model again before json.dumps. `json_body` validates the request
+straight from its bytes in pydantic-core, and `FastJSONResponse` renders
+models and plain data with pydantic-core's serializer. `python -m
+benchmarks.serialization` measures both against the default path.
+"""
+from typing import Any, Awaitable, Callable, TypeVar
+import pydantic_core
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by pydantic-core instead of the json module.
+
+    Takes models as well as plain data, so an endpoint can wrap its response
+    model directly and skip the response-model pass. Non-finite floats render
+    as null, keeping the output valid JSON.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content, inf_nan_mode="null")
+
+
+def json_body(model: type[M]) -> Callable[[Request], Awaitable[M]]:
+    """Dependency that validates the request body as `model` directly from its JSON bytes.
+
+    Invalid bodies raise the same 422 as a regular body parameter. Declare
+    the body for the docs with `openapi_extra=body_schema(model)`.
+    """
+    async def parse(request: Request) -> M:
+        body = await request.body()
+        try:
+            return model.model_validate_json(body)
+        except ValidationError as e:
+            errors = [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+            raise RequestValidationError(errors, body=body) from None
+
+    return parse
+
+
+def body_schema(model: type[BaseModel]) -> dict:
+    """OpenAPI request body for a route that reads `model` through `json_body`."""
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def inline(node):
+        # Nested models become inline schemas; the operation cannot point into $defs
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(item) for item in node]
+        return node
+
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": inline(schema)}}}}
@@ -0,0 +1,158 @@
+# logging_config.py
+"""Non-blocking, structured logging.
+
+Loggers hand records to a bounded queue; a background thread formats them
+as JSON lines and writes them out. A slow stdout only ever fills the queue,
+and records that do not fit are dropped and counted rather than blocking
+the event loop. Messages use %-style arguments so nothing is rendered for
+records below the configured level, and records marked
+`extra={"sampled": True}` are kept only for a stable sample of sessions.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import sys
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from app.core.config import settings
+
+# Session of the turn being handled; attached to every record logged during it
+session_id_var: contextvars.ContextVar[str | None] = contextvars.ContextVar("session_id", default=None)
+
+# Standard LogRecord attributes, plus uvicorn's ANSI-coloured duplicate of the message
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName", "color_message", "sampled"}
+_listener: "DrainingQueueListener | None" = None
+_handler: "NonBlockingQueueHandler | None" = None
+
+
+def bind_session(session_id: str | None):
+    """Tag records logged from the current task with `session_id`."""
+    session_id_var.set(session_id)
+
+
+def in_sample(session_id: str | None, rate: float) -> bool:
+    """Stable per-session decision, so a sampled session is logged from start to end."""
+    if rate >= 1.0:
+        return True
+    if session_id is None or rate <= 0.0:
+        return False
+    return zlib.crc32(session_id.encode()) / 0xFFFFFFFF < rate
+
+
+class SessionFilter(logging.Filter):
+    """Attach the bound session id and drop sampled records of unsampled sessions."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "session_id", None) is None:
+            record.session_id = session_id_var.get()
+        if getattr(record, "sampled", False):
+            return in_sample(record.session_id, self.sample_rate)
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops, and counts, records when the queue is full."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message now, while its arguments still hold their current
+        # values; JSON encoding and the write happen on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of failing."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the message, level, logger and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(stream=None) -> DrainingQueueListener:
+    """Route the root and uvicorn loggers through the background writer (idempotent)."""
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(session_id)s] %(message)s"))
+
+    _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    _handler.addFilter(SessionFilter(settings.log_session_sample_rate))
+
+    root = logging.getLogger()
+    root.setLevel(settings.log_level.upper())
+    root.addHandler(_handler)
+    # uvicorn installs its own synchronous handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = DrainingQueueListener(_handler.queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener, _handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_handler)
+    _listener = None
+    _handler = None
+
+
+def flush_logging():
+    """Block until every queued record is written, e.g. before a serverless runtime freezes the process."""
+    if _handler is not None:
+        _handler.queue.join()
+
+
+def dropped_records() -> int:
+    """Records discarded because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
@@ -2,6 +2,8 @@ import asyncio
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.models.metrics import NetworkMetrics
+from app.models.schemas import AutoTestResults
 from app.routes.chat import sessions, ChatSession, ConversationState, get_troubleshoot_service
 
 async def simulate_chat():
@@ -17,11 +19,11 @@ async def simulate_chat():
 
     # Step 2: Auto test results
     service = get_troubleshoot_service()
-    session.auto_test_results = {"speed": {"speed": 5}, "latency": 100, "connectionInfo": {"type": "wifi"}, "connectivity": {"connected": True}, "deviceType": "laptop"}
-    formatted_results = service.format_test_results(session.auto_test_results)
+    session.auto_test_results = AutoTestResults.model_validate({"speed": {"speed": 5}, "connectionInfo": {"type": "wifi"}, "connectivity": {"connected": True, "latency": 100}, "deviceType": "laptop"})
+    session.metrics = NetworkMetrics.from_test_results(session.auto_test_results)
     session.follow_up_questions.append("Is your router plugged in?")
     session.state = ConversationState.FOLLOW_UP_QUESTIONS
-    print(f"Bot: Test results: {formatted_results}")
+    print(f"Bot: Test results: {session.metrics}")
     print(f"Bot: {session.follow_up_questions[-1]}")
     print(f"State: {session.state}")
 
@@ -40,7 +42,7 @@ async def simulate_chat():
 
     # Step 5: User answers reboot question
     user_message = "Yes"
-    if service.is_issue_resolved(user_message):
+    if await service.is_issue_resolved(user_message):
         session.state = ConversationState.CONVERSATION_END
         print(f"Bot: {service.get_success_message()}")
         print(f"State: {session.state}")
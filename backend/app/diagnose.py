@@ -0,0 +1,70 @@
+# diagnose.py
+"""Diagnose a JSONL file of stored test results from the command line.
+
+Runs the same triage as POST /api/v1/diagnose/batch in-process and writes
+NDJSON results as rows finish:
+
+    python -m app.diagnose rows.jsonl -o results.ndjson --concurrency 16
+    cat rows.jsonl | python -m app.diagnose - --fast > results.ndjson
+"""
+import argparse
+import asyncio
+import sys
+from typing import AsyncIterator, BinaryIO
+from app.core.config import settings
+from app.core.logging_config import configure_logging
+from app.services.diagnosis import diagnose_lines, to_ndjson
+from app.services.troubleshoot import start_troubleshoot_service, stop_troubleshoot_service
+
+
+async def _read_lines(source: BinaryIO) -> AsyncIterator[bytes]:
+    # Local files and pipes: reading in a thread keeps the rows in flight moving
+    while line := await asyncio.to_thread(source.readline):
+        yield line
+
+
+async def run(
+    source: BinaryIO, output: BinaryIO, concurrency: int, conclusion: bool = True, fast: bool = False, service=None,
+) -> dict:
+    """Diagnose every row of `source` into `output`; returns the summary."""
+    owned = service is None
+    if owned:
+        service = await start_troubleshoot_service(warmup=not fast)
+    summary = {}
+    try:
+        async for result in diagnose_lines(_read_lines(source), service, concurrency, conclusion=conclusion, fast=fast):
+            output.write(to_ndjson(result))
+            output.flush()
+            summary = result.get("summary", summary)
+    finally:
+        if owned:
+            await stop_troubleshoot_service()
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of rows, or - for stdin")
+    parser.add_argument("-o", "--output", help="NDJSON results file (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=settings.batch_concurrency, help="rows in flight at once")
+    parser.add_argument("--no-conclusion", dest="conclusion", action="store_false", help="reboot decision only")
+    parser.add_argument("--fast", action="store_true", help="rules and offline conclusions only, no LLM calls")
+    args = parser.parse_args()
+
+    # Results go to stdout; keep the log lines out of them
+    configure_logging(sys.stderr)
+    source = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        summary = asyncio.run(run(source, output, max(1, args.concurrency), args.conclusion, args.fast))
+    finally:
+        if source is not sys.stdin.buffer:
+            source.close()
+        if output is not sys.stdout.buffer:
+            output.close()
+    print(f"{summary.get('ok', 0)} ok, {summary.get('errors', 0)} errors in {summary.get('elapsed_seconds', 0)}s", file=sys.stderr)
+    sys.exit(1 if summary.get("errors") else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import chat
+from fastapi.responses import PlainTextResponse
+from app.routes import admin, chat, chat_ws, diagnose, probe, speedtest
 from app.core.config import settings
-from dotenv import load_dotenv
-import os
+from app.core.fastjson import FastJSONResponse
+from app.core.logging_config import configure_logging
+from app.services.telemetry import registry
+from app.services.troubleshoot import (
+    get_troubleshoot_service,
+    start_troubleshoot_service,
+    stop_troubleshoot_service,
+)
 import pathlib
 
-# Load environment variables from .env file
-env_path = pathlib.Path(__file__).parent.parent / ".env"
-load_dotenv(env_path)
+if not settings.serverless:
+    # Load environment variables from .env file
+    from dotenv import load_dotenv
+
+    env_path = pathlib.Path(__file__).parent.parent / ".env"
+    load_dotenv(env_path)
+
+configure_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One long-lived service (and LLM connection pool) per process
+    app.state.troubleshoot_service = await start_troubleshoot_service(warmup=settings.llm_warmup)
+    yield
+    await stop_troubleshoot_service()
 
 
 app = FastAPI(
     title="WiFi Troubleshooting Chatbot",
     description="A chatbot to help users troubleshoot WiFi issues.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 # Configuration CORS for React frontend
@@ -28,6 +51,11 @@ app.add_middleware(
 
 # Include chat routers
 app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
+app.include_router(chat_ws.router, prefix="/api/v1", tags=["chat"])
+app.include_router(speedtest.router, prefix="/api/v1", tags=["speedtest"])
+app.include_router(probe.router, prefix="/api/v1", tags=["probe"])
+app.include_router(diagnose.router, prefix="/api/v1", tags=["diagnose"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -35,4 +63,10 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "OK"}
+    service = get_troubleshoot_service()
+    return {"status": "OK", "llm_pool": service.pool_stats(), "llm_scheduler": service.scheduler.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of request, LLM, token, cache and session metrics."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
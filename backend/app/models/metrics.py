@@ -0,0 +1,114 @@
+# metrics.py
+import asyncio
+from dataclasses import asdict, dataclass, fields
+from enum import Enum
+from typing import Any
+from app.core.config import settings
+from app.models.schemas import AutoTestResults
+
+
+# Network test results normalized once, when the frontend reports them, and
+# reused by every prompt, cache key and decision afterwards. Unknown values
+# are None rather than placeholder strings.
+@dataclass(frozen=True, slots=True)
+class NetworkMetrics:
+    connected: bool | None = None
+    speed_mbps: float | None = None
+    latency_ms: float | None = None
+    packet_loss_pct: float | None = None
+    jitter_ms: float | None = None
+    rtt_p95_ms: float | None = None
+    # Spread and drift of multi-sample runs; None when only single readings were sent
+    latency_p95_ms: float | None = None
+    latency_stddev_ms: float | None = None
+    speed_p5_mbps: float | None = None
+    speed_stddev_mbps: float | None = None
+    speed_trend_pct: float | None = None
+    outlier_samples: int | None = None
+    connection_type: str | None = None
+    device_type: str | None = None
+
+    @classmethod
+    def from_test_results(cls, results: AutoTestResults | None) -> "NetworkMetrics":
+        """Parse the frontend's auto-test payload."""
+        if results is None:
+            return cls()
+        connectivity, speed = results.connectivity, results.speed
+        # Server-measured WebSocket probe, when the client ran one
+        probe = connectivity.probe
+        latency = connectivity.latency
+        if latency is None:
+            # The speed test also reports the latency of its download
+            latency = speed.latency
+        if latency is None and probe is not None:
+            latency = probe.rtt_p50_ms
+        packet_loss = probe.loss_pct if probe is not None and probe.sent else None
+        if packet_loss is None:
+            packet_loss = connectivity.packetLoss
+        speed_mbps = speed.speed
+
+        # With raw samples, medians replace the single readings
+        samples = results.samples
+        latency_stats = speed_stats = None
+        if samples:
+            # NumPy loads with the first multi-sample run instead of at startup
+            from app.services.analysis import describe
+
+            latency_stats = describe(samples.latency_ms, samples.latency_at)
+            speed_stats = describe(samples.throughput_mbps, samples.throughput_at)
+        if latency_stats is not None:
+            latency = latency_stats.median
+        if speed_stats is not None:
+            speed_mbps = speed_stats.median
+        stats = [s for s in (latency_stats, speed_stats) if s is not None]
+
+        return cls(
+            connected=connectivity.connected,
+            speed_mbps=speed_mbps,
+            latency_ms=latency,
+            packet_loss_pct=packet_loss,
+            jitter_ms=probe.jitter_ms if probe is not None else None,
+            rtt_p95_ms=probe.rtt_p95_ms if probe is not None else None,
+            latency_p95_ms=latency_stats.p95 if latency_stats else None,
+            latency_stddev_ms=latency_stats.stddev if latency_stats else None,
+            speed_p5_mbps=speed_stats.p5 if speed_stats else None,
+            speed_stddev_mbps=speed_stats.stddev if speed_stats else None,
+            speed_trend_pct=speed_stats.trend_pct if speed_stats else None,
+            outlier_samples=sum(s.outliers for s in stats) if stats else None,
+            connection_type=_label(results.connectionInfo.type),
+            device_type=_label(results.deviceType),
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NetworkMetrics":
+        return cls(**{f.name: data.get(f.name) for f in fields(cls)})
+
+
+def sample_count(results: AutoTestResults | None) -> int:
+    samples = results.samples if results is not None else None
+    return len(samples.latency_ms) + len(samples.throughput_mbps) if samples else 0
+
+
+async def parse_test_results(results: AutoTestResults | None) -> NetworkMetrics:
+    """`NetworkMetrics.from_test_results`, run in a worker thread for large sample sets."""
+    if sample_count(results) >= settings.analysis_offload_samples:
+        return await asyncio.to_thread(NetworkMetrics.from_test_results, results)
+    return NetworkMetrics.from_test_results(results)
+
+
+def display(value: Any) -> str:
+    """Render a metric for prompts and messages: numbers without trailing zeros, None as 'unknown'."""
+    if value is None:
+        return "unknown"
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, float):
+        return f"{value:g}"
+    return str(value)
+
+
+def _label(value: Enum) -> str | None:
+    return None if value.value == "unknown" else value.value
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, List, Any
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Annotated, Optional, List
 from enum import Enum
 
 class ConversationState(str, Enum):
@@ -12,27 +12,132 @@ class ConversationState(str, Enum):
     CONVERSATION_END = "conversation_end"
 
 
-class AutoTestResults(BaseModel):
-    connectivity: Dict[str, Any] = {}
-    speed: Dict[str, Any] = {}
-    connectionInfo: Dict[str, Any] = {}
-    deviceType: Optional[str] = None
+MAX_SAMPLES = 20000
+
+
+class ConnectionType(str, Enum):
+    # Order is the on-disk code in the diagnostics history; append only
+    UNKNOWN = "unknown"
+    OTHER = "other"
+    WIFI = "wifi"
+    ETHERNET = "ethernet"
+    CELLULAR = "cellular"
+    # navigator.connection.effectiveType
+    SLOW_2G = "slow-2g"
+    G2 = "2g"
+    G3 = "3g"
+    G4 = "4g"
+    G5 = "5g"
+
+    @classmethod
+    def _missing_(cls, value):
+        return _coerce_label(cls, value)
+
+
+class DeviceType(str, Enum):
+    # Order is the on-disk code in the diagnostics history; append only
+    UNKNOWN = "unknown"
+    OTHER = "other"
+    DESKTOP = "desktop"
+    MOBILE = "mobile"
+    LAPTOP = "laptop"
+    PHONE = "phone"
+    TABLET = "tablet"
+
+    @classmethod
+    def _missing_(cls, value):
+        return _coerce_label(cls, value)
+
+
+def _coerce_label(enum, value):
+    # Case and whitespace are ignored; labels a newer client knows and we do not are OTHER
+    if not isinstance(value, str):
+        return None
+    label = value.strip().lower()
+    if not label:
+        return enum.UNKNOWN
+    return enum._value2member_map_.get(label, enum.OTHER)
+
+
+class ResultsModel(BaseModel):
+    # Test payloads: fields the backend does not read are dropped, numbers
+    # must be finite and numeric strings are accepted
+    model_config = ConfigDict(extra="ignore", allow_inf_nan=False)
+
+
+Milliseconds = Annotated[float, Field(ge=0)]
+Mbps = Annotated[float, Field(ge=0)]
+Percent = Annotated[float, Field(ge=0, le=100)]
+
+
+class ProbeResults(ResultsModel):
+    # Server-measured WebSocket probe (app/services/probe.py)
+    sent: int = Field(default=0, ge=0)
+    received: int = Field(default=0, ge=0)
+    loss_pct: Optional[Percent] = None
+    rtt_min_ms: Optional[Milliseconds] = None
+    rtt_p50_ms: Optional[Milliseconds] = None
+    rtt_p95_ms: Optional[Milliseconds] = None
+    rtt_p99_ms: Optional[Milliseconds] = None
+    rtt_max_ms: Optional[Milliseconds] = None
+    rtt_mean_ms: Optional[Milliseconds] = None
+    jitter_ms: Optional[Milliseconds] = None
+
+
+class ConnectivityResults(ResultsModel):
+    connected: Optional[bool] = None
+    latency: Optional[Milliseconds] = None
+    packetLoss: Optional[Percent] = None
+    probe: Optional[ProbeResults] = None
+    error: Optional[str] = None
+    timestamp: Optional[str] = None
+
+
+class SpeedResults(ResultsModel):
+    speed: Optional[Mbps] = None
+    # Time to the first downloaded byte
+    latency: Optional[Milliseconds] = None
+    uploadSpeed: Optional[Mbps] = None
+    streams: Optional[int] = Field(default=None, ge=0)
+    bytes: Optional[int] = Field(default=None, ge=0)
+    serverDownloadSpeed: Optional[Mbps] = None
+    serverUploadSpeed: Optional[Mbps] = None
+    error: Optional[str] = None
+    timestamp: Optional[str] = None
+
+
+class ConnectionInfo(ResultsModel):
+    # navigator.connection, when the browser has it
+    type: ConnectionType = ConnectionType.UNKNOWN
+    downlink: Optional[Mbps] = None
+    rtt: Optional[Milliseconds] = None
+
+
+class RawSamples(ResultsModel):
+    # Raw readings of one test run; *_at are timestamps in ms aligned with the values
+    latency_ms: List[float] = Field(default=[], max_length=MAX_SAMPLES)
+    latency_at: Optional[List[float]] = Field(default=None, max_length=MAX_SAMPLES)
+    throughput_mbps: List[float] = Field(default=[], max_length=MAX_SAMPLES)
+    throughput_at: Optional[List[float]] = Field(default=None, max_length=MAX_SAMPLES)
+
+class AutoTestResults(ResultsModel):
+    connectivity: ConnectivityResults = Field(default_factory=ConnectivityResults)
+    speed: SpeedResults = Field(default_factory=SpeedResults)
+    connectionInfo: ConnectionInfo = Field(default_factory=ConnectionInfo)
+    deviceType: DeviceType = DeviceType.UNKNOWN
     test_timestamp: Optional[str] = None
+    samples: Optional[RawSamples] = None
 
-class UserSymptoms(BaseModel):
-    # Auto-test results
-    auto_test_results: Optional[AutoTestResults] = None
-    # Traditional symptoms (from 5 questions)
-    can_see_network: Optional[bool] = None
-    can_connect: Optional[bool] = None
-    multiple_devices_affected: Optional[bool] = None
-    days_since_last_reboot: Optional[int] = None
-    internet_completely_down: Optional[bool] = None
-    slow_speeds: Optional[bool] = None
-    intermittent_connection: Optional[bool] = None
-    specific_websites_affected: Optional[bool] = None
-    error_messages_seen: Optional[bool] = None
-    router_lights_status: Optional[str] = None
+    @field_validator("connectivity", "speed", "connectionInfo", mode="before")
+    @classmethod
+    def _null_section(cls, value):
+        # The frontend sends null for a test it could not run
+        return {} if value is None else value
+
+    @field_validator("deviceType", mode="before")
+    @classmethod
+    def _null_device(cls, value):
+        return DeviceType.UNKNOWN if value is None else value
 
 class ChatMessage(BaseModel):
     role: str
@@ -43,17 +148,16 @@ class ChatRequest(BaseModel):
     message: str
     session_id: str
     auto_test_results: Optional[AutoTestResults] = None
+    # Opt the session in or out of fast mode (offline questions, no LLM); sticky once set
+    fast_mode: Optional[bool] = None
+
+class DiagnosisRow(BaseModel):
+    # One line of a bulk diagnosis upload; id is echoed back to match results to rows
+    id: Optional[str] = None
+    issue: str = ""
+    auto_test_results: AutoTestResults
 
 class ChatResponse(BaseModel):
     message: str
     next_question: Optional[str] = None
     is_conversation_ended: bool = False
-
-class SessionData(BaseModel):
-    session_id: str
-    state: ConversationState
-    symptoms: UserSymptoms
-    conversation_history: List[ChatMessage]
-    current_question_index: int = 0
-    question_path: str = "default"
-    user_answers: List[str] = []
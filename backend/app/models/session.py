@@ -0,0 +1,109 @@
+# session.py
+import sys
+from dataclasses import dataclass, field
+from pydantic import ValidationError
+from app.core.config import settings
+from app.models.metrics import NetworkMetrics
+from app.models.schemas import AutoTestResults, ConversationState
+
+
+# ChatSession class for session state. Slotted so each live session carries
+# no per-instance __dict__.
+@dataclass(slots=True)
+class ChatSession:
+    state: ConversationState = ConversationState.GREETING
+    issue_description: str = ""
+    auto_test_results: AutoTestResults | None = None
+    # Parsed once from auto_test_results at the RUN_AUTO_TESTS transition
+    metrics: NetworkMetrics | None = None
+    follow_up_questions: list[str] = field(default_factory=list)
+    current_question_index: int = 0
+    user_answers: list[str] = field(default_factory=list)
+    # Questions and conclusion come from the offline bank, with no LLM calls
+    fast_mode: bool = False
+    # Store revision this copy was loaded from (0: never saved); not serialized
+    version: int = 0
+
+    def record_answer(self, index: int, answer: str):
+        """Store the answer to question `index`, keeping the history bounded."""
+        answer = answer[:settings.session_max_answer_chars]
+        if index < len(self.user_answers):
+            # We already have an answer for this question, update it
+            self.user_answers[index] = answer
+        else:
+            # First time answering this question
+            self.user_answers.append(answer)
+        _trim(self.user_answers)
+
+    def record_question(self, index: int, question: str):
+        """Store follow-up question `index`, keeping the history bounded."""
+        if index < len(self.follow_up_questions):
+            self.follow_up_questions[index] = question
+        else:
+            self.follow_up_questions.append(question)
+        _trim(self.follow_up_questions)
+
+    def approx_size(self) -> int:
+        """Approximate number of bytes held by this session."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.issue_description)
+        for history in (self.follow_up_questions, self.user_answers):
+            size += sys.getsizeof(history) + sum(sys.getsizeof(item) for item in history)
+        if self.auto_test_results is not None:
+            size += _deep_size(self.to_dict()["auto_test_results"])
+        return size
+
+    def to_dict(self) -> dict:
+        """Serialize the session to plain JSON-compatible data."""
+        results = self.auto_test_results
+        return {
+            "state": self.state.value,
+            "issue_description": self.issue_description,
+            "auto_test_results": results.model_dump(mode="json", exclude_defaults=True) if results is not None else None,
+            "metrics": self.metrics.to_dict() if self.metrics is not None else None,
+            "follow_up_questions": list(self.follow_up_questions),
+            "current_question_index": self.current_question_index,
+            "user_answers": list(self.user_answers),
+            "fast_mode": self.fast_mode,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatSession":
+        """Rebuild a session from the output of `to_dict`."""
+        results = data.get("auto_test_results")
+        try:
+            results = AutoTestResults.model_validate(results) if results is not None else None
+        except ValidationError:
+            # Stored before test results were validated; the parsed metrics are enough
+            results = None
+        metrics = data.get("metrics")
+        if metrics is not None:
+            metrics = NetworkMetrics.from_dict(metrics)
+        elif results is not None:
+            # Stored before metrics were kept on the session
+            metrics = NetworkMetrics.from_test_results(results)
+        return cls(
+            state=ConversationState(data["state"]),
+            issue_description=data.get("issue_description", ""),
+            auto_test_results=results,
+            metrics=metrics,
+            follow_up_questions=list(data.get("follow_up_questions", [])),
+            current_question_index=data.get("current_question_index", 0),
+            user_answers=list(data.get("user_answers", [])),
+            fast_mode=data.get("fast_mode", False),
+        )
+
+
+def _trim(history: list[str]):
+    """Drop the oldest entries once a history list exceeds the configured cap."""
+    excess = len(history) - settings.session_history_limit
+    if excess > 0:
+        del history[:excess]
+
+
+def _deep_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_size(v) for v in value)
+    return size
@@ -0,0 +1,80 @@
+# admin.py
+import asyncio
+import logging
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.core.config import settings
+from app.routes.chat import sessions
+from app.services import nlu, prompts, speculation
+from app.services.coordination import coordinator
+from app.services.response_cache import response_cache
+from app.services.troubleshoot import get_troubleshoot_service
+
+logger = logging.getLogger(__name__)
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    """Guard admin endpoints when an admin token is configured."""
+    if settings.admin_token and x_admin_token != settings.admin_token:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/sessions")
+async def session_stats():
+    """Live session count, evictions and approximate bytes held."""
+    return await asyncio.to_thread(sessions.stats)
+
+
+@router.get("/nlu")
+async def nlu_stats():
+    """How often the local classifiers answered without an LLM call."""
+    return nlu.stats.snapshot()
+
+
+@router.get("/speculation")
+async def speculation_stats():
+    """Latency saved by overlapping validation with question generation, and waste."""
+    return speculation.stats.snapshot()
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit, miss and eviction counters of the generated-response cache."""
+    return response_cache.stats()
+
+
+@router.get("/tokens")
+async def token_stats():
+    """Input tokens per LLM call site: local estimate, billed and served from the prompt cache."""
+    return prompts.stats.snapshot()
+
+
+@router.get("/llm")
+async def llm_scheduler_stats():
+    """Concurrency slots in use, queued calls and circuit breaker state of the LLM scheduler."""
+    return get_troubleshoot_service().scheduler.stats()
+
+
+@router.get("/routing")
+async def routing_stats():
+    """Model, SLO and hedge delay per LLM call site, with recent p95, SLO misses and hedge win rate."""
+    return get_troubleshoot_service().router.stats()
+
+
+@router.get("/coordination")
+async def coordination_stats():
+    """Sessions with a turn running, turns queued behind them and deduplicated requests held."""
+    return coordinator.stats()
+
+
+@router.get("/history")
+async def history_aggregates(since: float | None = None):
+    """Resolution rate by connection type, speed/latency percentiles by device and question counts."""
+    from app.services import history
+
+    if history.history is None:
+        raise HTTPException(status_code=404, detail="Diagnostics history is disabled; set HISTORY_PATH.")
+    # Aggregating millions of rows takes a few hundred ms; keep it off the event loop
+    return await asyncio.to_thread(history.history.aggregates, since)
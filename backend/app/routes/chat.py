@@ -1,159 +1,350 @@
 # chat.py
+import copy
+import json
 import logging
-from fastapi import APIRouter, HTTPException
+from dataclasses import dataclass
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from app.core.fastjson import FastJSONResponse, body_schema, json_body
+from app.core.logging_config import bind_session
+from app.models.metrics import display, parse_test_results
 from app.models.schemas import ChatRequest, ChatResponse, ConversationState
-from app.services.troubleshoot import TroubleshootService
+from app.models.session import ChatSession
+from app.services import telemetry
+from app.services.coordination import coordinator, turn_key
+from app.services.probe import carry_probe
+from app.services.session_store import SessionConflict, build_session_store
+from app.services.troubleshoot import TroubleshootService, get_troubleshoot_service
 
 logger = logging.getLogger(__name__)
 
-# ChatSession class for session state
-class ChatSession:
-    def __init__(self):
-        self.state = ConversationState.GREETING
-        self.issue_description = ""
-        self.auto_test_results = None
-        self.follow_up_questions = []
-        self.current_question_index = 0
-        self.user_answers = []
-
 router = APIRouter()
-sessions = {}
+sessions = build_session_store()
+telemetry.active_sessions.set_function(lambda: {(): len(sessions)})
+
+CONFLICT_DETAIL = "The session was updated by another request; please retry."
+
+
+@dataclass(frozen=True, slots=True)
+class Progress:
+    """A step a turn has reached, yielded by turn_events only when asked for."""
+    stage: str
+    message: str
+
+
+ANALYZING_RESULTS = Progress("analyzing_results", "Analyzing your test results...")
+GENERATING_QUESTION = Progress("generating_question", "Preparing the next question...")
+GENERATING_CONCLUSION = Progress("generating_conclusion", "Putting together a recommendation...")
+CHECKING_ANSWER = Progress("checking_answer", "Checking your answer...")
+DECIDING_REBOOT = Progress("deciding_reboot", "Deciding whether a router reboot will help...")
 
-# Initialize service to ensure environment variables are loaded
-def get_troubleshoot_service():
-    return TroubleshootService()
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+@dataclass(frozen=True, slots=True)
+class Outcome:
+    """How the conversation ended, yielded just before the final ChatResponse.
+
+    Callers pass it to record_outcome only once the session is saved, so a
+    turn that loses a save race is not counted twice.
+    """
+    result: str  # "resolved" or "escalated"
+
+
+def record_outcome(session: ChatSession, outcome: Outcome | None):
+    """Add a finished conversation to the diagnostics history."""
+    if outcome is None:
+        return
+    # Deferred: the history store pulls in NumPy, which only the last turn needs
+    from app.services import history
+
+    history.record(session.metrics, outcome.result, len(session.follow_up_questions))
+
+@router.post("/chat", response_model=ChatResponse, openapi_extra=body_schema(ChatRequest))
+async def chat(request: ChatRequest = Depends(json_body(ChatRequest)), idempotency_key: str | None = Header(default=None)):
     session_id = request.session_id
-    user_message = request.message
+    bind_session(session_id)
+
+    logger.info("Received chat request - session: %s, message: %s", session_id, request.message, extra={"sampled": True})
+    # Retries and double submits share the first request's turn
+    response = await coordinator.run(turn_key("chat", request, idempotency_key), lambda: _chat_turn(request))
+    # Already a ChatResponse: render it as is rather than validating it again
+    return FastJSONResponse(response)
+
+
+async def _chat_turn(request: ChatRequest) -> ChatResponse:
+    session_id = request.session_id
+    service = get_troubleshoot_service()
+
+    async with coordinator.session_lock(session_id):
+        # Loaded under the lock so the turn sees what the previous one saved
+        session = await sessions.aget(session_id)
+        if session is None:
+            session = service.initialize_session()
+            logger.info("Created new session: %s", session_id)
+
+        with telemetry.TurnTimer("chat", session.state.value):
+            response, outcome = await handle_turn(session_id, session, request, service)
+        # Persist after every turn so the next request can land on any worker
+        try:
+            await sessions.asave(session_id, session)
+        except SessionConflict:
+            raise HTTPException(status_code=409, detail=CONFLICT_DETAIL) from None
+        record_outcome(session, outcome)
+    return response
+
+
+@router.post("/chat/stream", openapi_extra=body_schema(ChatRequest))
+async def chat_stream(request: ChatRequest = Depends(json_body(ChatRequest)), idempotency_key: str | None = Header(default=None)):
+    """Server-sent events variant of /chat.
+
+    Emits `token` events as text becomes available, then a `done` event with
+    the final ChatResponse fields plus the new conversation state. The session
+    is only committed once the turn has fully completed. A request identical
+    to one still streaming gets only that turn's final event.
+    """
+    session_id = request.session_id
+    bind_session(session_id)
+    logger.info(
+        "Received streaming chat request - session: %s, message: %s",
+        session_id, request.message, extra={"sampled": True},
+    )
+    service = get_troubleshoot_service()
+    key = turn_key("stream", request, idempotency_key)
+
+    async def event_stream():
+        # Flush headers straight away so the client sees the first byte immediately
+        yield ": stream-open\n\n"
+        while (future := coordinator.existing(key)) is not None:
+            joined, final = await coordinator.join(future)
+            if joined:
+                yield _sse(*final)
+                return
+
+        future = coordinator.lead(key)
+        final = ("error", {"detail": "Failed to generate a response."})
+        try:
+            async with coordinator.session_lock(session_id):
+                stored = await sessions.aget(session_id)
+                # Work on a copy so an aborted stream leaves the stored session untouched
+                session = copy.deepcopy(stored) if stored is not None else service.initialize_session()
+                with telemetry.TurnTimer("stream", session.state.value) as timer:
+                    try:
+                        outcome = None
+                        async for event in turn_events(session_id, session, request, service, stream=True):
+                            if isinstance(event, ChatResponse):
+                                await sessions.asave(session_id, session)
+                                record_outcome(session, outcome)
+                                final = ("done", {**event.model_dump(), "state": session.state.value})
+                                yield _sse(*final)
+                            elif isinstance(event, Outcome):
+                                outcome = event
+                            else:
+                                yield _sse("token", {"text": event})
+                    except HTTPException as e:
+                        timer.outcome = "error"
+                        final = ("error", {"detail": e.detail})
+                        yield _sse(*final)
+                    except SessionConflict:
+                        timer.outcome = "error"
+                        final = ("error", {"detail": CONFLICT_DETAIL})
+                        yield _sse(*final)
+                    except Exception as e:
+                        timer.outcome = "error"
+                        logger.error("Streaming chat failed for session %s: %s", session_id, e)
+                        yield _sse(*final)
+        except BaseException as e:
+            coordinator.finish(key, future, error=e)
+            raise
+        coordinator.finish(key, future, final, replayable=final[0] == "done")
 
-    logger.info(f"Received chat request - session: {session_id}, message: {user_message}")
-    
-    if session_id not in sessions:
-        service = get_troubleshoot_service()
-        sessions[session_id] = service.initialize_session()
-        logger.info(f"Created new session: {session_id}")
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    session = sessions[session_id]
-    logger.info(f"SESSION DEBUG: id={session_id}, state={session.state}, idx={session.current_question_index}, answers={session.user_answers}, followups={session.follow_up_questions}")
-    logger.info(f"Session {session_id} state: {session.state}")
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def handle_turn(
+    session_id: str, session: ChatSession, request: ChatRequest, service: TroubleshootService
+) -> tuple[ChatResponse, Outcome | None]:
+    """Advance the conversation state machine by one user message.
+
+    Returns the response and, on the last turn, the Outcome to record once
+    the session is saved.
+    """
+    outcome = None
+    async for event in turn_events(session_id, session, request, service):
+        if isinstance(event, Outcome):
+            outcome = event
+        elif isinstance(event, ChatResponse):
+            return event, outcome
+
+
+async def turn_events(
+    session_id: str,
+    session: ChatSession,
+    request: ChatRequest,
+    service: TroubleshootService,
+    stream: bool = False,
+    progress: bool = False,
+) -> AsyncIterator[str | Progress | Outcome | ChatResponse]:
+    """Run one turn of the state machine, yielding message text then the final ChatResponse.
+
+    With `stream=True` LLM output is yielded token by token as it arrives;
+    otherwise each message is yielded in one piece. With `progress=True` a
+    Progress is yielded before each step that may wait on the LLM.
+    """
+    user_message = request.message
+    if request.fast_mode is not None:
+        session.fast_mode = request.fast_mode
+    logger.info("Session %s state: %s", session_id, session.state.value)
+    logger.info(
+        "Session %s detail: idx=%s, answers=%s, followups=%s",
+        session_id, session.current_question_index, session.user_answers, session.follow_up_questions,
+        extra={"sampled": True},
+    )
 
     if session.state == ConversationState.GREETING:
         session.issue_description = user_message
         session.state = ConversationState.RUN_AUTO_TESTS
-        return ChatResponse(message="Got it. Running a quick test on your network...")
+        message = "Got it. Running a quick test on your network..."
+        yield message
+        yield ChatResponse(message=message)
 
     elif session.state == ConversationState.RUN_AUTO_TESTS:
-        # Store actual test results from frontend
-        session.auto_test_results = request.auto_test_results
-        logger.info(f"Processing auto test results for session {session_id}")
-        
-        # Format test results using centralized method
-        service = get_troubleshoot_service()
-        formatted_results = service.format_test_results(session.auto_test_results)
-        logger.debug(f"Formatted test results: {formatted_results}")
+        if progress:
+            yield ANALYZING_RESULTS
+        # Store actual test results from frontend, parsed once for the rest of the session
+        session.auto_test_results = carry_probe(session.auto_test_results, request.auto_test_results)
+        session.metrics = await parse_test_results(session.auto_test_results)
+        logger.info("Processing auto test results for session %s", session_id)
+        logger.debug("Parsed network metrics: %s", session.metrics)
+        metrics = session.metrics
         
         results_message = (
     f"📊 **Test Results**  \n"
-    f"• **Speed:** {formatted_results['speed']} Mbps  \n"
-    f"• **Latency:** {formatted_results['latency']} ms  \n"
-    f"• **Connection Type:** {formatted_results['connection_type']}  \n"
-    f"• **Connectivity:** {'✅ Working' if formatted_results.get('connectivity_status', True) else '❌ Issues detected'}  \n"
+    f"• **Speed:** {display(metrics.speed_mbps)} Mbps  \n"
+    f"• **Latency:** {display(metrics.latency_ms)} ms  \n"
+    f"• **Connection Type:** {display(metrics.connection_type)}  \n"
+    f"• **Connectivity:** {'✅ Working' if metrics.connected else '❌ Issues detected'}  \n"
     f"Based on these results, let me ask you a few questions to better understand the issue."
 )
         
+        yield f"{results_message}\n\n"
+
         # Generate first follow-up question
-        service = get_troubleshoot_service()
-        question = await service.generate_next_question(
-            session.issue_description,
-            session.auto_test_results,
-            session.user_answers,
-            0,  # question_number
-            session.follow_up_questions
-        )
+        if progress:
+            yield GENERATING_QUESTION
+        question = ""
+        async for token in _next_question(service, session, 0, stream):
+            question += token
+            yield token
+        question = question.strip()
         
-        session.follow_up_questions.append(question)
+        session.record_question(0, question)
         session.state = ConversationState.FOLLOW_UP_QUESTIONS
-        logger.info(f"Generated first follow-up question for session {session_id}")
-        return ChatResponse(message=f"{results_message}\n\n{question}")
+        logger.info("Generated first follow-up question for session %s", session_id)
+        yield ChatResponse(message=f"{results_message}\n\n{question}")
 
     elif session.state == ConversationState.FOLLOW_UP_QUESTIONS:
         # Save the current answer before generating next question
-        if session.current_question_index < len(session.user_answers):
-            # We already have an answer for this question, update it
-            session.user_answers[session.current_question_index] = user_message
-        else:
-            # First time answering this question
-            session.user_answers.append(user_message)
+        session.record_answer(session.current_question_index, user_message)
         
-        logger.info(f"Current question progress - index: {session.current_question_index}, total answers: {len(session.user_answers)}")
+        logger.info(
+            "Current question progress - index: %s, total answers: %s",
+            session.current_question_index, len(session.user_answers), extra={"sampled": True},
+        )
 
         # Check if we've asked enough questions (max 5)
         if session.current_question_index >= 4:  # 0-indexed, so 5 questions total
-            service = get_troubleshoot_service()
-            conclusion = await service.generate_conclusion(session)
+            # Settle the reboot question first so the conclusion only suggests one when it can help
+            if progress:
+                yield DECIDING_REBOOT
+            decision = await service.should_reboot_router(
+                session.metrics,
+                session.user_answers,
+                session.follow_up_questions,
+                fast=session.fast_mode,
+            )
+            logger.info(
+                "Reboot decision for session %s: %s (%s: %s)",
+                session_id, decision.reboot, decision.rule, decision.explanation,
+            )
+            if progress:
+                yield GENERATING_CONCLUSION
+            if stream:
+                conclusion = ""
+                async for token in service.stream_conclusion(session, decision):
+                    conclusion += token
+                    yield token
+            else:
+                conclusion = await service.generate_conclusion(session, decision)
+                yield conclusion
             session.state = ConversationState.POST_REBOOT_CHECK
-            return ChatResponse(message=conclusion)
+            yield ChatResponse(message=conclusion)
+            return
         
         # Generate next question
-        service = get_troubleshoot_service()
-        question = await service.generate_next_question(
-            session.issue_description,
-            session.auto_test_results,
-            session.user_answers,
-            session.current_question_index,
-            session.follow_up_questions
-        )
+        if progress:
+            yield GENERATING_QUESTION
+        question = ""
+        async for token in _next_question(service, session, session.current_question_index, stream):
+            question += token
+            yield token
+        question = question.strip()
         
         # Only increment the question index after we've processed the current answer
         session.current_question_index += 1
         
         # Store the next question
-        if len(session.follow_up_questions) <= session.current_question_index:
-            session.follow_up_questions.append(question)
-        else:
-            session.follow_up_questions[session.current_question_index] = question
+        session.record_question(session.current_question_index, question)
             
-        logger.info(f"Generated follow-up question {session.current_question_index + 1} for session {session_id}")
-        return ChatResponse(message=question)
-
-    elif session.state == ConversationState.SOLUTION_ANALYSIS:
-        logger.info(f"Analyzing solution for session {session_id}")
-        # Check if user indicated the issue is resolved
-        service = get_troubleshoot_service()
-        if service.is_issue_resolved(user_message):
-            logger.info(f"Issue resolved for session {session_id}")
-            return ChatResponse(message=service.get_success_message())
-        
-        # Check if reboot is needed
-        service = get_troubleshoot_service()
-        should_reboot = await service.should_reboot_router(
-            session.auto_test_results,
-            session.user_answers
-        )
-
-        session.state = ConversationState.POST_REBOOT_CHECK
-        return ChatResponse(message="Based on your test results, I recommend rebooting your router. Please unplug your router, wait 30 seconds, then plug it back in. After 2-3 minutes, test your connection.")
-
-
+        logger.info("Generated follow-up question %s for session %s", session.current_question_index + 1, session_id)
+        yield ChatResponse(message=question)
 
     elif session.state == ConversationState.POST_REBOOT_CHECK:
-        logger.info(f"Post reboot check for session {session_id}")
-        service = get_troubleshoot_service()
-        if service.is_issue_resolved(user_message):
-            logger.info(f"Issue resolved after reboot for session {session_id}")
+        logger.info("Post reboot check for session %s", session_id)
+        if progress:
+            yield CHECKING_ANSWER
+        if await service.is_issue_resolved(user_message, fast=session.fast_mode):
+            logger.info("Issue resolved after reboot for session %s", session_id)
             session.state = ConversationState.CONVERSATION_END
-            return ChatResponse(message=service.get_success_message(), is_conversation_ended=True)
+            yield service.get_success_message()
+            yield Outcome("resolved")
+            yield ChatResponse(message=service.get_success_message(), is_conversation_ended=True)
         else:
-            logger.info(f"Issue not resolved after reboot for session {session_id}")
+            logger.info("Issue not resolved after reboot for session %s", session_id)
             session.state = ConversationState.CONVERSATION_END
-            return ChatResponse(message=service.get_support_message(), is_conversation_ended=True)
+            yield service.get_support_message()
+            yield Outcome("escalated")
+            yield ChatResponse(message=service.get_support_message(), is_conversation_ended=True)
 
     elif session.state == ConversationState.CONVERSATION_END:
-        service = get_troubleshoot_service()
-        return ChatResponse(message=service.get_ending_message(), is_conversation_ended=True)
+        yield service.get_ending_message()
+        yield ChatResponse(message=service.get_ending_message(), is_conversation_ended=True)
 
     else:
-        logger.error(f"Unknown conversation state for session {session_id}: {session.state}")
+        logger.error("Unknown conversation state for session %s: %s", session_id, session.state)
         raise HTTPException(status_code=400, detail="Unknown conversation state.")
+
+
+async def _next_question(
+    service: TroubleshootService, session: ChatSession, question_number: int, stream: bool
+) -> AsyncIterator[str]:
+    """Yield the next follow-up question, token by token when streaming."""
+    args = (
+        session.issue_description,
+        session.metrics,
+        session.user_answers,
+        question_number,
+        session.follow_up_questions,
+    )
+    if stream:
+        async for token in service.stream_next_question(*args, fast=session.fast_mode):
+            yield token
+    else:
+        yield await service.generate_next_question(*args, fast=session.fast_mode)
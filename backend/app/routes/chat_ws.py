@@ -0,0 +1,174 @@
+# chat_ws.py
+import asyncio
+import copy
+import json
+import logging
+from contextlib import aclosing
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from app.core.config import settings
+from app.core.logging_config import bind_session
+from app.models.schemas import ChatRequest, ChatResponse
+from app.routes.chat import CONFLICT_DETAIL, Outcome, Progress, record_outcome, sessions, turn_events
+from app.services import telemetry
+from app.services.coordination import coordinator
+from app.services.session_store import SessionConflict
+from app.services.troubleshoot import TroubleshootService, get_troubleshoot_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Open connections in this process
+_open = 0
+
+closed = telemetry.registry.counter(
+    "wifi_ws_closed_total",
+    "Chat WebSocket connections closed, by reason (client, idle, slow_consumer, too_large, full).",
+    ("reason",),
+)
+telemetry.registry.gauge(
+    "wifi_ws_connections", "Open chat WebSocket connections.", collect=lambda: {(): _open},
+)
+
+
+class SlowConsumer(Exception):
+    """The client did not take a frame within WS_SEND_TIMEOUT_SECONDS."""
+
+
+@router.websocket("/chat/ws/{session_id}")
+async def chat_ws(websocket: WebSocket, session_id: str):
+    """Carry a whole conversation over one WebSocket.
+
+    Client frames are JSON objects: `{"type": "message", "message": ...,
+    "auto_test_results": ..., "fast_mode": ...}` runs a turn (the ChatRequest
+    fields), `{"type": "ping"}` is answered with a pong. For each turn the
+    server pushes `progress` frames as it reaches steps that wait on the LLM,
+    `token` frames as text arrives, then `done` (the ChatResponse fields and
+    the new state) or `error`. Turns run in order with those sent over REST.
+
+    Without traffic the server sends a `ping` every WS_HEARTBEAT_SECONDS and
+    closes after WS_IDLE_TIMEOUT_SECONDS, so an idle conversation costs one
+    suspended receive and no task of its own.
+    """
+    global _open
+    bind_session(session_id)
+    if _open >= settings.ws_max_connections:
+        closed.inc("full")
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    _open += 1
+    reason = "client"
+    try:
+        reason = await _serve(websocket, session_id, get_troubleshoot_service())
+    except WebSocketDisconnect:
+        logger.info("Chat WebSocket for session %s closed by the client", session_id)
+    except SlowConsumer:
+        reason = "slow_consumer"
+        logger.warning("Chat WebSocket for session %s dropped: client not reading", session_id)
+        await _close(websocket, 1008)  # policy violation
+    finally:
+        _open -= 1
+        closed.inc(reason)
+
+
+async def _serve(websocket: WebSocket, session_id: str, service: TroubleshootService) -> str:
+    """Read frames and run turns until the connection ends; returns why it ended."""
+    loop = asyncio.get_running_loop()
+    last_frame = loop.time()
+    while True:
+        try:
+            async with asyncio.timeout(settings.ws_heartbeat_seconds):
+                message = await websocket.receive()
+        except TimeoutError:
+            if loop.time() - last_frame >= settings.ws_idle_timeout_seconds:
+                await _close(websocket, 1001)  # going away
+                return "idle"
+            await _send(websocket, {"type": "ping"})
+            continue
+        if message["type"] == "websocket.disconnect":
+            return "client"
+        last_frame = loop.time()
+
+        raw = message.get("bytes")
+        text = message.get("text") or ""
+        # The limit is in bytes; a text frame's length counts characters, up to 4 bytes each
+        size = len(raw) if raw is not None else len(text.encode())
+        if size > settings.ws_max_message_bytes:
+            await _close(websocket, 1009)  # message too big
+            return "too_large"
+        if raw is not None:
+            text = raw.decode("utf-8", "replace")
+        try:
+            frame = json.loads(text)
+            kind = frame.get("type", "message")
+        except (ValueError, AttributeError):
+            await _send(websocket, {"type": "error", "detail": "Frames must be JSON objects."})
+            continue
+
+        if kind == "ping":
+            await _send(websocket, {"type": "pong"})
+        elif kind == "message":
+            try:
+                request = ChatRequest.model_validate({**frame, "session_id": session_id})
+            except ValidationError as e:
+                await _send(websocket, {"type": "error", "detail": e.errors(include_url=False, include_context=False)})
+                continue
+            await _turn(websocket, session_id, request, service)
+        elif kind != "pong":
+            await _send(websocket, {"type": "error", "detail": f"Unknown frame type: {kind}"})
+
+
+async def _turn(websocket: WebSocket, session_id: str, request: ChatRequest, service: TroubleshootService):
+    logger.info("Received WebSocket chat message - session: %s, message: %s", session_id, request.message, extra={"sampled": True})
+    async with coordinator.session_lock(session_id):
+        stored = await sessions.aget(session_id)
+        # Work on a copy so a turn cut off by a disconnect leaves the stored session untouched
+        session = copy.deepcopy(stored) if stored is not None else service.initialize_session()
+        with telemetry.TurnTimer("ws", session.state.value) as timer:
+            try:
+                outcome = None
+                async with aclosing(turn_events(session_id, session, request, service, stream=True, progress=True)) as events:
+                    async for event in events:
+                        if isinstance(event, ChatResponse):
+                            await sessions.asave(session_id, session)
+                            record_outcome(session, outcome)
+                            await _send(websocket, {"type": "done", **event.model_dump(), "state": session.state.value})
+                        elif isinstance(event, Outcome):
+                            outcome = event
+                        elif isinstance(event, Progress):
+                            await _send(websocket, {"type": "progress", "stage": event.stage, "message": event.message})
+                        else:
+                            await _send(websocket, {"type": "token", "text": event})
+            except HTTPException as e:
+                timer.outcome = "error"
+                await _send(websocket, {"type": "error", "detail": e.detail})
+            except SessionConflict:
+                timer.outcome = "error"
+                await _send(websocket, {"type": "error", "detail": CONFLICT_DETAIL})
+            except (WebSocketDisconnect, SlowConsumer):
+                raise
+            except Exception as e:
+                timer.outcome = "error"
+                logger.error("WebSocket chat failed for session %s: %s", session_id, e)
+                await _send(websocket, {"type": "error", "detail": "Failed to generate a response."})
+
+
+async def _send(websocket: WebSocket, frame: dict):
+    # send_text returns once the transport has room, so a client that stops
+    # reading holds up this turn; past the timeout it is dropped instead
+    try:
+        async with asyncio.timeout(settings.ws_send_timeout_seconds):
+            await websocket.send_text(json.dumps(frame))
+    except TimeoutError:
+        raise SlowConsumer() from None
+
+
+async def _close(websocket: WebSocket, code: int):
+    try:
+        async with asyncio.timeout(1.0):
+            await websocket.close(code=code)
+    except (TimeoutError, RuntimeError, WebSocketDisconnect):
+        pass
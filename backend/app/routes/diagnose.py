@@ -0,0 +1,49 @@
+# diagnose.py
+import logging
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.routes.admin import require_admin
+from app.services.diagnosis import diagnose_lines, iter_lines, to_ndjson
+from app.services.troubleshoot import get_troubleshoot_service
+
+logger = logging.getLogger(__name__)
+
+class DuplexStreamingResponse(StreamingResponse):
+    """A StreamingResponse that starts while the request body is still being read.
+
+    StreamingResponse watches for a disconnect by calling receive(), which
+    would swallow the upload chunks the endpoint reads. Here only the body
+    reads them: request.stream() raises ClientDisconnect if the client leaves
+    mid-upload, and after the upload at most `concurrency` rows are left.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+# Bulk runs spend LLM budget on behalf of operators; same guard as /admin
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.post("/diagnose/batch")
+async def diagnose_batch(
+    request: Request, concurrency: int | None = None, conclusion: bool = True, fast: bool = False,
+):
+    """Diagnose a JSONL upload of stored test results, streaming NDJSON results as rows finish.
+
+    Each line is `{"id": ..., "issue": ..., "auto_test_results": {...}}`.
+    Results arrive in completion order with the input `line` number; a bad
+    row yields an `error` entry and the last line is a `summary`.
+    """
+    concurrency = max(1, min(concurrency or settings.batch_concurrency, settings.batch_max_concurrency))
+    lines = iter_lines(request.stream(), settings.batch_max_line_bytes)
+    results = diagnose_lines(lines, get_troubleshoot_service(), concurrency, conclusion=conclusion, fast=fast)
+
+    async def body():
+        async for result in results:
+            if "summary" in result:
+                logger.info("Bulk diagnosis finished: %s", result["summary"])
+            yield to_ndjson(result)
+
+    return DuplexStreamingResponse(body(), media_type="application/x-ndjson")
@@ -0,0 +1,63 @@
+# probe.py
+import logging
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.core.config import settings
+from app.core.logging_config import bind_session
+from app.models.metrics import parse_test_results
+from app.routes.chat import sessions
+from app.services.coordination import coordinator
+from app.services.probe import attach_probe, run_probe
+from app.services.session_store import SessionConflict
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Reloads when another worker saves the session between our read and write
+SAVE_ATTEMPTS = 3
+
+
+@router.websocket("/probe/{session_id}")
+async def probe(websocket: WebSocket, session_id: str, count: int | None = None, interval_ms: float | None = None):
+    """Measure RTT, jitter and loss with echoed frames and attach the result to the session.
+
+    The client must echo every binary frame unchanged. A final JSON message
+    `{"type": "result", ...}` carries the statistics before the server closes.
+    """
+    bind_session(session_id)
+    await websocket.accept()
+    count = max(1, min(count or settings.probe_count, settings.probe_max_count))
+    interval = max(1.0, interval_ms or settings.probe_interval_ms) / 1000
+    try:
+        result = await run_probe(websocket, count, interval, settings.probe_grace_seconds)
+    except WebSocketDisconnect:
+        logger.info("Probe client for session %s disconnected early", session_id)
+        return
+    logger.info(
+        "Probe for session %s: loss %s%%, p50 %s ms, jitter %s ms",
+        session_id, result.loss_pct, result.rtt_p50_ms, result.jitter_ms,
+    )
+
+    # Serialized with chat turns, which would otherwise overwrite the probe or be overwritten
+    async with coordinator.session_lock(session_id):
+        for _ in range(SAVE_ATTEMPTS):
+            session = await sessions.aget(session_id)
+            if session is None:
+                break
+            session.auto_test_results = attach_probe(session.auto_test_results, result.to_dict())
+            if session.metrics is not None:
+                session.metrics = await parse_test_results(session.auto_test_results)
+            try:
+                await sessions.asave(session_id, session)
+                break
+            except SessionConflict:
+                # A turn on another worker saved first; reapply the probe to its state
+                continue
+        else:
+            logger.warning("Probe result for session %s was not saved: the session kept changing", session_id)
+
+    try:
+        await websocket.send_json({"type": "result", **result.to_dict()})
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
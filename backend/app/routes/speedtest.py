@@ -0,0 +1,65 @@
+# speedtest.py
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.services.speedtest import StreamTiming, payload_chunks, registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+_NO_CACHE = {"Cache-Control": "no-store", "Content-Encoding": "identity", "X-Accel-Buffering": "no"}
+
+
+@router.get("/speedtest/download")
+async def download(
+    size: int = Query(default=25 * 1024 * 1024, ge=1, le=settings.speedtest_max_bytes),
+    test_id: str | None = None,
+    stream: str = "0",
+):
+    """Stream `size` random bytes; time the stream under `test_id` if given."""
+    timing = registry.stream(test_id, stream, "download") if test_id else StreamTiming("download")
+
+    async def body():
+        timing.start()
+        try:
+            for chunk in payload_chunks(size):
+                yield chunk
+                timing.bytes += len(chunk)
+        finally:
+            timing.finish()
+
+    return StreamingResponse(
+        body(),
+        media_type="application/octet-stream",
+        headers={**_NO_CACHE, "Content-Length": str(size)},
+    )
+
+
+@router.post("/speedtest/upload")
+async def upload(request: Request, test_id: str | None = None, stream: str = "0"):
+    """Drain the request body without keeping it and report how fast it arrived."""
+    timing = registry.stream(test_id, stream, "upload") if test_id else StreamTiming("upload")
+    timing.start()
+    async for chunk in request.stream():
+        timing.bytes += len(chunk)
+        if timing.bytes > settings.speedtest_max_bytes:
+            timing.finish()
+            raise HTTPException(status_code=413, detail="Upload exceeds the speed test limit.")
+    timing.finish()
+    return timing.snapshot()
+
+
+@router.get("/speedtest/{test_id}")
+async def test_summary(test_id: str):
+    """Server-side throughput of every stream of a test, per direction and combined."""
+    test = registry.get(test_id)
+    if test is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired speed test.")
+    return {
+        "test_id": test_id,
+        "download": test.summary("download"),
+        "upload": test.summary("upload"),
+        "streams": {name: timing.snapshot() for name, timing in test.streams.items()},
+    }
@@ -0,0 +1,32 @@
+# serverless.py
+"""AWS Lambda entry point: set the function handler to `app.serverless.handler`.
+
+Tuned for cold start. Configuration comes from the function environment (no
+.env lookups), and the OpenAI SDK, httpx and NumPy are imported only when a
+request first needs them. The ASGI lifespan is off: the LLM client is built
+on first use by `get_troubleshoot_service` and, like the event loop it is
+bound to, lives at module level so warm invocations reuse its connections.
+"""
+import asyncio
+import os
+
+os.environ.setdefault("SERVERLESS", "true")
+
+from mangum import Mangum  # noqa: E402
+from app.core.logging_config import flush_logging  # noqa: E402
+from app.main import app  # noqa: E402
+
+# Mangum runs every invocation on the current event loop; keeping one for the
+# container's lifetime keeps pooled LLM connections usable across invocations
+_loop = asyncio.new_event_loop()
+asyncio.set_event_loop(_loop)
+_adapter = Mangum(app, lifespan="off")
+
+
+def handler(event, context):
+    asyncio.set_event_loop(_loop)
+    try:
+        return _adapter(event, context)
+    finally:
+        # The runtime may freeze the container as soon as we return
+        flush_logging()
@@ -0,0 +1,90 @@
+# analysis.py
+"""Summary statistics over the raw samples of a browser test run.
+
+One sort gives the median and tail percentiles. A centered copy of the
+samples gives the standard deviation and the least-squares trend. Absolute
+deviations from the median give the MAD, which flags outliers. A few
+thousand samples take well under a millisecond; callers move larger sets
+to a worker thread (see `metrics.parse_test_results`).
+"""
+import logging
+from dataclasses import asdict, dataclass
+from typing import Sequence
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_QUANTILES = np.array([0.05, 0.5, 0.95])
+# Modified z-score above which a sample is an outlier (Iglewicz & Hoaglin)
+_OUTLIER_Z = 3.5
+_MAD_TO_SIGMA = 1.4826
+
+
+@dataclass(frozen=True, slots=True)
+class SeriesStats:
+    count: int
+    median: float
+    p5: float
+    p95: float
+    mean: float
+    stddev: float
+    # Fitted change across the whole run as a percentage of the median
+    trend_pct: float
+    outliers: int
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def describe(values: Sequence[float], timestamps: Sequence[float] | None = None) -> SeriesStats | None:
+    """Statistics of one sample series; `timestamps` (any unit) default to even spacing."""
+    v = np.asarray(values, dtype=np.float64)
+    t = np.asarray(timestamps, dtype=np.float64) if timestamps is not None and len(timestamps) == len(v) else None
+    finite = np.isfinite(v)
+    if t is not None:
+        finite &= np.isfinite(t)
+    if not finite.all():
+        v = v[finite]
+        t = t[finite] if t is not None else None
+    n = len(v)
+    if n == 0:
+        return None
+
+    s = np.sort(v)
+    pos = _QUANTILES * (n - 1)
+    lo = pos.astype(np.intp)
+    hi = np.minimum(lo + 1, n - 1)
+    p5, median, p95 = s[lo] + (s[hi] - s[lo]) * (pos - lo)
+
+    mean = s.mean()
+    centered = v - mean
+    stddev = float(np.sqrt(centered @ centered / n))
+
+    # Least-squares slope against time (or sample index), scaled to the run's span
+    if t is None:
+        x = np.arange(n, dtype=np.float64) - (n - 1) / 2
+        sxx, span = n * (n * n - 1) / 12, n - 1
+    else:
+        x = t - t.mean()
+        sxx, span = float(x @ x), float(t.max() - t.min())
+    slope = float(x @ centered) / sxx if sxx else 0.0
+    trend_pct = slope * span / median * 100 if median else 0.0
+
+    deviation = np.abs(v - median)
+    mad = np.partition(deviation, n // 2)[n // 2]
+    outliers = int(np.count_nonzero(deviation > _OUTLIER_Z * _MAD_TO_SIGMA * mad)) if mad else 0
+
+    return SeriesStats(
+        count=n,
+        median=_round(median),
+        p5=_round(p5),
+        p95=_round(p95),
+        mean=_round(mean),
+        stddev=_round(stddev),
+        trend_pct=_round(trend_pct),
+        outliers=outliers,
+    )
+
+
+def _round(value) -> float:
+    return round(float(value), 3)
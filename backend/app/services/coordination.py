@@ -0,0 +1,164 @@
+# coordination.py
+"""Ordering and deduplication of chat turns within one process.
+
+Turns for a session run one at a time under a per-session lock, so each one
+loads the state the previous one saved. Identical requests that arrive while
+a turn is still running share that turn's result instead of running their
+own: requests match on the `Idempotency-Key` header when the client sends
+one, otherwise on the message and test results. Results for idempotency keys
+are also kept for a short while, so a retry of a finished turn gets the same
+response instead of advancing the conversation again.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+from app.core.config import settings
+from app.models.schemas import ChatRequest
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+lock_wait_seconds = telemetry.registry.histogram(
+    "wifi_session_lock_wait_seconds", "Time a chat turn waited for an earlier turn of the same session.",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+deduplicated = telemetry.registry.counter(
+    "wifi_chat_deduplicated_total",
+    "Chat requests answered with another request's result: joined while in flight, or replayed for a repeated idempotency key.",
+    ("kind",),
+)
+
+
+def turn_key(endpoint: str, request: ChatRequest, idempotency_key: str | None = None) -> tuple:
+    """Identity of a turn for deduplication."""
+    if idempotency_key:
+        return (endpoint, request.session_id, "key", idempotency_key)
+    # Content match only applies while the first request is in flight, when
+    # both necessarily see the same stored session state
+    results = request.auto_test_results.model_dump_json() if request.auto_test_results else ""
+    digest = hashlib.blake2b(f"{request.message}\0{results}".encode(), digest_size=16).hexdigest()
+    return (endpoint, request.session_id, "content", digest)
+
+
+class TurnCoordinator:
+    def __init__(self, replay_ttl: float = 300.0, max_replays: int = 10000):
+        self.replay_ttl = replay_ttl
+        self.max_replays = max_replays
+        # session id -> [lock, turns holding or waiting for it]
+        self._locks: dict[str, list] = {}
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._replays: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the session's lock; turns acquire it in arrival order."""
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        start = time.perf_counter()
+        try:
+            async with entry[0]:
+                lock_wait_seconds.observe(time.perf_counter() - start)
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def existing(self, key: tuple) -> asyncio.Future | None:
+        """The running or, for idempotency keys, recently finished result for `key`."""
+        future = self._inflight.get(key)
+        if future is not None:
+            deduplicated.inc("in_flight")
+            return future
+        replay = self._replays.get(key)
+        if replay is not None:
+            expires_at, result = replay
+            if expires_at > time.monotonic():
+                deduplicated.inc("replay")
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(result)
+                return future
+            del self._replays[key]
+        return None
+
+    def lead(self, key: tuple) -> asyncio.Future:
+        """Register the caller as the one running the turn for `key`."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def finish(
+        self, key: tuple, future: asyncio.Future, result: Any = None,
+        error: BaseException | None = None, replayable: bool = True,
+    ):
+        """Hand the leader's outcome to every joined request and release the key."""
+        self._inflight.pop(key, None)
+        if future.done():
+            return
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            # The leader went away (e.g. client disconnect); joined requests run the turn themselves
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+            # Joined requests re-raise it; don't warn when there were none
+            future.exception()
+        else:
+            future.set_result(result)
+            if replayable and key[2] == "key":
+                self._remember(key, result)
+
+    async def join(self, future: asyncio.Future) -> tuple[bool, Any]:
+        """Wait for another request's result; (False, None) if that request was cancelled."""
+        try:
+            return True, await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if future.cancelled():
+                return False, None
+            raise
+
+    async def run(self, key: tuple, turn: Callable[[], Awaitable[T]]) -> T:
+        """Run `turn` once for all identical requests in flight."""
+        while (future := self.existing(key)) is not None:
+            joined, result = await self.join(future)
+            if joined:
+                return result
+        future = self.lead(key)
+        try:
+            result = await turn()
+        except BaseException as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, result)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "locked_sessions": len(self._locks),
+            "waiting_turns": sum(max(0, count - 1) for _, count in self._locks.values()),
+            "in_flight": len(self._inflight),
+            "replayable": len(self._replays),
+        }
+
+    def _remember(self, key: tuple, result: Any):
+        self._replays[key] = (time.monotonic() + self.replay_ttl, result)
+        self._replays.move_to_end(key)
+        while len(self._replays) > self.max_replays:
+            self._replays.popitem(last=False)
+
+
+coordinator = TurnCoordinator(
+    replay_ttl=settings.idempotency_ttl_seconds,
+    max_replays=settings.idempotency_max_entries,
+)
+telemetry.registry.gauge(
+    "wifi_chat_turns_waiting", "Chat turns queued behind an earlier turn of the same session.",
+    collect=lambda: {(): coordinator.stats()["waiting_turns"]},
+)
@@ -0,0 +1,163 @@
+# diagnosis.py
+"""Bulk triage of stored test results, one JSON object per line.
+
+Each input row is an `AutoTestResults` with a problem description. Rows run
+through the same logic as a conversation's end: metrics are parsed, the
+reboot rules decide (the LLM only when no rule applies), and a conclusion
+comes from the response cache or the LLM. Input is read lazily and at most
+`concurrency` rows are in flight, so memory stays bounded by the
+concurrency rather than the batch size. Results are yielded as rows finish,
+which is not input order; each carries its line number and id.
+"""
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict
+from typing import AsyncIterable, AsyncIterator
+from pydantic import ValidationError
+from app.models.metrics import parse_test_results
+from app.models.schemas import DiagnosisRow
+from app.models.session import ChatSession
+from app.services import telemetry
+from app.services.troubleshoot import TroubleshootService
+
+logger = logging.getLogger(__name__)
+
+rows_total = telemetry.registry.counter(
+    "wifi_diagnosis_rows_total", "Bulk diagnosis rows by outcome (ok, error).", ("outcome",),
+)
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[bytes | LineTooLong]:
+    """Split a byte stream into lines without holding more than one line.
+
+    Lines longer than `max_line_bytes` are skipped and reported in their
+    place as a LineTooLong, so one bad row does not end the batch.
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while (end := chunk.find(b"\n", start)) != -1:
+            if skipping:
+                skipping = False
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+                else:
+                    yield bytes(buffer)
+            buffer.clear()
+            start = end + 1
+        if not skipping:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                buffer.clear()
+                skipping = True
+                yield LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+    if buffer and not skipping:
+        yield bytes(buffer)
+
+
+async def diagnose(row: DiagnosisRow, service: TroubleshootService, conclusion: bool = True, fast: bool = False) -> dict:
+    """Metrics, reboot decision and (optionally) conclusion for one stored test result."""
+    metrics = await parse_test_results(row.auto_test_results)
+    decision = await service.should_reboot_router(metrics, [], [], fast=fast)
+    result = {"id": row.id, "metrics": metrics.to_dict(), "reboot": asdict(decision)}
+    if conclusion:
+        session = ChatSession(
+            issue_description=row.issue, auto_test_results=row.auto_test_results, metrics=metrics, fast_mode=fast,
+        )
+        result["conclusion"] = await service.generate_conclusion(session, decision)
+    return result
+
+
+async def diagnose_lines(
+    lines: AsyncIterable[bytes | str | LineTooLong],
+    service: TroubleshootService,
+    concurrency: int,
+    conclusion: bool = True,
+    fast: bool = False,
+) -> AsyncIterator[dict]:
+    """Diagnose JSONL rows with at most `concurrency` in flight, yielding results as they finish.
+
+    Rows that fail to parse or to diagnose yield an `error` entry instead of
+    ending the batch. A final `summary` entry counts the rows.
+    """
+    start = time.perf_counter()
+    counts = {"rows": 0, "ok": 0, "errors": 0}
+
+    async def run(line_no: int, line: bytes | str | LineTooLong) -> dict:
+        row_id = None
+        try:
+            if isinstance(line, LineTooLong):
+                raise line
+            row = DiagnosisRow.model_validate_json(line)
+            row_id = row.id
+            result = {"line": line_no, **await diagnose(row, service, conclusion, fast)}
+            counts["ok"] += 1
+            rows_total.inc("ok")
+            return result
+        except LineTooLong as e:
+            error = str(e)
+        except ValidationError as e:
+            row_id = _raw_id(line)
+            error = _validation_summary(e)
+        except Exception as e:
+            logger.error("Diagnosis of line %s failed: %s", line_no, e)
+            error = "Diagnosis failed."
+        counts["errors"] += 1
+        rows_total.inc("error")
+        return {"line": line_no, "id": row_id, "error": error}
+
+    pending: set[asyncio.Task] = set()
+    try:
+        line_no = 0
+        async for line in lines:
+            line_no += 1
+            if not isinstance(line, LineTooLong) and not line.strip():
+                continue
+            counts["rows"] += 1
+            pending.add(asyncio.create_task(run(line_no, line)))
+            if len(pending) >= concurrency:
+                # Full: stop reading until a row finishes
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                done = {task for task in pending if task.done()}
+                pending -= done
+            for task in done:
+                yield task.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # The consumer went away (e.g. client disconnect): drop unfinished rows
+        for task in pending:
+            task.cancel()
+
+    yield {"summary": {**counts, "elapsed_seconds": round(time.perf_counter() - start, 3)}}
+
+
+def _validation_summary(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"Invalid row: {location}: {first['msg']}" if location else f"Invalid row: {first['msg']}"
+
+
+def _raw_id(line: bytes | str) -> str | None:
+    # Echo the id of a row that failed validation, if it has a usable one
+    try:
+        row_id = json.loads(line).get("id")
+    except (ValueError, AttributeError):
+        return None
+    return row_id if isinstance(row_id, str) else None
+
+
+def to_ndjson(result: dict) -> bytes:
+    return json.dumps(result, ensure_ascii=False).encode() + b"\n"
@@ -0,0 +1,169 @@
+# history.py
+"""Append-only store of completed diagnostics, queried with NumPy.
+
+Each finished conversation becomes one fixed-width record: categorical
+fields as small integer codes, metrics as float32 with NaN for unknown.
+Records are appended with a single write, so concurrent workers never
+interleave partial rows. Queries memory-map the file and read each field as
+a strided column, so aggregates over millions of rows never build Python
+objects per row.
+"""
+import logging
+import os
+import time
+import numpy as np
+from app.core.config import settings
+from app.models.metrics import NetworkMetrics
+from app.models.schemas import ConnectionType, DeviceType
+
+logger = logging.getLogger(__name__)
+
+# Code tables are append-only: stored codes index into them, so never reorder
+# (they follow the request enums' declaration order)
+CONNECTION_TYPES = tuple(t.value for t in ConnectionType)
+DEVICE_TYPES = tuple(t.value for t in DeviceType)
+OUTCOMES = ("resolved", "escalated")
+
+RECORD = np.dtype([
+    ("ended_at", "<f8"),
+    ("connection", "u1"),
+    ("device", "u1"),
+    ("outcome", "u1"),
+    ("questions", "u1"),
+    ("connected", "i1"),  # 1, 0 or -1 for unknown
+    ("speed_mbps", "<f4"),
+    ("latency_ms", "<f4"),
+    ("packet_loss_pct", "<f4"),
+    ("jitter_ms", "<f4"),
+])
+
+_PERCENTILES = (50, 95)
+
+
+def _code(table: tuple[str, ...], value: str | None) -> int:
+    if value is None:
+        return 0
+    try:
+        return table.index(value)
+    except ValueError:
+        return 1  # "other"
+
+
+def _float(value) -> float:
+    return np.nan if value is None else value
+
+
+def to_record(metrics: NetworkMetrics | None, outcome: str, questions: int, ended_at: float | None = None) -> np.ndarray:
+    """One history row for a finished session."""
+    metrics = metrics or NetworkMetrics()
+    row = np.zeros(1, dtype=RECORD)
+    row[0] = (
+        time.time() if ended_at is None else ended_at,
+        _code(CONNECTION_TYPES, metrics.connection_type),
+        _code(DEVICE_TYPES, metrics.device_type),
+        OUTCOMES.index(outcome),
+        min(questions, 255),
+        -1 if metrics.connected is None else int(metrics.connected),
+        _float(metrics.speed_mbps),
+        _float(metrics.latency_ms),
+        _float(metrics.packet_loss_pct),
+        _float(metrics.jitter_ms),
+    )
+    return row
+
+
+class HistoryStore:
+    """Fixed-width record file with vectorized aggregate queries."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # O_APPEND: each record lands whole at the end even with several writers
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        logger.info("Diagnostics history at %s", path)
+
+    def append(self, metrics: NetworkMetrics | None, outcome: str, questions: int):
+        os.write(self._fd, to_record(metrics, outcome, questions).tobytes())
+
+    def append_many(self, rows: np.ndarray):
+        """Append pre-built records, e.g. when importing or seeding."""
+        data = memoryview(np.ascontiguousarray(rows, dtype=RECORD)).cast("B")
+        while data:
+            data = data[os.write(self._fd, data):]
+
+    def rows(self) -> np.ndarray:
+        """Memory-mapped view of every complete record."""
+        count = os.path.getsize(self.path) // RECORD.itemsize
+        if count == 0:
+            return np.zeros(0, dtype=RECORD)
+        # A torn write at the tail is ignored rather than misread
+        return np.memmap(self.path, dtype=RECORD, mode="r", shape=(count,))
+
+    def aggregates(self, since: float | None = None) -> dict:
+        """Resolution rates, metric percentiles and question counts over the stored history."""
+        rows = self.rows()
+        if since is not None:
+            rows = rows[rows["ended_at"] >= since]
+        connection = np.asarray(rows["connection"])
+        device = np.asarray(rows["device"])
+        resolved = np.asarray(rows["outcome"]) == OUTCOMES.index("resolved")
+
+        sessions_by_connection = np.bincount(connection, minlength=len(CONNECTION_TYPES))
+        resolved_by_connection = np.bincount(connection, weights=resolved, minlength=len(CONNECTION_TYPES))
+        resolution = {
+            name: {
+                "sessions": int(sessions_by_connection[code]),
+                "resolved": int(resolved_by_connection[code]),
+                "rate": round(float(resolved_by_connection[code] / sessions_by_connection[code]), 4),
+            }
+            for code, name in enumerate(CONNECTION_TYPES) if sessions_by_connection[code]
+        }
+
+        speed = np.asarray(rows["speed_mbps"])
+        latency = np.asarray(rows["latency_ms"])
+        by_device = {}
+        for code in np.flatnonzero(np.bincount(device, minlength=len(DEVICE_TYPES))):
+            mask = device == code
+            by_device[DEVICE_TYPES[code]] = {
+                "sessions": int(mask.sum()),
+                "speed_mbps": _percentiles(speed[mask]),
+                "latency_ms": _percentiles(latency[mask]),
+            }
+
+        question_counts = np.bincount(np.asarray(rows["questions"]))
+        return {
+            "sessions": int(len(rows)),
+            "resolution_rate": round(float(resolved.mean()), 4) if len(rows) else None,
+            "resolution_by_connection": resolution,
+            "metrics_by_device": by_device,
+            "questions": {str(n): int(c) for n, c in enumerate(question_counts) if c},
+        }
+
+    def close(self):
+        os.close(self._fd)
+
+
+def _percentiles(values: np.ndarray) -> dict:
+    known = values[~np.isnan(values)]
+    if not len(known):
+        return {f"p{p}": None for p in _PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(_PERCENTILES, np.percentile(known, _PERCENTILES))}
+
+
+def build_history_store() -> HistoryStore | None:
+    """The configured history store, or None when HISTORY_PATH is unset."""
+    return HistoryStore(settings.history_path) if settings.history_path else None
+
+
+history = build_history_store()
+
+
+def record(metrics: NetworkMetrics | None, outcome: str, questions: int):
+    """Append a finished session to the configured store, if any."""
+    if history is None:
+        return
+    try:
+        history.append(metrics, outcome, questions)
+    except OSError as e:
+        logger.error("Failed to record diagnostics history: %s", e)
@@ -0,0 +1,103 @@
+# llm_client.py
+import importlib.util
+import logging
+import os
+from typing import TYPE_CHECKING
+from app.core.config import settings
+
+# The OpenAI SDK and httpx take a few hundred ms to import; they load when the
+# first client is built rather than at startup
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 without it."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive_connections,
+        keepalive_expiry=settings.llm_keepalive_expiry,
+    )
+
+
+def build_transport() -> "httpx.AsyncHTTPTransport":
+    """Build the keep-alive connection pool shared by every LLM call."""
+    import httpx
+
+    limits = _limits()
+    http2 = settings.llm_http2 and http2_available()
+    logger.info(
+        "Building LLM connection pool (max=%s, keepalive=%s, expiry=%ss, http2=%s)",
+        limits.max_connections, limits.max_keepalive_connections, limits.keepalive_expiry, http2,
+    )
+    return httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+
+
+def build_http_client(transport: "httpx.AsyncHTTPTransport | None" = None) -> "httpx.AsyncClient":
+    """Build the HTTP client for LLM calls on top of `transport` (a new pool if omitted)."""
+    import httpx
+
+    return httpx.AsyncClient(
+        # Mounted rather than passed as `transport=`, which would switch off
+        # HTTP(S)_PROXY / NO_PROXY; proxy mounts from the environment are more
+        # specific and still take precedence over this catch-all
+        mounts={"all://": transport or build_transport()},
+        limits=_limits(),
+        http2=settings.llm_http2 and http2_available(),
+        timeout=httpx.Timeout(settings.llm_timeout, connect=10.0),
+    )
+
+
+def build_llm_client(http_client: "httpx.AsyncClient | None" = None) -> "AsyncOpenAI":
+    """Build an AsyncOpenAI client on top of the shared connection pool."""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=settings.openai_base_url,
+        http_client=http_client or build_http_client(),
+        # Retries are left to the scheduler, which knows the call's deadline
+        max_retries=0,
+    )
+
+
+async def warm_pool(http_client: "httpx.AsyncClient", url: str) -> bool:
+    """Open a connection to the API host so the first chat turn skips DNS and TLS setup."""
+    try:
+        await http_client.head(url, timeout=5.0)
+        return True
+    except Exception as e:
+        logger.warning("LLM connection pool warm-up failed: %s", e)
+        return False
+
+
+def pool_stats(http_client: "httpx.AsyncClient", transport: "httpx.AsyncHTTPTransport") -> dict:
+    """Report connection counts of the pool behind `transport`, which this app built."""
+    # httpx has no public accessor for its httpcore pool; read it when present
+    pool = getattr(transport, "_pool", None)
+    stats = {
+        "closed": http_client.is_closed,
+        "http2": settings.llm_http2 and http2_available(),
+        "connections": 0,
+        "idle": 0,
+        "active": 0,
+        "max_connections": settings.llm_max_connections,
+        "max_keepalive_connections": settings.llm_max_keepalive_connections,
+        "keepalive_expiry": settings.llm_keepalive_expiry,
+    }
+    for connection in getattr(pool, "connections", ()):
+        stats["connections"] += 1
+        if connection.is_idle():
+            stats["idle"] += 1
+        else:
+            stats["active"] += 1
+    return stats
@@ -0,0 +1,343 @@
+# llm_scheduler.py
+"""Admission control for outbound LLM calls.
+
+Every LLM call goes through one scheduler per process. At most
+`max_concurrency` calls run at once; further calls wait in a FIFO queue of
+at most `max_queue` entries and are rejected beyond it. Each call has a
+deadline that covers queueing, retries and the request itself. Rate limits,
+connection errors and 5xx responses are retried with full-jitter
+exponential backoff (honouring Retry-After) while the deadline allows.
+
+Consecutive provider failures open a circuit breaker: calls fail fast with
+`LLMUnavailable` for a cooldown, then a single probe call decides whether
+to close it again. Callers catch `LLMUnavailable` and answer with a
+degraded response instead of a 500.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+from app.core.config import settings
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_END = object()
+
+
+class LLMUnavailable(Exception):
+    """An LLM call was not made or did not complete; `reason` says why.
+
+    Reasons: queue_full, circuit_open, deadline, exhausted (retryable errors
+    until the retry budget or deadline ran out) and rejected (a provider
+    error that retrying cannot fix).
+    """
+
+    def __init__(self, call_site: str, reason: str):
+        super().__init__(f"LLM call '{call_site}' unavailable: {reason}")
+        self.call_site = call_site
+        self.reason = reason
+        # Read by telemetry.LLMCallTimer to classify the call
+        self.outcome = "timeout" if reason == "deadline" else "unavailable"
+
+
+queue_wait_seconds = telemetry.registry.histogram(
+    "wifi_llm_queue_wait_seconds", "Time LLM calls waited for a concurrency slot.", ("call_site",),
+)
+retries = telemetry.registry.counter(
+    "wifi_llm_retries_total", "LLM call attempts retried after a retryable error.", ("call_site",),
+)
+rejected = telemetry.registry.counter(
+    "wifi_llm_rejected_total",
+    "LLM calls that failed fast or gave up, by reason (queue_full, circuit_open, deadline, exhausted, rejected).",
+    ("call_site", "reason"),
+)
+degraded = telemetry.registry.counter(
+    "wifi_degraded_responses_total", "Responses served without the LLM because it was unavailable.", ("call_site",),
+)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_queue: int = 200,
+        deadline: float = 30.0,
+        max_retries: int = 2,
+        retry_base: float = 0.25,
+        retry_max: float = 4.0,
+        breaker_failures: int = 5,
+        breaker_cooldown: float = 30.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    # -- public API --------------------------------------------------------
+
+    async def call(self, call_site: str, attempt: Callable[[], Awaitable[T]], deadline: float | None = None) -> T:
+        """Run `attempt()` under the concurrency limit, retrying retryable errors until the deadline."""
+        result = await self._run(call_site, attempt, deadline)
+        self._release()
+        return result
+
+    async def stream(
+        self, call_site: str, open_stream: Callable[[], Awaitable[AsyncIterator[T]]], deadline: float | None = None,
+    ) -> AsyncIterator[T]:
+        """Yield from the stream `open_stream()` returns, holding a slot until it ends.
+
+        The deadline and retries cover opening the stream and its first
+        chunk; once output has started, failures are passed to the caller.
+        """
+        async def first_chunk():
+            stream = await open_stream()
+            iterator = stream.__aiter__()
+            try:
+                return stream, iterator, await iterator.__anext__()
+            except StopAsyncIteration:
+                return stream, iterator, _END
+            except BaseException:
+                # A retry or the deadline abandons this stream; free its connection
+                await _close_stream(stream)
+                raise
+
+        stream, iterator, chunk = await self._run(call_site, first_chunk, deadline)
+        try:
+            while chunk is not _END:
+                yield chunk
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    chunk = _END
+        finally:
+            try:
+                # Ending early must close the HTTP response, or its pooled
+                # connection stays checked out until garbage collection
+                await _close_stream(stream)
+            finally:
+                self._release()
+
+    @property
+    def saturated(self) -> bool:
+        """True when every slot is taken, so a new call would have to queue."""
+        return self._active >= self.max_concurrency or bool(self._waiters)
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.breaker_cooldown:
+            return HALF_OPEN
+        return self._state
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "in_flight": self._active,
+            "queued": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "consecutive_failures": self._failures,
+            "cooldown_remaining": (
+                round(max(0.0, self.breaker_cooldown - (time.monotonic() - self._opened_at)), 3)
+                if self._state == OPEN else 0.0
+            ),
+        }
+
+    def reset(self):
+        """Close the breaker and forget failures (tests and manual recovery)."""
+        self._state = CLOSED
+        self._failures = 0
+        self._probing = False
+
+    # -- internals ---------------------------------------------------------
+
+    async def _run(self, call_site: str, attempt: Callable[[], Awaitable[T]], deadline: float | None) -> T:
+        """Like `call`, but returns with the slot still held; the caller releases it."""
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + (deadline if deadline is not None else self.deadline)
+        probe = self._admit(call_site)
+        try:
+            retry = 0
+            while True:
+                await self._acquire(call_site, deadline_at)
+                try:
+                    async with asyncio.timeout_at(deadline_at):
+                        result = await attempt()
+                except TimeoutError:
+                    self._release()
+                    self._record_failure(call_site, probe)
+                    raise self._reject(call_site, "deadline") from None
+                except asyncio.CancelledError:
+                    # The caller went away (client disconnect, or a hedge that lost)
+                    self._release()
+                    raise
+                except Exception as e:
+                    self._release()
+                    if not _is_retryable(e):
+                        if _is_provider_error(e):
+                            raise self._reject(call_site, "rejected") from e
+                        raise
+                    self._record_failure(call_site, probe)
+                    delay = self._backoff(retry, e)
+                    if probe or retry >= self.max_retries or self._state == OPEN or loop.time() + delay >= deadline_at:
+                        raise self._reject(call_site, "exhausted") from e
+                    retry += 1
+                    retries.inc(call_site)
+                    logger.warning("LLM call %s failed (%s); retry %s in %.2fs", call_site, type(e).__name__, retry, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                self._record_success(probe)
+                return result
+        finally:
+            if probe:
+                self._probing = False
+
+    def _admit(self, call_site: str) -> bool:
+        """Fail fast while the breaker is open; returns True for the half-open probe call."""
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        raise self._reject(call_site, "circuit_open")
+
+    async def _acquire(self, call_site: str, deadline_at: float):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(call_site, "queue_full")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout_at(deadline_at):
+                # _release hands its slot over by resolving the waiter
+                await waiter
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            if isinstance(e, TimeoutError):
+                raise self._reject(call_site, "deadline") from None
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            queue_wait_seconds.observe(time.perf_counter() - start, call_site)
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _backoff(self, retry: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, at least as long as any Retry-After."""
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** retry))
+        retry_after = _retry_after(error)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _record_success(self, probe: bool):
+        self._failures = 0
+        if probe or self._state != CLOSED:
+            logger.info("LLM circuit closed")
+        self._state = CLOSED
+
+    def _record_failure(self, call_site: str, probe: bool):
+        self._failures += 1
+        if probe or (self._state == CLOSED and self._failures >= self.breaker_failures):
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+            logger.error(
+                "LLM circuit opened after %s consecutive failures (last at %s); failing fast for %ss",
+                self._failures, call_site, self.breaker_cooldown,
+            )
+
+    def _reject(self, call_site: str, reason: str) -> LLMUnavailable:
+        rejected.inc(call_site, reason)
+        return LLMUnavailable(call_site, reason)
+
+
+async def _close_stream(stream):
+    # openai's AsyncStream has close(); a plain async generator has aclose()
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if close is not None:
+        await close()
+
+
+def _is_provider_error(error: Exception) -> bool:
+    # Imported here rather than at startup; loaded once an LLM call has been made
+    from openai import APIError
+
+    return isinstance(error, APIError)
+
+
+def _is_retryable(error: Exception) -> bool:
+    import httpx
+    from openai import APIConnectionError, APIStatusError
+
+    if isinstance(error, APIStatusError):
+        return error.status_code in _RETRYABLE_STATUS
+    # APIConnectionError covers the SDK's timeouts
+    return isinstance(error, (APIConnectionError, httpx.TransportError, ConnectionError))
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+scheduler = LLMScheduler(
+    max_concurrency=settings.llm_max_concurrency,
+    max_queue=settings.llm_max_queue,
+    deadline=settings.llm_deadline_seconds,
+    max_retries=settings.llm_max_retries,
+    retry_base=settings.llm_retry_base_seconds,
+    retry_max=settings.llm_retry_max_seconds,
+    breaker_failures=settings.llm_breaker_failures,
+    breaker_cooldown=settings.llm_breaker_cooldown_seconds,
+)
+telemetry.registry.gauge(
+    "wifi_llm_queue_depth", "LLM calls waiting for a concurrency slot.",
+    collect=lambda: {(): len(scheduler._waiters)},
+)
+telemetry.registry.gauge(
+    "wifi_llm_in_flight", "LLM calls holding a concurrency slot.",
+    collect=lambda: {(): scheduler._active},
+)
+telemetry.registry.gauge(
+    "wifi_llm_circuit_state", "1 for the LLM circuit breaker's current state (closed, open, half_open).", ("state",),
+    collect=lambda: {(s,): int(scheduler.state == s) for s in (CLOSED, OPEN, HALF_OPEN)},
+)
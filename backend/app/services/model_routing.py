@@ -0,0 +1,230 @@
+# model_routing.py
+"""Per-call-site model routing with latency SLOs and hedged requests.
+
+Each LLM call site has a route: the model tier it runs on, an output cap,
+a latency SLO and whether it may be hedged. The YES/NO classifiers run on a
+small model capped at a few tokens; questions and conclusions stay on the
+large model. LLM_ROUTES overrides any field per call site, so tiers and
+SLOs can be tuned without touching the service code.
+
+A hedged call that has not answered by its call site's recent p95 latency
+(capped at the SLO) sends one duplicate request and takes whichever answers
+first. Hedges are skipped while the scheduler is saturated, where an extra
+request would only add load. Streams are routed but never hedged.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from typing import Awaitable, Callable, TypeVar
+from app.core.config import settings
+from app.services import telemetry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SMALL_MODEL = "gpt-4o-mini"
+LARGE_MODEL = "gpt-4o"
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+    call_site: str
+    model: str
+    max_tokens: int | None
+    slo_seconds: float
+    hedge: bool = False
+
+
+DEFAULT_ROUTES = {
+    route.call_site: route for route in (
+        # YES/NO classifiers: small model, a couple of output tokens
+        Route("validation", SMALL_MODEL, 3, 1.0, hedge=True),
+        Route("resolution", SMALL_MODEL, 3, 1.0, hedge=True),
+        Route("reboot", SMALL_MODEL, 3, 1.5, hedge=True),
+        # One short question
+        Route("question", LARGE_MODEL, 120, 3.0, hedge=True),
+        # Long Markdown answer; a duplicate would double the most expensive call.
+        # The cap only guards against runaway output, well above a full checklist
+        Route("conclusion", LARGE_MODEL, 2000, 10.0),
+    )
+}
+
+routed = telemetry.registry.counter(
+    "wifi_llm_routed_total", "LLM calls by call site and the model they were routed to.", ("call_site", "model"),
+)
+slo_misses = telemetry.registry.counter(
+    "wifi_llm_slo_misses_total", "Routed LLM calls that took longer than their call site's SLO.", ("call_site",),
+)
+truncated = telemetry.registry.counter(
+    "wifi_llm_truncated_total", "LLM replies cut off by their call site's output cap.", ("call_site",),
+)
+hedges = telemetry.registry.counter(
+    "wifi_llm_hedges_total", "Hedged LLM calls by which request answered first (primary, hedge, or none when both failed).",
+    ("call_site", "winner"),
+)
+
+
+class RouteStats:
+    """Recent latencies of one call site, with a p95 refreshed every few calls."""
+
+    __slots__ = ("latencies", "calls", "slo_misses", "hedged", "hedge_wins", "p95", "_stale")
+
+    def __init__(self, window: int):
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.slo_misses = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.p95: float | None = None
+        self._stale = 0
+
+    def observe(self, seconds: float):
+        self.latencies.append(seconds)
+        self.calls += 1
+        self._stale += 1
+        # Sorting a couple of hundred floats is cheap, but not on every call:
+        # refresh once 5% of the window is new
+        if self._stale * 20 >= len(self.latencies):
+            ordered = sorted(self.latencies)
+            self.p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+            self._stale = 0
+
+
+class ModelRouter:
+    def __init__(
+        self, routes: dict[str, Route] | None = None, hedging: bool = True,
+        min_samples: int = 20, window: int = 200,
+    ):
+        self.routes = dict(routes or DEFAULT_ROUTES)
+        self.hedging = hedging
+        self.min_samples = min_samples
+        self.window = window
+        self._stats: dict[str, RouteStats] = {}
+
+    def route(self, call_site: str) -> Route:
+        route = self.routes.get(call_site)
+        if route is None:
+            route = self.routes[call_site] = Route(call_site, LARGE_MODEL, None, 10.0)
+        return route
+
+    def params(self, call_site: str) -> dict:
+        """Request parameters the route sets: the model, and the output cap if it has one."""
+        route = self.route(call_site)
+        routed.inc(call_site, route.model)
+        params = {"model": route.model}
+        if route.max_tokens is not None:
+            params["max_tokens"] = route.max_tokens
+        return params
+
+    def hedge_delay(self, call_site: str) -> float:
+        """Time after which a call is duplicated: the recent p95, at most the SLO."""
+        route = self.route(call_site)
+        stats = self._stats.get(call_site)
+        if stats is None or len(stats.latencies) < self.min_samples:
+            return route.slo_seconds
+        return min(route.slo_seconds, stats.p95)
+
+    async def call(self, call_site: str, attempt: Callable[[], Awaitable[T]], can_hedge: bool = True) -> T:
+        """Run `attempt()`, duplicating it once if the route allows and it runs past its hedge delay."""
+        route = self.route(call_site)
+        start = time.perf_counter()
+        if not (self.hedging and route.hedge and can_hedge):
+            result = await attempt()
+        else:
+            result = await self._hedged(call_site, attempt)
+        self.observe(call_site, time.perf_counter() - start)
+        return result
+
+    def check_finish(self, call_site: str, finish_reason: str | None) -> bool:
+        """True when a reply ended on its own; False (logged and counted) when the output cap cut it off."""
+        if finish_reason != "length":
+            return True
+        truncated.inc(call_site)
+        logger.warning("LLM reply for %s hit its max_tokens cap of %s", call_site, self.route(call_site).max_tokens)
+        return False
+
+    def observe(self, call_site: str, seconds: float):
+        stats = self._stats.get(call_site)
+        if stats is None:
+            stats = self._stats[call_site] = RouteStats(self.window)
+        stats.observe(seconds)
+        if seconds > self.route(call_site).slo_seconds:
+            stats.slo_misses += 1
+            slo_misses.inc(call_site)
+
+    async def _hedged(self, call_site: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        primary = asyncio.ensure_future(attempt())
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay(call_site))
+        except BaseException:
+            primary.cancel()
+            raise
+        if done:
+            return primary.result()
+
+        hedge = asyncio.ensure_future(attempt())
+        stats = self._stats.setdefault(call_site, RouteStats(self.window))
+        stats.hedged += 1
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = "hedge" if task is hedge else "primary"
+                        hedges.inc(call_site, winner)
+                        if task is hedge:
+                            stats.hedge_wins += 1
+                        return task.result()
+                    # One request failing is what the other is for; wait for it
+                    error = error or task.exception()
+            hedges.inc(call_site, "none")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def reset(self):
+        """Forget recorded latencies and hedge counts (tests and after retuning routes)."""
+        self._stats.clear()
+
+    def stats(self) -> dict:
+        """Per call site: its route, hedge delay, recent p95, SLO misses and hedge win rate."""
+        report = {}
+        for call_site, route in self.routes.items():
+            stats = self._stats.get(call_site)
+            entry = {**asdict(route), "hedge_delay_seconds": round(self.hedge_delay(call_site), 4)}
+            if stats is not None:
+                entry.update(
+                    calls=stats.calls,
+                    p95_seconds=round(stats.p95, 4) if stats.p95 is not None else None,
+                    slo_misses=stats.slo_misses,
+                    hedged=stats.hedged,
+                    hedge_wins=stats.hedge_wins,
+                    hedge_win_rate=round(stats.hedge_wins / stats.hedged, 4) if stats.hedged else None,
+                )
+            del entry["call_site"]
+            report[call_site] = entry
+        return report
+
+
+def build_routes(overrides: dict[str, dict]) -> dict[str, Route]:
+    """The default routes with LLM_ROUTES fields applied, e.g. {"question": {"model": "gpt-4o-mini"}}."""
+    routes = dict(DEFAULT_ROUTES)
+    for call_site, fields in overrides.items():
+        base = routes.get(call_site) or Route(call_site, LARGE_MODEL, None, 10.0)
+        routes[call_site] = replace(base, **fields)
+        logger.info("LLM route for %s: %s", call_site, routes[call_site])
+    return routes
+
+
+router = ModelRouter(
+    build_routes(settings.llm_routes),
+    hedging=settings.llm_hedging,
+    min_samples=settings.llm_hedge_min_samples,
+)
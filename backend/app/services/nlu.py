@@ -0,0 +1,294 @@
+# nlu.py
+"""Local fast-path classifiers for short user replies.
+
+Rules and a small token-weight model decide the easy cases (yes/no, counts,
+durations, device types, "it works now") without an LLM round trip. Every
+decision carries a confidence; callers fall back to the LLM below a threshold.
+"""
+import math
+import re
+from dataclasses import dataclass
+from typing import Any
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_CLAUSE_RE = re.compile(r"[,.;:!?\n]+")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_YES_NO_QUESTION_RE = re.compile(
+    r"^\W*(is|are|do|does|did|have|has|had|can|could|was|were|will|would|should)\b"
+)
+
+YES_WORDS = frozenset({
+    "yes", "yeah", "yea", "yep", "yup", "y", "sure", "correct", "right", "affirmative",
+    "definitely", "absolutely", "certainly", "indeed", "ok", "okay", "true", "done",
+})
+NO_WORDS = frozenset({"no", "nope", "nah", "n", "negative", "never", "false", "none"})
+NEGATORS = frozenset({
+    "not", "no", "never", "isn't", "aren't", "wasn't", "weren't", "don't", "doesn't",
+    "didn't", "haven't", "hasn't", "can't", "cannot", "won't", "nothing", "hardly",
+})
+UNSURE_PHRASES = ("not sure", "don't know", "dont know", "idk", "no idea", "unsure", "maybe", "dunno")
+
+NUMBER_WORDS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fifteen": 15, "twenty": 20,
+    "a couple": 2, "couple": 2, "a few": 3, "few": 3, "several": 4, "many": 10, "dozen": 12,
+}
+DURATION_UNITS = {
+    "second": 1 / 60, "sec": 1 / 60, "minute": 1, "min": 1, "hour": 60, "hr": 60,
+    "day": 1440, "week": 10080, "month": 43200, "year": 525600,
+}
+DURATION_WORDS = {
+    "today": 0, "tonight": 0, "now": 0, "recently": 1440, "yesterday": 1440,
+    "never": None, "ages": 525600, "forever": 525600,
+}
+DEVICE_WORDS = {
+    "laptop": "laptop", "notebook": "laptop", "macbook": "laptop", "chromebook": "laptop",
+    "desktop": "desktop", "pc": "desktop", "computer": "desktop", "imac": "desktop",
+    "phone": "phone", "iphone": "phone", "android": "phone", "mobile": "phone", "smartphone": "phone",
+    "tablet": "tablet", "ipad": "tablet", "kindle": "tablet",
+    "tv": "tv", "roku": "tv", "firestick": "tv", "chromecast": "tv",
+    "console": "console", "xbox": "console", "playstation": "console", "ps5": "console", "switch": "console",
+}
+
+# Token weights for "is the issue resolved?"; positive means resolved.
+# A negator earlier in the same clause flips the sign ("not fine").
+RESOLUTION_WEIGHTS = {
+    "yes": 3.0, "yeah": 3.0, "yep": 3.0, "fixed": 3.0, "resolved": 3.0, "solved": 3.0,
+    "works": 2.5, "working": 2.0, "worked": 2.5, "fine": 1.5, "good": 1.5, "great": 2.0,
+    "better": 2.0, "perfect": 2.5, "faster": 1.5, "thanks": 0.5, "thank": 0.5, "awesome": 2.0,
+    "back": 0.5, "normal": 1.5, "stable": 1.5,
+    "no": -3.0, "nope": -3.0, "nah": -3.0, "still": -1.5, "worse": -2.5, "same": -1.5,
+    "slow": -1.5, "slower": -2.0, "drops": -1.5, "dropping": -1.5, "broken": -2.5,
+    "down": -1.0, "issue": -0.5, "issues": -0.5, "problem": -0.5, "problems": -0.5,
+    "nothing": -1.5, "disconnects": -1.5, "lagging": -1.5,
+}
+RESOLUTION_BIAS = -0.25
+
+
+@dataclass(frozen=True, slots=True)
+class Classification:
+    label: str
+    confidence: float
+    value: Any = None
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedAnswer:
+    kind: str  # "yes_no" | "number" | "duration" | "device" | "unsure" | "text" | "empty"
+    value: Any
+    confidence: float
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower().replace("’", "'"))
+
+
+def question_kind(question: str) -> str:
+    """Guess what kind of answer a follow-up question expects."""
+    q = question.lower()
+    if "how many" in q or "how much" in q or "number of" in q:
+        return "number"
+    if "how long" in q or "how often" in q or "when did" in q or "when was" in q or "last time" in q:
+        return "duration"
+    if re.search(r"\b(what|which) (kind of |type of )?devices?\b", q):
+        return "device"
+    # Generated questions may open with a remark; judge by the last interrogative sentence
+    asked = re.findall(r"[^.!?\n]+\?", q)
+    sentence = asked[-1].strip() if asked else q
+    if "(yes/no)" in q or _YES_NO_QUESTION_RE.match(sentence):
+        return "yes_no"
+    return "open"
+
+
+def parse_yes_no(tokens: list[str]) -> Classification | None:
+    """Read a yes/no reply, honouring negation ("not really", "no, I haven't")."""
+    if not tokens:
+        return None
+    head = tokens[0]
+    if head in YES_WORDS:
+        # "yes, but not ..." still answers yes; a trailing negated clause lowers confidence
+        negated = any(t in NEGATORS for t in tokens[1:3])
+        return Classification("yes", 0.75 if negated else 0.95, True)
+    if head in NO_WORDS or head in NEGATORS:
+        return Classification("no", 0.95, False)
+    yes = sum(t in YES_WORDS for t in tokens)
+    no = sum(t in NO_WORDS or t in NEGATORS for t in tokens)
+    if yes and not no:
+        return Classification("yes", 0.8, True)
+    if no and not yes:
+        return Classification("no", 0.8, False)
+    return None
+
+
+def parse_number(text: str, tokens: list[str]) -> float | None:
+    match = _NUMBER_RE.search(text)
+    if match:
+        return float(match.group())
+    lowered = " ".join(tokens)
+    for phrase, value in NUMBER_WORDS.items():
+        if re.search(rf"\b{phrase}\b", lowered):
+            return float(value)
+    if tokens and tokens[0] in ("none", "no", "nothing"):
+        return 0.0
+    return None
+
+
+def parse_duration(text: str, tokens: list[str]) -> float | None:
+    """Return a duration in minutes, if the reply states one."""
+    for i, token in enumerate(tokens):
+        unit = token.rstrip("s")
+        if unit in DURATION_UNITS:
+            amount = parse_number(" ".join(tokens[max(0, i - 2):i]), tokens[max(0, i - 2):i])
+            return (amount if amount is not None else 1.0) * DURATION_UNITS[unit]
+    for token in tokens:
+        if token in DURATION_WORDS:
+            return DURATION_WORDS[token]
+    return None
+
+
+def parse_device(tokens: list[str]) -> str | None:
+    for token in tokens:
+        if token in DEVICE_WORDS:
+            return DEVICE_WORDS[token]
+        if token.rstrip("s") in DEVICE_WORDS:
+            return DEVICE_WORDS[token.rstrip("s")]
+    return None
+
+
+def looks_like_gibberish(text: str, tokens: list[str]) -> bool:
+    if not tokens:
+        return True
+    if re.fullmatch(r"(.)\1{2,}", text.strip().lower()):
+        return True
+    # Keyboard mashing: no token has a vowel and nothing parses as a number.
+    # Short known words ("pc", "tv", "n") are real answers despite that.
+    return all(not re.search(r"[aeiouy0-9]", t) and not _is_known_word(t) for t in tokens)
+
+
+def _is_known_word(token: str) -> bool:
+    return token in YES_WORDS or token in NO_WORDS or token in DEVICE_WORDS
+
+
+def parse_answer(question: str, answer: str) -> ParsedAnswer:
+    """Parse a reply according to the kind of answer the question expects."""
+    text = (answer or "").strip()
+    if not text:
+        return ParsedAnswer("empty", None, 1.0)
+    tokens = tokenize(text)
+    lowered = text.lower()
+    if any(phrase in lowered for phrase in UNSURE_PHRASES):
+        return ParsedAnswer("unsure", None, 0.6)
+
+    kind = question_kind(question)
+    if kind == "number":
+        value = parse_number(text, tokens)
+        if value is not None:
+            return ParsedAnswer("number", value, 0.9)
+    elif kind == "duration":
+        value = parse_duration(text, tokens)
+        if value is not None or "never" in tokens:
+            return ParsedAnswer("duration", value, 0.9)
+    elif kind == "device":
+        value = parse_device(tokens)
+        if value is not None:
+            return ParsedAnswer("device", value, 0.9)
+
+    yes_no = parse_yes_no(tokens)
+    if yes_no is not None:
+        # A yes/no reply to a yes/no question is as good as it gets; to a
+        # how-many, when or which-device question it is not an answer the
+        # fast path should accept ("yes" to "How many devices?")
+        if kind == "yes_no":
+            return ParsedAnswer("yes_no", yes_no.value, yes_no.confidence)
+        if kind == "open":
+            return ParsedAnswer("yes_no", yes_no.value, yes_no.confidence - 0.15)
+        return ParsedAnswer("yes_no", yes_no.value, min(yes_no.confidence, 0.5))
+    return ParsedAnswer("text", text, 0.5)
+
+
+def classify_validity(question: str, answer: str) -> Classification:
+    """Decide whether `answer` is a usable reply to `question`."""
+    text = (answer or "").strip()
+    tokens = tokenize(text)
+    if not text:
+        return Classification("invalid", 0.95)
+
+    # Parse before the gibberish check so terse answers ("PC", "n") survive it
+    parsed = parse_answer(question, text)
+    if parsed.kind in ("yes_no", "number", "duration", "device"):
+        return Classification("valid", parsed.confidence, parsed.value)
+    if looks_like_gibberish(text, tokens):
+        return Classification("invalid", 0.95)
+    if parsed.kind == "unsure":
+        return Classification("valid", 0.55)
+    # Free text: several real words is probably an answer, one or two may not be
+    if len(tokens) >= 4:
+        return Classification("valid", 0.8)
+    return Classification("valid", 0.4)
+
+
+def classify_resolution(message: str) -> Classification:
+    """Decide whether a reply says the WiFi issue is now resolved."""
+    if not tokenize(message or ""):
+        return Classification("unresolved", 0.5, False)
+
+    score = RESOLUTION_BIAS
+    hits = 0
+    distant_negation = False
+    clause_signs = set()
+    # Negation does not reach across punctuation: "no, still slow" is not "not slow".
+    # Within a clause it does: "I don't think it's fixed" is not fixed.
+    for clause in _CLAUSE_RE.split(message):
+        tokens = tokenize(clause)
+        weights = []
+        last_negator = None
+        negator_slot = None  # index in `weights` of the last negator's own weight
+        for i, token in enumerate(tokens):
+            weight = RESOLUTION_WEIGHTS.get(token)
+            if weight is not None:
+                hits += 1
+                if last_negator is not None and token not in NEGATORS and token not in NO_WORDS:
+                    if weight < 0 and negator_slot is not None:
+                        # "no problems", "no more drops": the negator is part of a positive phrase
+                        weights[negator_slot] = 0.0
+                    weight = -weight
+                    distant_negation = distant_negation or i - last_negator > 2
+                weights.append(weight)
+            if token in NEGATORS:
+                last_negator = i
+                negator_slot = len(weights) - 1 if weight is not None else None
+        if sum(weights):
+            clause_signs.add(sum(weights) > 0)
+        score += sum(weights)
+
+    probability = 1.0 / (1.0 + math.exp(-score))
+    resolved = probability >= 0.5
+    confidence = abs(probability - 0.5) * 2
+    if hits == 0:
+        confidence = min(confidence, 0.3)
+    elif distant_negation or len(clause_signs) > 1:
+        # Long-range negation is easy to misread locally, and so are clauses that
+        # disagree ("no, it works now"); let the LLM confirm
+        confidence = min(confidence, 0.5)
+    return Classification("resolved" if resolved else "unresolved", confidence, resolved)
+
+
+class FastPathStats:
+    """Counts how often each decision was answered locally versus by the LLM."""
+
+    def __init__(self):
+        self.counts: dict[str, dict[str, int]] = {}
+
+    def record(self, decision: str, fast_path: bool):
+        counts = self.counts.setdefault(decision, {"fast_path": 0, "llm_fallback": 0})
+        counts["fast_path" if fast_path else "llm_fallback"] += 1
+
+    def snapshot(self) -> dict:
+        result = {}
+        for decision, counts in self.counts.items():
+            total = counts["fast_path"] + counts["llm_fallback"]
+            result[decision] = {**counts, "fast_path_rate": counts["fast_path"] / total if total else 0.0}
+        return result
+
+
+stats = FastPathStats()
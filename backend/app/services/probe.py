@@ -0,0 +1,133 @@
+# probe.py
+"""Round-trip probe run over a WebSocket.
+
+The server sends a train of sequenced, timestamped binary frames at a fixed
+interval and the client echoes each one back unchanged. Round-trip times
+are measured against the send times the server kept for itself, so a client
+cannot skew them. Frames not echoed by the end of a grace period count as
+lost. Everything runs on the event loop with no per-frame threads, so
+hundreds of probes can run next to chat traffic.
+"""
+import asyncio
+import logging
+import struct
+import time
+from dataclasses import asdict, dataclass
+from fastapi import WebSocket, WebSocketDisconnect
+from app.models.schemas import AutoTestResults, ProbeResults
+
+logger = logging.getLogger(__name__)
+
+# Sequence number and server send time (perf_counter seconds)
+FRAME = struct.Struct("!Id")
+
+
+@dataclass(frozen=True, slots=True)
+class ProbeResult:
+    sent: int
+    received: int
+    loss_pct: float
+    rtt_min_ms: float | None = None
+    rtt_p50_ms: float | None = None
+    rtt_p95_ms: float | None = None
+    rtt_p99_ms: float | None = None
+    rtt_max_ms: float | None = None
+    rtt_mean_ms: float | None = None
+    # Mean absolute difference between consecutive round trips (RFC 3550 style)
+    jitter_ms: float | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def summarize(sent: int, rtts: dict[int, float]) -> ProbeResult:
+    """Statistics over round-trip times (seconds) keyed by sequence number."""
+    received = len(rtts)
+    loss_pct = round(100.0 * (sent - received) / sent, 2) if sent else 0.0
+    if not received:
+        return ProbeResult(sent, 0, loss_pct)
+    import numpy as np
+
+    ordered = np.array([rtts[seq] for seq in sorted(rtts)]) * 1000.0
+    p50, p95, p99 = np.percentile(ordered, (50, 95, 99))
+    jitter = float(np.abs(np.diff(ordered)).mean()) if received > 1 else 0.0
+    return ProbeResult(
+        sent=sent,
+        received=received,
+        loss_pct=loss_pct,
+        rtt_min_ms=_ms(ordered.min()),
+        rtt_p50_ms=_ms(p50),
+        rtt_p95_ms=_ms(p95),
+        rtt_p99_ms=_ms(p99),
+        rtt_max_ms=_ms(ordered.max()),
+        rtt_mean_ms=_ms(ordered.mean()),
+        jitter_ms=_ms(jitter),
+    )
+
+
+def _ms(value) -> float:
+    return round(float(value), 3)
+
+
+async def run_probe(websocket: WebSocket, count: int, interval: float, grace: float) -> ProbeResult:
+    """Send `count` frames `interval` seconds apart and wait up to `grace` seconds for late echoes."""
+    sent_at: dict[int, float] = {}
+    rtts: dict[int, float] = {}
+    all_echoed = asyncio.Event()
+
+    async def receive():
+        while True:
+            message = await websocket.receive()
+            now = time.perf_counter()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            # Text frames (a keepalive, a stray JSON message) are not echoes
+            data = message.get("bytes")
+            if data is None or len(data) != FRAME.size:
+                continue
+            seq, _ = FRAME.unpack(data)
+            if seq in sent_at and seq not in rtts:
+                rtts[seq] = now - sent_at[seq]
+                if len(rtts) == count:
+                    all_echoed.set()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        next_send = time.perf_counter()
+        for seq in range(count):
+            if receiver.done():
+                # The client went away; report what was measured
+                break
+            sent_at[seq] = time.perf_counter()
+            await websocket.send_bytes(FRAME.pack(seq, sent_at[seq]))
+            # Keep to a fixed schedule so slow sends don't stretch the train
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        if not receiver.done():
+            try:
+                await asyncio.wait_for(all_echoed.wait(), grace)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        receiver.cancel()
+        try:
+            await receiver
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            pass
+    return summarize(len(sent_at), rtts)
+
+
+def attach_probe(results: AutoTestResults | None, probe: dict) -> AutoTestResults:
+    """Return test results carrying `probe` as their connectivity probe."""
+    results = results if results is not None else AutoTestResults()
+    connectivity = results.connectivity.model_copy(update={"probe": ProbeResults.model_validate(probe)})
+    return results.model_copy(update={"connectivity": connectivity})
+
+
+def carry_probe(previous: AutoTestResults | None, results: AutoTestResults | None) -> AutoTestResults | None:
+    """Keep a probe measured before the client reported its own test results."""
+    probe = previous.connectivity.probe if previous is not None else None
+    if probe is None or (results is not None and results.connectivity.probe is not None):
+        return results
+    return attach_probe(results, probe.model_dump())
+
@@ -0,0 +1,293 @@
+# prompts.py
+"""Prompt layout and token accounting for the troubleshooting LLM calls.
+
+Every prompt starts with static instructions, identical across sessions and
+turns, and per-session facts (issue, test results, Q/A history) follow in a
+later message. The Q/A history is held to a token budget: the latest pairs are
+kept verbatim and older ones are shortened, then dropped, until it fits.
+
+The static layout keeps the prompts ready for provider prefix caching, but
+OpenAI only caches prompts of 1024 tokens or more. The instructions here run
+from about 40 tokens (the YES/NO checks) to about 450 (questions), so
+`cached_tokens` in `stats` stays at zero today. Padding the instructions up to
+the minimum would bill more uncached tokens on every call than caching could
+save on these short prompts.
+"""
+import importlib.util
+import logging
+import math
+import re
+from app.core.config import settings
+from app.models.metrics import NetworkMetrics, display
+from app.services.rules import RebootDecision
+
+logger = logging.getLogger(__name__)
+
+QUESTION_INSTRUCTIONS = """You are a WiFi troubleshooting expert. Your role is to diagnose the user's WiFi issue by asking **ONE** question at a time, progressing from the most common causes to the least common.
+
+The user's issue, their test results, the questions asked so far with their answers, and the number of the question to ask follow in the next message.
+
+**Your core objectives:**
+- Review the previous questions already asked
+- Ask ONLY **one** clear, specific, and actionable troubleshooting question at a time.
+- Base each question on the test results, previous answers, and remaining unexplored categories.
+- Progress logically: start with the most common potential issues before moving to rarer ones.
+
+**Handling invalid or unhelpful responses:**
+- If the user gives an irrelevant, nonsense, evasive, or incomplete answer, **ask the same question again but in a different way** (simpler words, more context, or examples).
+- If they refuse to answer, reframe the question so it’s easier or more appealing to answer.
+- Keep re-asking in alternative forms until you receive a valid, useful answer.
+- Only move to a new topic when you have enough information about the current one.
+
+**Question Categories (reference order):**
+1. Network congestion & bandwidth usage
+2. Physical connection & hardware issues
+3. Router/Modem configuration & status
+4. Signal strength & interference
+5. Device-specific issues
+
+**Important final step:**
+- Once you’ve gathered enough information, provide a **specific technical conclusion**.
+- If a reboot is required, end your last response **exactly** with:
+  `Did the reboot improve your connection? (Yes/No)`
+- Do **not** add any text after this Yes/No question.
+
+Now, ask ONLY the **next** troubleshooting question — or, if ready, give the final conclusion with the reboot question."""
+
+CONCLUSION_INSTRUCTIONS = """You are a WiFi troubleshooting expert providing intelligent, personalized conclusions based on test results and user answers.
+
+Based on the test results and user answers in the next message, provide a specific, personalized conclusion that:
+1. Acknowledges the current status
+2. Provides specific recommendations based on the actual data
+3. Follows the reboot decision in the next message: if a reboot is recommended, include the reboot instructions and the reason; if not, do not suggest rebooting
+4. Asks 1 last follow up question: "Did the reboot improve your connection? (Yes/No)" when a reboot is recommended, otherwise "Did these steps improve your connection? (Yes/No)"
+5. Be conversational and helpful
+
+Format your answer using Markdown. Use `###` for section headings and `-` for bullet points. Make the analysis and recommendations intelligent and specific to this situation."""
+
+VALIDATION_INSTRUCTIONS = """You check whether a user's reply answers a WiFi troubleshooting question. Consider variations and be reasonably lenient.
+
+Answer only: YES or NO"""
+
+RESOLUTION_INSTRUCTIONS = """The user was asked whether their WiFi issue is now resolved. Their reply follows in the next message.
+
+Does the user say the issue is resolved? Answer only: YES or NO"""
+
+REBOOT_INSTRUCTIONS = """You are a diagnostic AI. The user's WiFi test results and their answers to troubleshooting questions follow in the next message.
+
+Should the user try rebooting the router? Answer only: YES or NO"""
+
+# Chat format overhead per message and for priming the reply
+_TOKENS_PER_MESSAGE = 4
+_TOKENS_PER_REPLY = 3
+_COMPACT_WORDS = 12
+
+_encoding = None
+
+
+def _tiktoken_encoding():
+    """The cl100k/o200k tokenizer if `tiktoken` is installed, else None."""
+    global _encoding
+    if _encoding is None:
+        if importlib.util.find_spec("tiktoken") is None:
+            _encoding = False
+        else:
+            import tiktoken
+            try:
+                _encoding = tiktoken.encoding_for_model("gpt-4o")
+            except Exception as e:
+                logger.warning("tiktoken unavailable (%s); approximating token counts", e)
+                _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Token count of `text`: exact with tiktoken, otherwise ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    """Input tokens a chat completion request will be billed for."""
+    return sum(_TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in messages) + _TOKENS_PER_REPLY
+
+
+def _shorten(text: str, words: int = _COMPACT_WORDS) -> str:
+    # Keep the actual question when a generated one opens with a remark
+    asked = re.findall(r"[^.!?\n]+\?", text)
+    text = asked[-1].strip() if asked else text.strip()
+    parts = text.split()
+    return text if len(parts) <= words else " ".join(parts[:words]) + " …"
+
+
+def history_lines(questions: list[str], answers: list[str], budget: int | None = None) -> list[str]:
+    """Q/A pairs as prompt lines, compacted from the oldest end to fit `budget` tokens."""
+    budget = settings.prompt_history_token_budget if budget is None else budget
+    pairs = list(zip(questions, answers))
+    full = [f"Q{i+1}: {q}\nA{i+1}: {a}" for i, (q, a) in enumerate(pairs)]
+    lines = list(full)
+    total = sum(count_tokens(line) for line in lines)
+
+    # First shorten older pairs, oldest first, always keeping the latest verbatim
+    for i in range(len(pairs) - 1):
+        if total <= budget:
+            return lines
+        q, a = pairs[i]
+        short = f"Q{i+1}: {_shorten(q)} A: {_shorten(a)}"
+        total += count_tokens(short) - count_tokens(lines[i])
+        lines[i] = short
+
+    # Then drop them, leaving a note of how many were omitted
+    dropped = 0
+    while total > budget and dropped < len(pairs) - 1:
+        total -= count_tokens(lines[dropped])
+        dropped += 1
+    if dropped:
+        logger.debug("Dropped %s Q/A pairs to fit the %s-token history budget", dropped, budget)
+        return [f"({dropped} earlier questions omitted)"] + lines[dropped:]
+    return lines
+
+
+def test_summary(metrics: NetworkMetrics | None) -> str:
+    metrics = metrics or NetworkMetrics()
+    summary = (
+        f"Connectivity: {display(metrics.connected)}, "
+        f"Speed: {display(metrics.speed_mbps)} Mbps, "
+        f"Latency: {display(metrics.latency_ms)} ms, "
+        f"Packet Loss: {display(metrics.packet_loss_pct)}%, "
+        f"Jitter: {display(metrics.jitter_ms)} ms, "
+        f"Connection Type: {display(metrics.connection_type)}, "
+        f"Device Type: {display(metrics.device_type)}"
+    )
+    if metrics.outlier_samples is None:
+        return summary
+    # Multi-sample runs: say how stable the medians above were
+    return summary + (
+        f"\nStability: Latency p95 {display(metrics.latency_p95_ms)} ms "
+        f"(stddev {display(metrics.latency_stddev_ms)} ms), "
+        f"Speed p5 {display(metrics.speed_p5_mbps)} Mbps "
+        f"(stddev {display(metrics.speed_stddev_mbps)} Mbps, trend {display(metrics.speed_trend_pct)}% over the test), "
+        f"Outlier samples: {metrics.outlier_samples}"
+    )
+
+
+def question_messages(
+    issue_description: str,
+    metrics: NetworkMetrics | None,
+    follow_up_questions: list[str],
+    user_answers: list[str],
+    question_number: int,
+) -> list[dict]:
+    """Messages asking for the next troubleshooting question."""
+    history = history_lines(follow_up_questions, user_answers)
+    # A question asked but not answered yet still counts as covered
+    pending = [
+        f"Q{i+1}: {_shorten(q)} (no answer yet)"
+        for i, q in enumerate(follow_up_questions[len(user_answers):], start=len(user_answers))
+    ]
+    context = "\n".join([
+        f"User's Issue: {issue_description}",
+        test_summary(metrics),
+        "Previous questions and answers:",
+        *(history + pending or ["(none yet)"]),
+        f"This is question #{question_number+1}.",
+    ])
+    return [
+        {"role": "system", "content": QUESTION_INSTRUCTIONS},
+        {"role": "user", "content": context},
+    ]
+
+
+def conclusion_messages(
+    issue_description: str,
+    metrics: NetworkMetrics | None,
+    follow_up_questions: list[str],
+    user_answers: list[str],
+    questions_asked: int,
+    decision: RebootDecision | None = None,
+) -> list[dict]:
+    """Messages asking for the final Markdown conclusion, following `decision` when one was made."""
+    history = history_lines(follow_up_questions, user_answers)
+    lines = [
+        f"Test Results: {test_summary(metrics)}",
+        f"User Issue: {issue_description}",
+        "User Answers:",
+        *(history or ["No answers provided yet"]),
+        f"Questions Asked: {questions_asked}",
+    ]
+    if decision is not None:
+        lines.append(f"Reboot Recommended: {'Yes' if decision.reboot else 'No'} ({decision.explanation})")
+    context = "\n".join(lines)
+    return [
+        {"role": "system", "content": CONCLUSION_INSTRUCTIONS},
+        {"role": "user", "content": context},
+    ]
+
+
+def validation_messages(question: str, user_input: str) -> list[dict]:
+    """Messages asking whether `user_input` answers `question`."""
+    return [
+        {"role": "system", "content": VALIDATION_INSTRUCTIONS},
+        {"role": "user", "content": f'Question: "{question}"\nUser response: "{user_input}"'},
+    ]
+
+
+def resolution_messages(user_message: str) -> list[dict]:
+    """Messages asking whether `user_message` says the issue is resolved."""
+    return [
+        {"role": "system", "content": RESOLUTION_INSTRUCTIONS},
+        {"role": "user", "content": f'User response: "{user_message}"'},
+    ]
+
+
+def reboot_messages(metrics: NetworkMetrics | None, follow_up_questions: list[str], user_answers: list[str]) -> list[dict]:
+    """Messages asking whether a router reboot is worth trying."""
+    # Answers whose question was not passed in are still worth showing
+    missing = len(user_answers) - len(follow_up_questions)
+    history = history_lines(follow_up_questions + ["(question not recorded)"] * missing, user_answers)
+    context = "\n".join([
+        test_summary(metrics),
+        "User Answers:",
+        *(history or ["No answers provided yet"]),
+    ])
+    return [
+        {"role": "system", "content": REBOOT_INSTRUCTIONS},
+        {"role": "user", "content": context},
+    ]
+
+
+class TokenStats:
+    """Per call site input-token counts: local estimate, billed and served from the provider's prefix cache."""
+
+    def __init__(self):
+        self.sites: dict[str, dict[str, int]] = {}
+
+    def record(self, call_site: str, messages: list[dict], usage=None):
+        site = self.sites.setdefault(
+            call_site, {"calls": 0, "estimated_tokens": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+        )
+        site["calls"] += 1
+        site["estimated_tokens"] += count_message_tokens(messages)
+        if usage is not None:
+            site["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            site["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            site["cached_tokens"] += getattr(details, "cached_tokens", 0) or 0
+
+    def snapshot(self) -> dict:
+        result = {}
+        for call_site, site in self.sites.items():
+            calls = site["calls"]
+            result[call_site] = {
+                **site,
+                "avg_prompt_tokens": round(site["prompt_tokens"] / calls, 1) if calls else 0.0,
+                "cached_rate": site["cached_tokens"] / site["prompt_tokens"] if site["prompt_tokens"] else 0.0,
+            }
+        return result
+
+
+stats = TokenStats()
@@ -0,0 +1,215 @@
+# question_bank.py
+"""Curated, versioned decision tree of follow-up questions.
+
+Questions cover the five categories of the question prompt: congestion,
+physical/hardware, router configuration, signal/interference and
+device-specific issues. Categories are visited in an order chosen from the
+test metrics (a failed connectivity test starts with hardware, a healthy
+line with the device); within a category, the parsed answer to the last
+question picks a follow-up branch. Guards use the reboot rules' feature
+names and operators, and `answer` for the parsed reply to the question
+being branched from.
+
+Picking a question is a few dict lookups and the answer parser, well under
+a millisecond, so the bank serves as the fallback when the LLM is
+unavailable and as the per-session fast mode. QUESTION_BANK_PATH replaces
+the built-in bank with a JSON file of the same shape.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any
+from app.core.config import settings
+from app.models.metrics import NetworkMetrics
+from app.services import nlu, rules, telemetry
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("congestion", "physical", "router", "signal", "device")
+_BRANCH_FEATURES = (*rules.FEATURES, "answer")
+
+served = telemetry.registry.counter(
+    "wifi_offline_questions_total", "Follow-up questions picked from the offline bank, by reason (fast_mode, degraded).",
+    ("reason",),
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Question:
+    id: str
+    category: str
+    text: str
+    # Asked only when every `when` condition holds and not all `unless` ones do
+    when: tuple[tuple[str, str, Any], ...] = ()
+    unless: tuple[tuple[str, str, Any], ...] = ()
+    # (conditions over features and `answer`, id of the next question); first match wins
+    branches: tuple[tuple[tuple[tuple[str, str, Any], ...], str], ...] = ()
+    # Entry questions open their category; others are only reached by a branch
+    entry: bool = True
+
+    def applies(self, features: dict) -> bool:
+        if not rules.conditions_hold(self.when, features):
+            return False
+        return not (self.unless and rules.conditions_hold(self.unless, features))
+
+
+@dataclass(frozen=True)
+class QuestionBank:
+    version: str
+    questions: tuple[Question, ...]
+    # (conditions over features, category order); first match wins, CATEGORIES otherwise
+    orders: tuple[tuple[tuple[tuple[str, str, Any], ...], tuple[str, ...]], ...] = ()
+    closing: str = "Is there anything else about the problem you think I should know?"
+
+    def __post_init__(self):
+        by_id = {q.id: q for q in self.questions}
+        for question in self.questions:
+            if question.category not in CATEGORIES:
+                raise ValueError(f"Question {question.id!r}: unknown category {question.category!r}")
+            for _, target in question.branches:
+                if target not in by_id:
+                    raise ValueError(f"Question {question.id!r}: branch to unknown question {target!r}")
+        for _, order in self.orders:
+            if set(order) - set(CATEGORIES):
+                raise ValueError(f"Unknown categories in order {order}")
+        # Lookup tables; the dataclass is frozen, so set them through object.__setattr__
+        object.__setattr__(self, "_by_id", by_id)
+        object.__setattr__(self, "_by_text", {q.text: q for q in self.questions})
+
+    def get(self, question_id: str) -> Question:
+        return self._by_id[question_id]
+
+    def order(self, features: dict) -> tuple[str, ...]:
+        for when, order in self.orders:
+            if rules.conditions_hold(when, features):
+                return order
+        return CATEGORIES
+
+    def next_question(
+        self, metrics: NetworkMetrics | None, questions: list[str], answers: list[str],
+    ) -> Question | None:
+        """The next question for a session, or None when the bank has nothing left to ask."""
+        features = rules.build_features(metrics, questions, answers)
+        asked = [q for q in map(self._by_text.get, questions) if q is not None]
+        asked_ids = {q.id for q in asked}
+
+        # Follow a branch of the question just answered
+        if questions and len(answers) >= len(questions) and (last := self._by_text.get(questions[-1])) is not None:
+            parsed = nlu.parse_answer(last.text, answers[-1])
+            expected = nlu.question_kind(last.text)
+            # A "no" to a "when did you..." question must not compare as the number 0
+            answer = parsed.value if expected == "open" or parsed.kind == expected else None
+            branch_features = {**features, "answer": answer}
+            for when, target in last.branches:
+                question = self._by_id[target]
+                if target not in asked_ids and rules.conditions_hold(when, branch_features) and question.applies(features):
+                    return question
+
+        visited = {q.category for q in asked}
+        for category in self.order(features):
+            if category in visited:
+                continue
+            for question in self.questions:
+                if question.entry and question.category == category and question.applies(features):
+                    return question
+        return None
+
+    def question_text(self, metrics: NetworkMetrics | None, questions: list[str], answers: list[str]) -> str:
+        question = self.next_question(metrics, questions, answers)
+        return question.text if question is not None else self.closing
+
+
+def _q(id, category, text, when=(), unless=(), branches=(), entry=True) -> Question:
+    return Question(id, category, text, tuple(when), tuple(unless), tuple(branches), entry)
+
+
+DEFAULT_BANK = QuestionBank(
+    version="2026.10.1",
+    questions=(
+        # Network congestion & bandwidth usage
+        _q("congestion_devices", "congestion",
+           "How many devices are connected to your WiFi right now, including phones, TVs and smart home gadgets?",
+           branches=[((("answer", ">=", 8),), "congestion_heavy_use")]),
+        _q("congestion_heavy_use", "congestion",
+           "Is anyone streaming video, gaming or downloading large files when the problem happens?", entry=False),
+        # Physical connection & hardware
+        _q("physical_offline", "physical",
+           "Is your router powered on, and are any of its lights red, orange or blinking in an unusual way?",
+           when=[("connected", "==", False)]),
+        _q("physical_other_devices", "physical",
+           "Do other devices on the same network have the same problem?",
+           branches=[
+               ((("answer", "==", True),), "physical_cables"),
+               ((("answer", "==", False),), "device_rejoin"),
+           ]),
+        _q("physical_cables", "physical",
+           "Are the cables between the wall, your modem and your router all firmly plugged in?", entry=False),
+        # Router/modem configuration & status
+        _q("router_last_restart", "router",
+           "When did you last restart your router?",
+           branches=[((("answer", "<", 60),), "router_changes")]),
+        _q("router_changes", "router",
+           "Have you changed any router settings, or has the router installed a firmware update recently?", entry=False),
+        # Signal strength & interference
+        _q("signal_distance", "signal",
+           "Is the problem worse when you are farther from the router, for example in another room or on another floor?",
+           unless=[("connection_type", "==", "ethernet")],
+           branches=[((("answer", "==", True),), "signal_interference")]),
+        _q("signal_interference", "signal",
+           "Is your router near a microwave, cordless phone, baby monitor, thick walls or large metal objects?", entry=False),
+        # Device-specific
+        _q("device_rejoin", "device",
+           "Have you tried turning this device off and on again, then forgetting and rejoining the WiFi network?",
+           branches=[((("answer", "==", True),), "device_software")]),
+        _q("device_software", "device",
+           "Is a VPN, firewall or security app running on this device?", entry=False),
+    ),
+    orders=(
+        # Nothing gets through: check the hardware first
+        ((("connected", "==", False),), ("physical", "router", "device", "signal", "congestion")),
+        # Loss and jitter point at the radio link before bandwidth
+        ((("packet_loss_pct", ">=", 2),), ("signal", "physical", "router", "congestion", "device")),
+        ((("jitter_ms", ">=", 30),), ("signal", "congestion", "physical", "router", "device")),
+        # The line itself tests fine: suspect the device and local signal
+        ((("speed_mbps", ">=", 25), ("latency_ms", "<", 100)), ("device", "signal", "physical", "router", "congestion")),
+    ),
+)
+
+
+def load_bank(path: str) -> QuestionBank:
+    """Load a bank from JSON: {"version", "questions": [...], "orders": [{"when", "categories"}], "closing"}."""
+    with open(path) as f:
+        data = json.load(f)
+    questions = tuple(
+        Question(
+            item["id"],
+            item["category"],
+            item["text"],
+            rules.parse_conditions(item.get("when", {}), name=item["id"]),
+            rules.parse_conditions(item.get("unless", {}), name=item["id"]),
+            tuple(
+                (rules.parse_conditions(branch["when"], _BRANCH_FEATURES, item["id"]), branch["next"])
+                for branch in item.get("branches", ())
+            ),
+            item.get("entry", True),
+        )
+        for item in data["questions"]
+    )
+    orders = tuple(
+        (rules.parse_conditions(item["when"], name="order"), tuple(item["categories"]))
+        for item in data.get("orders", ())
+    )
+    extra = {"closing": data["closing"]} if "closing" in data else {}
+    return QuestionBank(str(data["version"]), questions, orders, **extra)
+
+
+_active_bank: QuestionBank | None = None
+
+
+def active_bank() -> QuestionBank:
+    """The bank in force: QUESTION_BANK_PATH if configured, otherwise the built-in one."""
+    global _active_bank
+    if _active_bank is None:
+        _active_bank = load_bank(settings.question_bank_path) if settings.question_bank_path else DEFAULT_BANK
+        logger.info("Loaded question bank %s (%s questions)", _active_bank.version, len(_active_bank.questions))
+    return _active_bank
@@ -0,0 +1,199 @@
+# response_cache.py
+"""Cache of generated questions and conclusions.
+
+Sessions that describe the same kind of problem, measure similar speed and
+latency and are asked and answer the same way get the same cached question.
+Conclusions quote the exact measurements, so they are keyed on the exact
+prompt instead and only repeat for identical sessions. The memory
+tier is an LRU with a TTL; an optional SQLite tier keeps entries across
+restarts and shares them between workers.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app.core.config import settings
+from app.models.metrics import NetworkMetrics
+from app.services import nlu
+
+logger = logging.getLogger(__name__)
+
+SPEED_BUCKETS_MBPS = (1, 5, 10, 25, 50, 100, 250, 500)
+LATENCY_BUCKETS_MS = (20, 50, 100, 200, 500, 1000)
+DURATION_BUCKETS_MIN = (60, 1440, 10080, 43200)
+COUNT_BUCKETS = (1, 2, 5, 10)
+
+_STOPWORDS = frozenset({
+    "a", "an", "the", "my", "is", "it", "its", "it's", "i", "me", "and", "or", "of", "to",
+    "in", "on", "at", "for", "with", "very", "really", "so", "too", "just", "has", "have",
+    "been", "be", "am", "are", "was", "keeps", "keep", "kind", "bit", "quite",
+})
+_SYNONYMS = {
+    "wi": "wifi", "fi": "wifi", "wlan": "wifi", "wireless": "wifi", "internet": "wifi",
+    "connection": "wifi", "network": "wifi", "slowly": "slow", "sluggish": "slow",
+    "laggy": "slow", "lag": "slow", "lagging": "slow", "dropping": "drops", "drop": "drops",
+    "disconnecting": "drops", "disconnects": "drops", "cuts": "drops", "down": "offline",
+    "dead": "offline", "working": "works", "work": "works",
+}
+
+
+def bucket(value, bounds: tuple) -> str:
+    """Map a number onto a coarse range label such as '10-25'."""
+    number = to_float(value)
+    if number is None:
+        return "unknown"
+    lower = 0
+    for upper in bounds:
+        if number < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+
+def to_float(value) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def canonical_issue(text: str) -> str:
+    """Lowercase, drop filler words, fold synonyms and sort what is left."""
+    tokens = {_SYNONYMS.get(t, t) for t in nlu.tokenize(re.sub(r"wi-?fi", "wifi", text or "", flags=re.I))}
+    return " ".join(sorted(tokens - _STOPWORDS))
+
+
+def normalize_answer(question: str, answer: str) -> str:
+    """Reduce an answer to what matters for the next question."""
+    parsed = nlu.parse_answer(question, answer)
+    if parsed.kind == "yes_no":
+        return "yes" if parsed.value else "no"
+    if parsed.kind == "number":
+        return f"n:{bucket(parsed.value, COUNT_BUCKETS)}"
+    if parsed.kind == "duration":
+        return f"d:{bucket(parsed.value, DURATION_BUCKETS_MIN)}"
+    if parsed.kind == "device":
+        return f"dev:{parsed.value}"
+    if parsed.kind in ("unsure", "empty"):
+        return parsed.kind
+    return canonical_issue(answer)
+
+
+def context_key(
+    kind: str,
+    issue_description: str,
+    metrics: NetworkMetrics | None,
+    follow_up_questions: list[str],
+    user_answers: list[str],
+    question_number: int,
+) -> str:
+    """Stable hash of the normalized context a generated response depends on."""
+    metrics = metrics or NetworkMetrics()
+    context = {
+        "kind": kind,
+        "issue": canonical_issue(issue_description),
+        "speed": bucket(metrics.speed_mbps, SPEED_BUCKETS_MBPS),
+        "latency": bucket(metrics.latency_ms, LATENCY_BUCKETS_MS),
+        "connected": bool(metrics.connected),
+        "connection": metrics.connection_type or "unknown",
+        "device": metrics.device_type or "unknown",
+        "questions": [canonical_issue(q) for q in follow_up_questions],
+        "answers": [normalize_answer(q, a) for q, a in zip(follow_up_questions, user_answers)],
+        "question": question_number,
+    }
+    encoded = json.dumps(context, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def exact_key(kind: str, messages: list[dict]) -> str:
+    """Hash of the exact prompt, for output that quotes the inputs verbatim."""
+    encoded = json.dumps({"kind": kind, "messages": messages}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU with TTL in front of an optional SQLite tier."""
+
+    def __init__(self, max_entries: int, ttl: float, disk_path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+        self._disk = None
+        self._disk_lock = threading.Lock()
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> str | None:
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return value
+            del self._entries[key]
+            self.counters["expired"] += 1
+
+        if self._disk is not None:
+            with self._disk_lock:
+                row = self._disk.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None and row[1] > now:
+                self._remember(key, row[0], row[1])
+                self.counters["disk_hits"] += 1
+                return row[0]
+
+        self.counters["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at),
+                )
+
+    def clear(self):
+        self._entries.clear()
+        if self._disk is not None:
+            with self._disk_lock:
+                self._disk.execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "disk_tier": self._disk is not None,
+        }
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+
+response_cache = ResponseCache(
+    max_entries=settings.response_cache_max_entries,
+    ttl=settings.response_cache_ttl_seconds,
+    disk_path=settings.response_cache_disk_path,
+)
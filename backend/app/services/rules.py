@@ -0,0 +1,197 @@
+# rules.py
+"""Declarative decision table for "should the user reboot the router?".
+
+Rules are plain data: a name, conditions over normalized metrics and answer
+features, a verdict and an explanation. The first matching rule wins. Cases
+no rule covers return None so the caller can ask the LLM.
+
+The same table can be evaluated over whole columns of historical metrics with
+NumPy, which makes replaying old sessions through a new rule set cheap.
+"""
+import json
+import logging
+import operator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+from app.core.config import settings
+from app.models.metrics import NetworkMetrics
+from app.services import nlu
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda value, options: value in options,
+}
+
+# Feature names a rule may test, all derived by `build_features`
+FEATURES = (
+    "connected", "speed_mbps", "latency_ms", "packet_loss_pct", "jitter_ms", "latency_p95_ms",
+    "speed_trend_pct", "connection_type",
+    "device_type", "last_reboot_minutes", "already_rebooted", "other_devices_affected",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    name: str
+    when: tuple[tuple[str, str, Any], ...]  # (feature, operator, value), all must hold
+    reboot: bool
+    explanation: str
+
+    def matches(self, features: dict) -> bool:
+        return conditions_hold(self.when, features)
+
+
+def conditions_hold(when: tuple[tuple[str, str, Any], ...], features: dict) -> bool:
+    """True when every (feature, operator, value) condition holds."""
+    for feature, op, expected in when:
+        value = features.get(feature)
+        # Unknown metrics never satisfy a condition
+        if value is None or not _OPERATORS[op](value, expected):
+            return False
+    return True
+
+
+def parse_conditions(when: dict, allowed: tuple[str, ...] = FEATURES, name: str = "") -> tuple[tuple[str, str, Any], ...]:
+    """Read JSON conditions ({feature: [op, value]}) and check they are supported."""
+    conditions = tuple((feature, op, value) for feature, (op, value) in when.items())
+    for feature, op, _ in conditions:
+        if feature not in allowed or op not in _OPERATORS:
+            raise ValueError(f"Rule {name!r}: unsupported condition {feature} {op}")
+    return conditions
+
+
+@dataclass(frozen=True, slots=True)
+class RebootDecision:
+    reboot: bool
+    rule: str
+    explanation: str
+    source: str = "rules"  # "rules" or "llm"
+
+
+DEFAULT_RULES = (
+    Rule("offline", (("connected", "==", False),), True,
+         "The connectivity test failed, and a router restart is the first fix for a dead connection."),
+    Rule("rebooted_within_hour", (("last_reboot_minutes", "<", 60),), False,
+         "The router was restarted within the last hour, so another reboot is unlikely to help."),
+    Rule("already_rebooted", (("already_rebooted", "==", True), ("speed_mbps", ">=", 5)), False,
+         "The user already restarted the router and speed is usable, so the cause is likely elsewhere."),
+    Rule("high_packet_loss", (("packet_loss_pct", ">=", 5),), True,
+         "Packet loss of 5% or more usually points at a router or modem that needs a restart."),
+    Rule("very_slow", (("speed_mbps", "<", 5),), True,
+         "Download speed is below 5 Mbps, which a router reboot often recovers."),
+    Rule("high_latency", (("latency_ms", ">=", 200),), True,
+         "Latency of 200 ms or more suggests a congested or stuck router."),
+    Rule("latency_spikes", (("latency_p95_ms", ">=", 400),), True,
+         "The slowest 5% of latency samples exceed 400 ms, which points at a struggling router."),
+    Rule("degrading_speed", (("speed_trend_pct", "<=", -50),), True,
+         "Throughput fell by half or more during the test, a pattern a router restart often clears."),
+    Rule("stale_router", (("last_reboot_minutes", ">=", 7 * 24 * 60),), True,
+         "The router has not been restarted for over a week."),
+    Rule("single_device_wifi", (("other_devices_affected", "==", False),), False,
+         "Only this device is affected, so the problem is more likely on the device than the router."),
+    Rule("healthy", (("speed_mbps", ">=", 25), ("latency_ms", "<", 100)), False,
+         "Speed and latency look healthy, so a reboot is unlikely to help."),
+)
+
+
+def load_rules(path: str) -> tuple[Rule, ...]:
+    """Load a rule set from JSON: [{"name", "when": {feature: [op, value]}, "reboot", "explanation"}]."""
+    with open(path) as f:
+        data = json.load(f)
+    rules = []
+    for item in data:
+        when = parse_conditions(item["when"], name=item["name"])
+        rules.append(Rule(item["name"], when, bool(item["reboot"]), item["explanation"]))
+    return tuple(rules)
+
+
+def build_features(metrics: NetworkMetrics | None, questions: list[str], answers: list[str]) -> dict:
+    """Combine test metrics and collected answers into rule features."""
+    metrics = metrics or NetworkMetrics()
+    features = {
+        "connected": metrics.connected,
+        "speed_mbps": metrics.speed_mbps,
+        "latency_ms": metrics.latency_ms,
+        "packet_loss_pct": metrics.packet_loss_pct,
+        "jitter_ms": metrics.jitter_ms,
+        "latency_p95_ms": metrics.latency_p95_ms,
+        "speed_trend_pct": metrics.speed_trend_pct,
+        "connection_type": metrics.connection_type,
+        "device_type": metrics.device_type,
+        "last_reboot_minutes": None,
+        "already_rebooted": None,
+        "other_devices_affected": None,
+    }
+    for question, answer in zip(questions, answers):
+        q = question.lower()
+        parsed = nlu.parse_answer(question, answer)
+        if "restart" in q or "reboot" in q or "power cycle" in q:
+            if parsed.kind == "duration" and parsed.value is not None:
+                features["last_reboot_minutes"] = parsed.value
+            elif parsed.kind == "yes_no":
+                features["already_rebooted"] = parsed.value
+        elif "other device" in q and parsed.kind == "yes_no":
+            features["other_devices_affected"] = parsed.value
+    return features
+
+
+def evaluate(features: dict, rules: tuple[Rule, ...] | None = None) -> RebootDecision | None:
+    """Return the decision of the first matching rule, or None if no rule covers the case."""
+    for rule in rules or active_rules():
+        if rule.matches(features):
+            return RebootDecision(rule.reboot, rule.name, rule.explanation)
+    return None
+
+
+def evaluate_batch(columns: dict[str, "np.ndarray"], rules: tuple[Rule, ...] | None = None) -> "np.ndarray":
+    """Evaluate many metric rows at once.
+
+    `columns` maps feature names to equal-length arrays; numeric features use
+    NaN and categorical ones None for unknown values. Returns, per row, the
+    index of the rule that fired, or -1 where no rule applies.
+    """
+    import numpy as np
+
+    rules = rules or active_rules()
+    length = len(next(iter(columns.values())))
+    fired = np.full(length, -1, dtype=np.int32)
+    for index, rule in enumerate(rules):
+        mask = fired == -1
+        for feature, op, expected in rule.when:
+            column = columns.get(feature)
+            if column is None:
+                mask[:] = False
+                break
+            if op == "in":
+                mask &= np.isin(column, list(expected))
+            elif column.dtype == object:
+                known = np.array([v is not None for v in column], dtype=bool)
+                mask &= known & _OPERATORS[op](column, expected).astype(bool)
+            else:
+                # Comparisons against NaN are False, so unknown values never match
+                with np.errstate(invalid="ignore"):
+                    mask &= _OPERATORS[op](column, expected)
+        fired[mask] = index
+    return fired
+
+
+_active_rules: tuple[Rule, ...] | None = None
+
+
+def active_rules() -> tuple[Rule, ...]:
+    """The rule set in force: REBOOT_RULES_PATH if configured, otherwise the defaults."""
+    global _active_rules
+    if _active_rules is None:
+        _active_rules = load_rules(settings.reboot_rules_path) if settings.reboot_rules_path else DEFAULT_RULES
+        logger.info("Loaded %s reboot rules", len(_active_rules))
+    return _active_rules
@@ -0,0 +1,265 @@
+# session_store.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from app.core.config import settings
+from app.models.session import ChatSession
+
+logger = logging.getLogger(__name__)
+
+
+class SessionConflict(Exception):
+    """The session was saved by another request since this copy was loaded."""
+
+
+class SessionStore(ABC):
+    """Pluggable storage for ChatSession state, keyed by session id.
+
+    Also supports the mapping protocol (`in`, `[]`, `del`) so callers can
+    treat it like the plain dict it replaces.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> ChatSession | None:
+        """Return the stored session, or None if it does not exist."""
+
+    @abstractmethod
+    def save(self, session_id: str, session: ChatSession):
+        """Persist the session so other workers see its latest state.
+
+        Raises SessionConflict if the stored session changed since `session`
+        was loaded.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove the session if present."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def aget(self, session_id: str) -> ChatSession | None:
+        """`get` for async callers; stores that block override it to run off the event loop."""
+        return self.get(session_id)
+
+    async def asave(self, session_id: str, session: ChatSession):
+        """`save` for async callers; stores that block override it to run off the event loop."""
+        self.save(session_id, session)
+
+    def stats(self) -> dict:
+        """Occupancy statistics for the admin endpoint."""
+        return {"backend": type(self).__name__, "sessions": len(self)}
+
+    def close(self):
+        """Release any resources held by the store."""
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __getitem__(self, session_id: str) -> ChatSession:
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def __setitem__(self, session_id: str, session: ChatSession):
+        self.save(session_id, session)
+
+    def __delitem__(self, session_id: str):
+        self.delete(session_id)
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local LRU cache of sessions; only valid with a single uvicorn worker.
+
+    Sessions idle for longer than `ttl` are dropped, and the least recently
+    used sessions are evicted once `max_entries` or `max_bytes` is exceeded.
+    """
+
+    def __init__(
+        self,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+    ):
+        self.ttl = settings.session_ttl_seconds if ttl is None else ttl
+        self.max_entries = settings.session_max_entries if max_entries is None else max_entries
+        self.max_bytes = settings.session_max_bytes if max_bytes is None else max_bytes
+        # session_id -> (session, last_access, approx_bytes), oldest access first
+        self._sessions: OrderedDict[str, tuple[ChatSession, float, int]] = OrderedDict()
+        self._bytes = 0
+        self.evictions = {"expired": 0, "max_entries": 0, "max_bytes": 0}
+
+    def get(self, session_id: str) -> ChatSession | None:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        session, last_access, size = entry
+        now = time.monotonic()
+        if now - last_access > self.ttl:
+            self._evict(session_id, "expired")
+            return None
+        self._sessions[session_id] = (session, now, size)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def save(self, session_id: str, session: ChatSession):
+        now = time.monotonic()
+        previous = self._sessions.pop(session_id, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        size = session.approx_size()
+        self._sessions[session_id] = (session, now, size)
+        self._bytes += size
+        self._enforce_limits(now)
+
+    def delete(self, session_id: str):
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "approx_bytes": self._bytes,
+            "evictions": dict(self.evictions),
+            "ttl_seconds": self.ttl,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _enforce_limits(self, now: float):
+        # Access order doubles as idle order, so expired sessions sit at the front
+        while self._sessions:
+            oldest_id, (_, last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access > self.ttl:
+                self._evict(oldest_id, "expired")
+            elif len(self._sessions) > self.max_entries:
+                self._evict(oldest_id, "max_entries")
+            elif self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._evict(oldest_id, "max_bytes")
+            else:
+                break
+
+    def _evict(self, session_id: str, reason: str):
+        self.delete(session_id)
+        self.evictions[reason] += 1
+        logger.debug("Evicted session %s (%s)", session_id, reason)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Durable store shared by every worker process through one SQLite file in WAL mode."""
+
+    # Expired rows are purged once every this many saves
+    PURGE_INTERVAL = 500
+
+    def __init__(self, path: str, ttl: float | None = None):
+        self.path = path
+        self.ttl = settings.session_ttl_seconds if ttl is None else ttl
+        self.expired = 0
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        # WAL lets readers in other workers proceed while one worker writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "version INTEGER NOT NULL DEFAULT 1)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "version" not in columns:
+            # Created before saves were versioned
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at)")
+        logger.info("SQLite session store opened at %s", path)
+
+    def get(self, session_id: str) -> ChatSession | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated_at, version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        session = ChatSession.from_dict(json.loads(row[0]))
+        session.version = row[2]
+        return session
+
+    def save(self, session_id: str, session: ChatSession):
+        # Compare-and-swap on the version: the session lock only serializes
+        # requests within one worker, so two workers may race on a session
+        data = json.dumps(session.to_dict(), separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            if session.version == 0:
+                # New session; an expired row with the same id may be replaced
+                cursor = self._conn.execute(
+                    "INSERT INTO sessions (session_id, data, updated_at, version) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at, "
+                    "version = sessions.version + 1 WHERE sessions.updated_at < ?",
+                    (session_id, data, now, now - self.ttl),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE sessions SET data = ?, updated_at = ?, version = version + 1 "
+                    "WHERE session_id = ? AND version = ?",
+                    (data, now, session_id, session.version),
+                )
+            if cursor.rowcount == 0:
+                raise SessionConflict(session_id)
+            session.version = self._conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            self._saves += 1
+            if self._saves % self.PURGE_INTERVAL == 0:
+                self._purge_expired()
+
+    async def aget(self, session_id: str) -> ChatSession | None:
+        # SQLite may wait on another worker's write lock for up to the busy timeout
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def asave(self, session_id: str, session: ChatSession):
+        await asyncio.to_thread(self.save, session_id, session)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def __len__(self) -> int:
+        # Expired rows linger until the next purge; they are not live sessions
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE updated_at >= ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._purge_expired()
+        return {**super().stats(), "evictions": {"expired": self.expired}, "ttl_seconds": self.ttl}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _purge_expired(self):
+        cursor = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+        self.expired += cursor.rowcount
+
+
+def build_session_store() -> SessionStore:
+    """Create the session store selected by the `session_backend` setting."""
+    if settings.session_backend == "sqlite":
+        return SQLiteSessionStore(settings.session_db_path)
+    if settings.session_backend != "memory":
+        raise ValueError(f"Unknown session backend: {settings.session_backend}")
+    return InMemorySessionStore()
@@ -0,0 +1,126 @@
+# speculation.py
+"""Optimistic overlap of answer validation with next-question generation.
+
+Most follow-up answers are valid, so the next question can be generated while
+the LLM is still judging the answer. If the answer is rejected the generated
+question is cancelled or discarded and the caller re-asks instead.
+"""
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Awaitable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class SpeculationStats:
+    """Counts speculative runs, wasted generations and latency saved by overlapping."""
+
+    def __init__(self):
+        self.speculated = 0
+        self.wasted = 0
+        self.saved_seconds = 0.0
+
+    def record(self, accepted: bool, saved_seconds: float = 0.0):
+        self.speculated += 1
+        if accepted:
+            self.saved_seconds += saved_seconds
+        else:
+            self.wasted += 1
+
+    def snapshot(self) -> dict:
+        accepted = self.speculated - self.wasted
+        return {
+            "speculated": self.speculated,
+            "wasted": self.wasted,
+            "waste_rate": self.wasted / self.speculated if self.speculated else 0.0,
+            "saved_seconds_total": round(self.saved_seconds, 3),
+            "saved_ms_avg": round(self.saved_seconds * 1000 / accepted, 1) if accepted else 0.0,
+        }
+
+
+stats = SpeculationStats()
+
+
+async def _timed(awaitable: Awaitable[T]) -> tuple[T, float]:
+    start = time.perf_counter()
+    result = await awaitable
+    return result, time.perf_counter() - start
+
+
+async def speculate(validation: Awaitable[bool], generation: Awaitable[T]) -> tuple[bool, T | None]:
+    """Run validation and generation concurrently.
+
+    Returns (True, generated) if validation passed, or (False, None) after
+    cancelling the generation if it failed.
+    """
+    generation_task = asyncio.create_task(_timed(generation))
+    try:
+        valid, validation_time = await _timed(validation)
+    except BaseException:
+        generation_task.cancel()
+        raise
+    if not valid:
+        generation_task.cancel()
+        stats.record(accepted=False)
+        logger.info("Speculative question discarded: answer rejected")
+        return False, None
+    result, generation_time = await generation_task
+    # Run serially this turn would have cost both; overlapped it costs the longer one
+    stats.record(accepted=True, saved_seconds=min(validation_time, generation_time))
+    return True, result
+
+
+async def speculate_stream(
+    validation: Awaitable[bool], tokens: AsyncIterator[str]
+) -> tuple[bool, AsyncIterator[str] | None]:
+    """Streaming variant of `speculate`.
+
+    Tokens are buffered while validation runs. Returns (True, iterator over
+    the buffered and remaining tokens) or (False, None) once the stream has
+    been cancelled.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    started = time.perf_counter()
+    finished: list[float] = []
+
+    async def produce():
+        try:
+            async for token in tokens:
+                queue.put_nowait(token)
+            finished.append(time.perf_counter())
+            queue.put_nowait(_DONE)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    producer = asyncio.create_task(produce())
+    try:
+        valid, validation_time = await _timed(validation)
+    except BaseException:
+        producer.cancel()
+        raise
+    if not valid:
+        producer.cancel()
+        stats.record(accepted=False)
+        logger.info("Speculative question stream discarded: answer rejected")
+        return False, None
+
+    async def drain():
+        try:
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+        generation_time = finished[0] - started
+        stats.record(accepted=True, saved_seconds=min(validation_time, generation_time))
+
+    return True, drain()
@@ -0,0 +1,216 @@
+# speedtest.py
+"""Server side of the browser throughput test.
+
+Downloads are served from a single random buffer allocated on first use. Each
+response is a sequence of memoryview slices of it, so no bytes are copied or
+allocated per request. Uploads are counted chunk by chunk as they arrive and
+then discarded.
+
+The client opens several streams under one test id. Each stream records
+when it started and finished on the server and how many bytes it moved, and
+the test summary divides total bytes by the wall time from the first start
+to the last finish. With the SQLite session backend the timings live in the
+shared database file, so the streams of one test may land on different
+workers; otherwise they are kept per process.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterator
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_buffer: bytes | None = None
+
+
+def payload_buffer() -> bytes:
+    """The shared download payload, allocated on first use to keep startup fast."""
+    global _buffer
+    if _buffer is None:
+        # Random so that no proxy or link layer can compress it
+        _buffer = os.urandom(settings.speedtest_buffer_bytes)
+    return _buffer
+
+
+def payload_chunks(size: int, chunk_size: int | None = None) -> Iterator[memoryview]:
+    """Yield `size` bytes as slices of the shared buffer, wrapping around as needed."""
+    view = memoryview(payload_buffer())
+    chunk_size = min(chunk_size or settings.speedtest_chunk_bytes, len(view))
+    offset = 0
+    while size > 0:
+        n = min(chunk_size, size, len(view) - offset)
+        yield view[offset:offset + n]
+        size -= n
+        offset = (offset + n) % len(view)
+
+
+@dataclass(slots=True)
+class StreamTiming:
+    direction: str  # "download" or "upload"
+    bytes: int = 0
+    started: float | None = None
+    finished: float | None = None
+
+    # Wall-clock times, so streams timed by different workers can be compared
+    def start(self):
+        self.started = time.time()
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def seconds(self) -> float | None:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def snapshot(self) -> dict:
+        seconds = self.seconds
+        return {
+            "direction": self.direction,
+            "bytes": self.bytes,
+            "seconds": round(seconds, 6) if seconds is not None else None,
+            "mbps": mbps(self.bytes, seconds),
+            "complete": self.finished is not None,
+        }
+
+
+@dataclass(slots=True)
+class ThroughputTest:
+    created: float = field(default_factory=time.time)
+    streams: dict[str, StreamTiming] = field(default_factory=dict)
+
+    def summary(self, direction: str) -> dict:
+        streams = [s for s in self.streams.values() if s.direction == direction and s.started is not None]
+        done = [s for s in streams if s.finished is not None]
+        total = sum(s.bytes for s in streams)
+        # Parallel streams overlap; throughput is measured over their combined span
+        wall = max(s.finished for s in done) - min(s.started for s in done) if done else None
+        return {
+            "streams": len(streams),
+            "complete": len(done) == len(streams),
+            "bytes": total,
+            "seconds": round(wall, 6) if wall is not None else None,
+            "mbps": mbps(total, wall),
+        }
+
+
+def mbps(num_bytes: int, seconds: float | None) -> float | None:
+    if not seconds:
+        return None
+    return round(num_bytes * 8 / seconds / 1e6, 2)
+
+
+class SpeedTestRegistry:
+    """Timings of recent throughput tests, expired after a TTL."""
+
+    def __init__(self, ttl: float, max_tests: int = 10000):
+        self.ttl = ttl
+        self.max_tests = max_tests
+        self._tests: OrderedDict[str, ThroughputTest] = OrderedDict()
+
+    def stream(self, test_id: str, stream_id: str, direction: str) -> StreamTiming:
+        """Register a stream of test `test_id`, creating the test on first use."""
+        self._purge()
+        test = self._tests.get(test_id)
+        if test is None:
+            test = self._tests[test_id] = ThroughputTest()
+            while len(self._tests) > self.max_tests:
+                self._tests.popitem(last=False)
+        timing = test.streams[f"{direction}:{stream_id}"] = StreamTiming(direction)
+        return timing
+
+    def get(self, test_id: str) -> ThroughputTest | None:
+        self._purge()
+        return self._tests.get(test_id)
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        while self._tests:
+            test_id, test = next(iter(self._tests.items()))
+            if test.created >= cutoff:
+                break
+            del self._tests[test_id]
+
+
+@dataclass(slots=True)
+class SharedStreamTiming(StreamTiming):
+    """A stream timing that writes itself to the shared store when it starts and finishes."""
+    store: "SQLiteSpeedTestRegistry | None" = None
+    test_id: str = ""
+    name: str = ""
+
+    def start(self):
+        StreamTiming.start(self)
+        self.store.record(self.test_id, self.name, self)
+
+    def finish(self):
+        StreamTiming.finish(self)
+        self.store.record(self.test_id, self.name, self)
+
+
+class SQLiteSpeedTestRegistry(SpeedTestRegistry):
+    """Timings in a SQLite file shared by every worker process."""
+
+    # Expired rows are purged once every this many writes
+    PURGE_INTERVAL = 500
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS speedtest_streams ("
+            "test_id TEXT NOT NULL, stream TEXT NOT NULL, direction TEXT NOT NULL, bytes INTEGER NOT NULL, "
+            "started REAL, finished REAL, created REAL NOT NULL, PRIMARY KEY (test_id, stream))"
+        )
+
+    def stream(self, test_id: str, stream_id: str, direction: str) -> StreamTiming:
+        return SharedStreamTiming(direction, store=self, test_id=test_id, name=f"{direction}:{stream_id}")
+
+    def record(self, test_id: str, name: str, timing: StreamTiming):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO speedtest_streams (test_id, stream, direction, bytes, started, finished, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(test_id, stream) DO UPDATE SET "
+                "bytes = excluded.bytes, started = excluded.started, finished = excluded.finished",
+                (test_id, name, timing.direction, timing.bytes, timing.started, timing.finished, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_INTERVAL == 0:
+                self._conn.execute("DELETE FROM speedtest_streams WHERE created < ?", (time.time() - self.ttl,))
+
+    def get(self, test_id: str) -> ThroughputTest | None:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stream, direction, bytes, started, finished, created FROM speedtest_streams "
+                "WHERE test_id = ? AND created >= ?",
+                (test_id, time.time() - self.ttl),
+            ).fetchall()
+        if not rows:
+            return None
+        test = ThroughputTest(created=min(row[5] for row in rows))
+        for name, direction, num_bytes, started, finished, _ in rows:
+            test.streams[name] = StreamTiming(direction, num_bytes, started, finished)
+        return test
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def build_speedtest_registry() -> SpeedTestRegistry:
+    """Share timings through the session database when sessions are shared between workers."""
+    if settings.session_backend == "sqlite":
+        return SQLiteSpeedTestRegistry(settings.session_db_path, settings.speedtest_result_ttl_seconds)
+    return SpeedTestRegistry(ttl=settings.speedtest_result_ttl_seconds)
+
+
+registry = build_speedtest_registry()
@@ -0,0 +1,270 @@
+# telemetry.py
+"""Process-wide metrics, rendered in the Prometheus text exposition format.
+
+Hot-path updates are a dict lookup and an addition: no locks (everything
+runs on the event loop), no string formatting. Counts that other modules
+already keep (token usage, cache and NLU stats) are read from them at
+scrape time instead of being double-counted here.
+"""
+import asyncio
+import math
+import time
+from bisect import bisect_left
+from typing import Callable
+from app.core.logging_config import dropped_records
+from app.services import nlu, prompts
+from app.services.response_cache import response_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_CANCELLED = (asyncio.CancelledError, GeneratorExit)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), collect: Callable[[], dict] | None = None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # Values keyed by the tuple of label values, in `labels` order
+        self._values: dict[tuple, float] = {}
+        self._collect = collect
+
+    def set_function(self, collect: Callable[[], dict]):
+        """Read values from `collect()` at scrape time instead of tracking them."""
+        self._collect = collect
+
+    def values(self) -> dict[tuple, float]:
+        return self._collect() if self._collect is not None else self._values
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.values().items():
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_number(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket (the last one is +Inf), then the sum
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self, *labels: str) -> dict:
+        """Count, sum and cumulative bucket counts of one label set."""
+        series = self._series.get(labels) or [0] * (len(self.buckets) + 2)
+        cumulative, running = {}, 0
+        for bound, count in zip((*self.buckets, math.inf), series):
+            running += count
+            cumulative[bound] = running
+        return {"count": running, "sum": series[-1], "buckets": cumulative}
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key in list(self._series):
+            snap = self.snapshot(*key)
+            for bound, count in snap["buckets"].items():
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels((*self.labels, 'le'), (*key, le))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(snap['sum'])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {snap['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = (), collect=None) -> Counter:
+        return self.register(Counter(name, help, labels, collect))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = (), collect=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, collect))
+
+    def histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+registry = Registry()
+
+chat_turn_seconds = registry.histogram(
+    "wifi_chat_turn_seconds", "Time to handle one chat turn, by endpoint and the state it started in.",
+    ("endpoint", "state"),
+)
+chat_turns = registry.counter(
+    "wifi_chat_turns_total", "Chat turns by endpoint, starting state and outcome (ok, error, aborted).",
+    ("endpoint", "state", "outcome"),
+)
+chat_turns_in_progress = registry.gauge(
+    "wifi_chat_turns_in_progress", "Chat turns currently being handled, by starting state.", ("state",),
+)
+active_sessions = registry.gauge("wifi_active_sessions", "Sessions held by the session store.")
+
+llm_call_seconds = registry.histogram(
+    "wifi_llm_call_seconds", "Duration of LLM calls, until the last token for streams.", ("call_site",),
+)
+llm_first_token_seconds = registry.histogram(
+    "wifi_llm_first_token_seconds", "Time to the first streamed token of LLM calls.", ("call_site",),
+)
+llm_calls = registry.counter(
+    "wifi_llm_calls_total", "LLM calls by call site and outcome (ok, error, timeout, unavailable, cancelled).",
+    ("call_site", "outcome"),
+)
+
+_TOKEN_KINDS = ("estimated_tokens", "prompt_tokens", "completion_tokens", "cached_tokens")
+registry.counter(
+    "wifi_llm_tokens_total", "Tokens per LLM call site: local estimate, billed prompt, completion and prompt-cache hits.",
+    ("call_site", "kind"),
+    collect=lambda: {
+        (site, kind.removesuffix("_tokens")): counts[kind]
+        for site, counts in prompts.stats.sites.items() for kind in _TOKEN_KINDS
+    },
+)
+registry.counter(
+    "wifi_response_cache_lookups_total", "Generated-response cache lookups by result.", ("result",),
+    collect=lambda: {
+        (result,): response_cache.counters[result] for result in ("hits", "disk_hits", "misses")
+    },
+)
+registry.gauge(
+    "wifi_response_cache_hit_ratio", "Share of response cache lookups served from memory or disk.",
+    collect=lambda: {(): response_cache.stats()["hit_rate"]},
+)
+registry.counter(
+    "wifi_nlu_decisions_total", "Validation and resolution decisions by path (fast_path, llm_fallback).",
+    ("decision", "path"),
+    collect=lambda: {
+        (decision, path): count for decision, counts in nlu.stats.counts.items() for path, count in counts.items()
+    },
+)
+registry.counter(
+    "wifi_log_records_dropped_total", "Log records discarded because the logging queue was full.",
+    collect=lambda: {(): dropped_records()},
+)
+
+
+class TurnTimer:
+    """Times one chat turn; set `outcome` to "error" when the failure is handled inside the block."""
+
+    __slots__ = ("endpoint", "state", "outcome", "_start")
+
+    def __init__(self, endpoint: str, state: str):
+        self.endpoint = endpoint
+        self.state = state
+        self.outcome = "ok"
+
+    def __enter__(self) -> "TurnTimer":
+        chat_turns_in_progress.inc(self.state)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.outcome = "aborted" if issubclass(exc_type, _CANCELLED) else "error"
+        chat_turn_seconds.observe(time.perf_counter() - self._start, self.endpoint, self.state)
+        chat_turns.inc(self.endpoint, self.state, self.outcome)
+        chat_turns_in_progress.dec(self.state)
+        return False
+
+
+class LLMCallTimer:
+    """Times one LLM call and classifies how it ended; call `first_token()` for streams."""
+
+    __slots__ = ("call_site", "_start", "_first")
+
+    def __init__(self, call_site: str):
+        self.call_site = call_site
+        self._first = False
+
+    def __enter__(self) -> "LLMCallTimer":
+        self._start = time.perf_counter()
+        return self
+
+    def first_token(self):
+        if not self._first:
+            self._first = True
+            llm_first_token_seconds.observe(time.perf_counter() - self._start, self.call_site)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, _CANCELLED):
+            outcome = "cancelled"
+        elif isinstance(getattr(exc, "outcome", None), str):
+            # The scheduler's LLMUnavailable says how the call ended
+            outcome = exc.outcome
+        elif _is_timeout(exc_type):
+            outcome = "timeout"
+        else:
+            outcome = "error"
+        llm_call_seconds.observe(time.perf_counter() - self._start, self.call_site)
+        llm_calls.inc(self.call_site, outcome)
+        return False
+
+
+def _is_timeout(exc_type: type) -> bool:
+    # Imported here rather than at startup; both are loaded once an LLM call has been made
+    import httpx
+    from openai import APITimeoutError
+
+    return issubclass(exc_type, (TimeoutError, APITimeoutError, httpx.TimeoutException))
@@ -1,71 +1,253 @@
 # troubleshoot.py
 import logging
 import random
-from app.models.schemas import AutoTestResults
-import os
-from openai import AsyncOpenAI
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, AsyncIterator
+from app.models.metrics import NetworkMetrics
+from app.models.session import ChatSession
+from app.core.config import settings
+from app.services import llm_scheduler, model_routing, nlu, prompts, question_bank, rules, speculation, telemetry
+from app.services.response_cache import context_key, exact_key, response_cache
+from app.services.llm_client import build_http_client, build_llm_client, build_transport, pool_stats, warm_pool
+from app.services.llm_scheduler import LLMScheduler, LLMUnavailable
+from app.services.model_routing import ModelRouter
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
 
 logger = logging.getLogger(__name__)
 
 class TroubleshootService:
-    def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        self.llm = AsyncOpenAI(api_key=api_key)
+    def __init__(
+        self, llm: "AsyncOpenAI | None" = None, scheduler: LLMScheduler | None = None, router: ModelRouter | None = None,
+    ):
+        # Keep the pool this service builds, so it can be warmed and inspected
+        self.transport = None
+        self.http_client = None
+        if llm is None:
+            self.transport = build_transport()
+            self.http_client = build_http_client(self.transport)
+            llm = build_llm_client(self.http_client)
+        self.llm = llm
+        self.scheduler = scheduler or llm_scheduler.scheduler
+        self.router = router or model_routing.router
         logger.info("TroubleshootService initialized with OpenAI client")
 
+    async def warmup(self) -> bool:
+        """Pre-open a pooled connection to the LLM provider."""
+        if self.http_client is None:
+            return False
+        return await warm_pool(self.http_client, str(self.llm.base_url))
+
+    async def aclose(self):
+        """Close the shared connection pool."""
+        await self.llm.close()
+        logger.info("TroubleshootService connection pool closed")
+
+    def pool_stats(self) -> dict:
+        """Connection pool statistics for the health endpoint; empty for an LLM client passed in."""
+        if self.transport is None:
+            return {}
+        return pool_stats(self.http_client, self.transport)
+
     def initialize_session(self):
-        from app.routes.chat import ChatSession  
         return ChatSession()
     
     async def is_input_valid(self, user_input: str, question: str) -> bool:
         """
-        Use LLM to validate if user input appropriately answers the question.
+        Validate if user input appropriately answers the question.
+        The local classifier decides confident cases; the LLM handles the rest.
         Returns True if valid, False if invalid.
         """
         if not user_input or not user_input.strip():
             return False
-        
-        validation_prompt = f"""Question: "{question}"
-User response: "{user_input}"
-
-Does the user's response appropriately answer the question? Consider variations and be reasonably lenient.
-
-Answer only: YES or NO"""
+        local = self._validate_locally(user_input, question)
+        if local is not None:
+            return local
+        return await self._validate_with_llm(user_input, question)
 
+    def _validate_locally(self, user_input: str, question: str) -> bool | None:
+        """Fast-path validity verdict, or None when the LLM has to decide."""
+        if not user_input or not user_input.strip():
+            return False
+        local = nlu.classify_validity(question, user_input)
+        if local.confidence >= settings.nlu_confidence_threshold:
+            nlu.stats.record("validation", fast_path=True)
+            logger.info("Input validation (fast path): %s (%.2f)", local.label, local.confidence)
+            return local.label == "valid"
+        nlu.stats.record("validation", fast_path=False)
+        return None
+
+    async def _validate_with_llm(self, user_input: str, question: str) -> bool:
+        messages = prompts.validation_messages(question, user_input)
         try:
-            response = await self.llm.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": validation_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=10
+            response = await self._create(
+                "validation",
+                messages=messages,
+                temperature=0.1
             )
+            prompts.stats.record("validation", messages, response.usage)
             
             result = response.choices[0].message.content.strip().upper()
-            logger.info(f"Input validation result: {result}")
+            logger.info("Input validation result: %s", result)
             return "YES" in result
                 
         except Exception as e:
-            logger.error(f"Error during input validation: {e}")
+            logger.error("Error during input validation: %s", e)
             # If validation fails, assume input is valid to avoid blocking user
             return True
 
     async def generate_next_question(
         self,
         issue_description: str,
-        test_results: AutoTestResults,
+        metrics: NetworkMetrics | None,
         user_answers: list[str],
         question_number: int,
         follow_up_questions: list[str],
         previous_question: str | None = None,
         user_input: str | None = None,
         last_question: str | None = None,
+        fast: bool = False,
     ) -> str:
-        
-        logger.info(f"Generating question {question_number + 1} for issue: {issue_description}")
-        logger.debug(f"Test results: {test_results}, User answers: {user_answers}")
-        
+        """Next follow-up question; with `fast`, from the offline question bank without any LLM call."""
+        plan = self._plan_next_question(
+            issue_description, metrics, user_answers, question_number,
+            follow_up_questions, previous_question, user_input, last_question,
+        )
+        if plan.valid is False:
+            logger.info("Invalid user input detected: %s. Re-asking question.", plan.user_input)
+            return plan.reask
+        if fast:
+            # Answers the local classifier is unsure about are accepted
+            return self._offline_question(plan, "fast_mode")
+
+        if plan.valid is None:
+            validation = self._validate_with_llm(plan.user_input, plan.previous_question)
+            if settings.speculative_validation:
+                # Generate the next question while the LLM is still judging the answer
+                accepted, question = await speculation.speculate(validation, self._complete_question(plan))
+                if not accepted:
+                    logger.info("Invalid user input detected: %s. Re-asking question.", plan.user_input)
+                    return plan.reask
+                return question
+            if not await validation:
+                logger.info("Invalid user input detected: %s. Re-asking question.", plan.user_input)
+                return plan.reask
+
+        return await self._complete_question(plan)
+
+    async def stream_next_question(
+        self,
+        issue_description: str,
+        metrics: NetworkMetrics | None,
+        user_answers: list[str],
+        question_number: int,
+        follow_up_questions: list[str],
+        previous_question: str | None = None,
+        user_input: str | None = None,
+        last_question: str | None = None,
+        fast: bool = False,
+    ) -> AsyncIterator[str]:
+        """Same as generate_next_question, but yields the question as tokens arrive."""
+        plan = self._plan_next_question(
+            issue_description, metrics, user_answers, question_number,
+            follow_up_questions, previous_question, user_input, last_question,
+        )
+        if plan.valid is False:
+            logger.info("Invalid user input detected: %s. Re-asking question.", plan.user_input)
+            yield plan.reask
+            return
+        if fast:
+            yield self._offline_question(plan, "fast_mode")
+            return
+
+        tokens = self._stream_question(plan)
+        if plan.valid is None:
+            validation = self._validate_with_llm(plan.user_input, plan.previous_question)
+            if settings.speculative_validation:
+                # Buffer the next question's tokens while the LLM judges the answer
+                accepted, tokens = await speculation.speculate_stream(validation, tokens)
+            else:
+                accepted = await validation
+            if not accepted:
+                logger.info("Invalid user input detected: %s. Re-asking question.", plan.user_input)
+                yield plan.reask
+                return
+
+        async for token in tokens:
+            yield token
+
+    async def _complete_question(self, plan: "_QuestionPlan") -> str:
+        messages, cache_key = plan.messages, plan.cache_key
+        if cache_key is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Generated question served from cache")
+                return cached
+
+        try:
+            response = await self._create(
+                "question",
+                messages=messages,
+                temperature=0.0
+            )
+        except LLMUnavailable as e:
+            llm_scheduler.degraded.inc("question")
+            logger.warning("Serving an offline question (%s)", e.reason)
+            return self._offline_question(plan, "degraded")
+        prompts.stats.record("question", messages, response.usage)
+        question = response.choices[0].message.content.strip()
+        logger.info("Generated question: %s", question, extra={"sampled": True})
+        # A cut-off question is served once but not cached
+        if cache_key is not None and getattr(response.choices[0], "finish_reason", None) != "length":
+            response_cache.set(cache_key, question)
+        return question
+
+    async def _stream_question(self, plan: "_QuestionPlan") -> AsyncIterator[str]:
+        messages, cache_key = plan.messages, plan.cache_key
+        if cache_key is not None:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Generated question served from cache")
+                yield cached
+                return
+
+        question = ""
+        finish_reasons = []
+        try:
+            async for token in self._stream_completion(
+                "question",
+                finish_reasons,
+                messages=messages,
+                temperature=0.0
+            ):
+                question += token
+                yield token
+        except LLMUnavailable as e:
+            # Nothing has been sent yet: the scheduler only gives up before the first token
+            llm_scheduler.degraded.inc("question")
+            logger.warning("Serving an offline question (%s)", e.reason)
+            yield self._offline_question(plan, "degraded")
+            return
+        if cache_key is not None and finish_reasons != ["length"]:
+            response_cache.set(cache_key, question.strip())
+
+    def _plan_next_question(
+        self,
+        issue_description: str,
+        metrics: NetworkMetrics | None,
+        user_answers: list[str],
+        question_number: int,
+        follow_up_questions: list[str],
+        previous_question: str | None = None,
+        user_input: str | None = None,
+        last_question: str | None = None,
+    ) -> "_QuestionPlan":
+        """Check the latest answer locally and build the question prompt."""
+        logger.info("Generating question %s for issue: %s", question_number + 1, issue_description, extra={"sampled": True})
+        logger.debug("Metrics: %s, User answers: %s", metrics, user_answers)
+
         # Derive missing context from existing lists if not provided explicitly
         if previous_question is None and follow_up_questions:
             previous_question = follow_up_questions[-1]
@@ -75,175 +257,162 @@ Answer only: YES or NO"""
             last_question = previous_question
 
         # Validate user input if we have a previous question and user response
+        valid = True
         if previous_question and user_input is not None:
-            is_valid = await self.is_input_valid(user_input, previous_question)
-            
-            if not is_valid:
-                logger.info(f"Invalid user input detected: {user_input}. Re-asking question.")
-                return last_question or previous_question
+            valid = self._validate_locally(user_input, previous_question)
         
-        # Build prior Q/A pairs correctly by pairing asked questions with their answers
-        previous_context = "  \n".join(
-            f"Q{i+1}: {q}\nA{i+1}: {a}"
-            for i, (q, a) in enumerate(zip(follow_up_questions, user_answers))
-        ) if user_answers and follow_up_questions else ""
-
-        # Use centralized test results formatting
-        formatted_results = self.format_test_results(test_results)
-        
-        test_summary = (
-            f"Connectivity: {formatted_results['connectivity_status']}, "
-            f"Speed: {formatted_results['speed']} Mbps, "
-            f"Latency: {formatted_results['latency']} ms, "
-            f"Connection Type: {formatted_results['connection_type']}, "
-            f"Device Type: {formatted_results['device_type']}"
+        messages = prompts.question_messages(
+            issue_description, metrics, follow_up_questions, user_answers, question_number,
         )
+        cache_key = None
+        if settings.response_cache_enabled:
+            cache_key = context_key(
+                "question", issue_description, metrics,
+                follow_up_questions, user_answers, question_number,
+            )
 
-        previous_questions = " | ".join(follow_up_questions)
-        system_prompt = f"""
-You are a WiFi troubleshooting expert. Your role is to diagnose the user's WiFi issue by asking **ONE** question at a time, progressing from the most common causes to the least common.
-
-User's Issue: {issue_description}
-{test_summary}
-{previous_context}
-Previous questions: {previous_questions}
-This is question #{question_number+1}.
-
-**Your core objectives:**
-- Review the previous questions already asked
-- Ask ONLY **one** clear, specific, and actionable troubleshooting question at a time.
-- Base each question on the test results, previous answers, and remaining unexplored categories.
-- Progress logically: start with the most common potential issues before moving to rarer ones.
-
-**Handling invalid or unhelpful responses:**
-- If the user gives an irrelevant, nonsense, evasive, or incomplete answer, **ask the same question again but in a different way** (simpler words, more context, or examples).
-- If they refuse to answer, reframe the question so it’s easier or more appealing to answer.
-- Keep re-asking in alternative forms until you receive a valid, useful answer.
-- Only move to a new topic when you have enough information about the current one.
-
-**Question Categories (reference order):**
-1. Network congestion & bandwidth usage  
-2. Physical connection & hardware issues  
-3. Router/Modem configuration & status  
-4. Signal strength & interference  
-5. Device-specific issues  
-
-**Important final step:**
-- Once you’ve gathered enough information, provide a **specific technical conclusion**.
-- If a reboot is required, end your last response **exactly** with:  
-  `Did the reboot improve your connection? (Yes/No)`  
-- Do **not** add any text after this Yes/No question.
-
-Now, ask ONLY the **next** troubleshooting question — or, if ready, give the final conclusion with the reboot question.
-"""
-
-
-        response = await self.llm.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-            ],
-            temperature=0.0
+        return _QuestionPlan(
+            messages=messages,
+            cache_key=cache_key,
+            valid=valid,
+            reask=last_question or previous_question,
+            previous_question=previous_question,
+            user_input=user_input,
+            metrics=metrics,
+            follow_up_questions=follow_up_questions,
+            user_answers=user_answers,
         )
-        question = response.choices[0].message.content.strip()
-        logger.info(f"Generated question: {question}")
-        return question
 
-    def format_test_results(self, test_results: AutoTestResults) -> dict:
-        """Format test results into a consistent dictionary structure."""
-        logger.debug(f"Formatting test results: {test_results}")
-        if test_results is None:
-            logger.warning("Test results are None, returning default values")
-            return {
-                'speed': 'unknown',
-                'latency': 'unknown',
-                'connection_type': 'unknown',
-                'connectivity_status': False,
-                'device_type': 'unknown'
-            }
-        # Handle both dict and object formats
-        if hasattr(test_results, 'get'):  # dict format
-            speed_data = test_results.get('speed', {})
-            speed = speed_data.get('speed', 'unknown') if isinstance(speed_data, dict) else str(speed_data)
-            
-            latency_data = test_results.get('connectivity', {})
-            latency = latency_data.get('latency', 'unknown') if isinstance(latency_data, dict) else str(latency_data)
-            
-            connection_data = test_results.get('connectionInfo', {})
-            connection_type = connection_data.get('type', 'unknown') if isinstance(connection_data, dict) else str(connection_data)
-            
-            connectivity_data = test_results.get('connectivity', {})
-            connectivity_status = connectivity_data.get('connected', False) if isinstance(connectivity_data, dict) else False
-            
-            device_type = test_results.get('deviceType', 'unknown')
-        else:  # object format
-            speed = getattr(test_results, 'speed', 'unknown')
-            if hasattr(speed, 'speed'):
-                speed = speed.speed
-            
-            latency = getattr(test_results, 'connectivity', 'unknown')
-            if hasattr(latency, 'latency'):
-                latency = latency.latency
-            
-            connection_type = getattr(test_results, 'connectionInfo', 'unknown')
-            if hasattr(connection_type, 'type'):
-                connection_type = connection_type.type
-            
-            connectivity_data = getattr(test_results, 'connectivity', {})
-            connectivity_status = connectivity_data.get('connected', False) if hasattr(connectivity_data, 'get') else False
-            
-            device_type = getattr(test_results, 'deviceType', 'unknown')
-        
-        logger.debug(f"Formatted results: {{'speed': speed, 'latency': latency, 'connection_type': connection_type, 'connectivity_status': connectivity_status, 'device_type': device_type}}")
-        return {
-            'speed': speed,
-            'latency': latency,
-            'connection_type': connection_type,
-            'connectivity_status': connectivity_status,
-            'device_type': device_type
-        }
-
-    async def generate_conclusion(self, session):
-        logger.info(f"Generating conclusion for session - issue: {session.issue_description}")
-        logger.debug(f"User answers: {session.user_answers}, Test results: {session.auto_test_results}")
-        # Generate intelligent conclusion based on test results and user answers."""
-        formatted_results = self.format_test_results(session.auto_test_results)
-        
-        context = (
-            f"Test Results: {formatted_results['speed']} Mbps speed, {formatted_results['latency']} ms latency, {formatted_results['connection_type']} connection\n"
-            f"User Issue: {session.issue_description}\n"
-            f"User Answers: {' | '.join(session.user_answers) if session.user_answers else 'No answers provided yet'}\n"
-            f"Questions Asked: {session.current_question_index}\n"
-        )
-        
-        prompt = f"""Based on these test results and user answers:
-{context}
+    async def _create(self, call_site: str, **kwargs):
+        """`chat.completions.create` on the call site's route, through the scheduler, timed and counted."""
+        kwargs.update(self.router.params(call_site))
 
-Provide a specific, personalized conclusion that:
-1. Acknowledges the current status
-2. Provides specific recommendations based on the actual data
-3. Includes the reboot instructions if needed
-4. Asks 1 last follow up question: "Did the reboot improve your connection? (Yes/No)
-5. Be conversational and helpful
+        def attempt():
+            return self.scheduler.call(call_site, lambda: self.llm.chat.completions.create(**kwargs))
 
-Format your answer using Markdown. Use `###` for section headings and `-` for bullet points. Make the analysis and recommendations intelligent and specific to this situation."""
-        
-        response = await self.llm.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a WiFi troubleshooting expert providing intelligent, personalized conclusions based on test results and user answers."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        with telemetry.LLMCallTimer(call_site):
+            response = await self.router.call(call_site, attempt, can_hedge=not self.scheduler.saturated)
+        self.router.check_finish(call_site, getattr(response.choices[0], "finish_reason", None))
+        return response
+
+    async def _stream_completion(self, call_site: str, finish_reasons: list | None = None, **kwargs) -> AsyncIterator[str]:
+        """Run a streaming chat completion through the scheduler and yield its text deltas.
+
+        The reply's finish reason is appended to `finish_reasons` if given.
+        """
+        kwargs.update(self.router.params(call_site))
+        opened = self.scheduler.stream(call_site, lambda: self.llm.chat.completions.create(
+            stream=True, stream_options={"include_usage": True}, **kwargs
+        ))
+        # Closing explicitly hands the concurrency slot back as soon as the caller stops reading
+        with telemetry.LLMCallTimer(call_site) as timer:
+            async with aclosing(opened) as stream:
+                usage = None
+                finish_reason = None
+                async for chunk in stream:
+                    # The usage report arrives in a final chunk without choices
+                    usage = getattr(chunk, "usage", None) or usage
+                    if chunk.choices:
+                        finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+                        if chunk.choices[0].delta.content:
+                            timer.first_token()
+                            yield chunk.choices[0].delta.content
+        prompts.stats.record(call_site, kwargs["messages"], usage)
+        self.router.check_finish(call_site, finish_reason)
+        if finish_reasons is not None:
+            finish_reasons.append(finish_reason)
+
+    async def generate_conclusion(self, session, decision: rules.RebootDecision | None = None):
+        """Final Markdown conclusion; with `decision`, reboot instructions follow the reboot verdict."""
+        if session.fast_mode:
+            return self.offline_conclusion(session, decision)
+        messages = self._conclusion_messages(session, decision)
+        cache_key = self._conclusion_cache_key(messages)
+        if cache_key is not None and (cached := response_cache.get(cache_key)) is not None:
+            logger.info("Conclusion served from cache")
+            return cached
+
+        try:
+            response = await self._create(
+                "conclusion",
+                messages=messages
+            )
+        except LLMUnavailable as e:
+            return self._degraded_conclusion(session, e, decision)
+        prompts.stats.record("conclusion", messages, response.usage)
         
         conclusion = response.choices[0].message.content
-        logger.info(f"Generated conclusion: {conclusion[:100]}...")
+        logger.info("Generated conclusion: %.100s...", conclusion, extra={"sampled": True})
+        # A cut-off conclusion is served once but not cached
+        if cache_key is not None and getattr(response.choices[0], "finish_reason", None) != "length":
+            response_cache.set(cache_key, conclusion)
         return conclusion
 
-    def is_issue_resolved(self, user_message: str) -> bool:
-        """Check if user indicates the issue is resolved."""
-        resolved = any(keyword in user_message.lower() for keyword in ['fine', 'works', 'fixed', 'yes', 'good', 'better', 'resolved', 'solved'])
-        logger.info(f"Issue resolved check: {user_message} -> {resolved}")
+    async def stream_conclusion(self, session, decision: rules.RebootDecision | None = None) -> AsyncIterator[str]:
+        """Same as generate_conclusion, but yields the Markdown as tokens arrive."""
+        if session.fast_mode:
+            yield self.offline_conclusion(session, decision)
+            return
+        messages = self._conclusion_messages(session, decision)
+        cache_key = self._conclusion_cache_key(messages)
+        if cache_key is not None and (cached := response_cache.get(cache_key)) is not None:
+            logger.info("Conclusion served from cache")
+            yield cached
+            return
+
+        conclusion = ""
+        finish_reasons = []
+        try:
+            async for token in self._stream_completion(
+                "conclusion",
+                finish_reasons,
+                messages=messages
+            ):
+                conclusion += token
+                yield token
+        except LLMUnavailable as e:
+            yield self._degraded_conclusion(session, e, decision)
+            return
+        if cache_key is not None and finish_reasons != ["length"]:
+            response_cache.set(cache_key, conclusion)
+
+    def _conclusion_cache_key(self, messages: list[dict]) -> str | None:
+        # Conclusions quote exact speeds and answers; a bucketed key would serve wrong numbers
+        if not settings.response_cache_enabled:
+            return None
+        return exact_key("conclusion", messages)
+
+    def _conclusion_messages(self, session, decision: rules.RebootDecision | None = None) -> list[dict]:
+        logger.info("Generating conclusion for session - issue: %s", session.issue_description, extra={"sampled": True})
+        logger.debug("User answers: %s, Metrics: %s", session.user_answers, session.metrics)
+        return prompts.conclusion_messages(
+            session.issue_description, session.metrics,
+            session.follow_up_questions, session.user_answers, session.current_question_index, decision,
+        )
+
+    async def is_issue_resolved(self, user_message: str, fast: bool = False) -> bool:
+        """Check if user indicates the issue is resolved, asking the LLM only when unsure (never with `fast`)."""
+        local = nlu.classify_resolution(user_message)
+        if fast or local.confidence >= settings.nlu_confidence_threshold:
+            nlu.stats.record("resolution", fast_path=True)
+            logger.info("Issue resolved check (fast path): %s -> %s (%.2f)", user_message, local.value, local.confidence)
+            return local.value
+        nlu.stats.record("resolution", fast_path=False)
+
+        messages = prompts.resolution_messages(user_message)
+        try:
+            response = await self._create(
+                "resolution",
+                messages=messages,
+                temperature=0.0
+            )
+            prompts.stats.record("resolution", messages, response.usage)
+            resolved = "YES" in response.choices[0].message.content.strip().upper()
+        except Exception as e:
+            logger.error("Error during resolution check: %s", e)
+            # Fall back to the local model's best guess
+            resolved = local.value
+        logger.info("Issue resolved check: %s -> %s", user_message, resolved)
         return resolved
 
     def get_success_message(self) -> str:
@@ -254,58 +423,114 @@ Format your answer using Markdown. Use `###` for section headings and `-` for bu
         """Get standardized support message."""
         return "Sorry about that. Please call customer support at 888-888-8888 for further assistance."
 
-    async def should_reboot_router(self, test_results: AutoTestResults, user_answers: list[str]) -> bool:
-        logger.info(f"Checking if reboot should be recommended based on: {test_results}, {user_answers}")
-        logger.debug(f"Test results: {test_results}, User answers: {user_answers}")
-        # Handle both dict and object formats for test results
-        if hasattr(test_results, 'get'):  # dict format
-            speed = test_results.get('speed', {}).get('speed', 'unknown')
-            latency = test_results.get('connectivity', {}).get('latency', 'unknown')
-            connection_type = test_results.get('connectionInfo', {}).get('type', 'unknown')
-            connectivity_status = "connected" if speed != 'unknown' else "disconnected"
-            packet_loss = "0"
-            device_type = "browser"
-        else:  # object format
-            speed = getattr(test_results, 'speed', 'unknown')
-            if hasattr(speed, 'speed'):
-                speed = speed.speed
-            latency = getattr(test_results, 'connectivity', 'unknown')
-            if hasattr(latency, 'latency'):
-                latency = latency.latency
-            connection_type = getattr(test_results, 'connectionInfo', 'unknown')
-            if hasattr(connection_type, 'type'):
-                connection_type = connection_type.type
-            connectivity_status = "connected" if speed != 'unknown' else "disconnected"
-            packet_loss = "0"
-            device_type = "browser"
-
-        context = (
-            f"Connectivity: {connectivity_status}, "
-            f"Speed: {speed} Mbps, "
-            f"Latency: {latency} ms, "
-            f"Connection Type: {connection_type}, "
-            f"Packet Loss: {packet_loss}%, "
-            f"Device Type: {device_type}\n\n"
-            f"User Answers: {' | '.join(user_answers)}"
-        )
-
-        prompt = f"""You are a diagnostic AI. Based on this data:
-
-{context}
-
-Should the user try rebooting the router? Answer only YES or NO."""
-
-        response = await self.llm.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": prompt},
-            ],
-            temperature=0.2
-        )
+    async def should_reboot_router(
+        self,
+        metrics: NetworkMetrics | None,
+        user_answers: list[str],
+        follow_up_questions: list[str] | None = None,
+        fast: bool = False,
+    ) -> rules.RebootDecision:
+        """Decide on a reboot with the rule table, asking the LLM only when no rule applies (never with `fast`)."""
+        logger.debug("Metrics: %s, User answers: %s", metrics, user_answers)
+        features = rules.build_features(metrics, follow_up_questions or [], user_answers)
+
+        decision = rules.evaluate(features)
+        if decision is not None:
+            logger.info("Reboot decision from rule %s: %s", decision.rule, decision.reboot)
+            return decision
+        if fast:
+            return rules.RebootDecision(True, "default", "No rule covered these results; a reboot is the safe default.", source="fallback")
+
+        messages = prompts.reboot_messages(metrics, follow_up_questions or [], user_answers)
+        try:
+            response = await self._create(
+                "reboot",
+                messages=messages,
+                temperature=0.2
+            )
+        except LLMUnavailable as e:
+            llm_scheduler.degraded.inc("reboot")
+            logger.warning("Reboot decision without the LLM (%s); recommending a reboot", e.reason)
+            return rules.RebootDecision(True, "degraded", "The model was unavailable; a reboot is the safe default.", source="fallback")
+        prompts.stats.record("reboot", messages, response.usage)
 
         answer = response.choices[0].message.content.strip().lower()
-        return "yes" in answer
+        reboot = "yes" in answer
+        logger.info("Reboot decision from LLM (no rule matched): %s", reboot)
+        return rules.RebootDecision(reboot, "llm", "No rule covered these results; the model decided.", source="llm")
 
     def get_ending_message(self) -> str:
         """Get standardized conversation end message."""
-        return "This conversation has ended. Please start a new session if you need more help."
\ No newline at end of file
+        return "This conversation has ended. Please start a new session if you need more help."
+
+    def _offline_question(self, plan: "_QuestionPlan", reason: str) -> str:
+        """Next question from the offline bank; never cached."""
+        question_bank.served.inc(reason)
+        return question_bank.active_bank().question_text(plan.metrics, plan.follow_up_questions, plan.user_answers)
+
+    def offline_conclusion(self, session, decision: rules.RebootDecision | None = None) -> str:
+        """Checklist conclusion from the test results and the reboot rules, without the LLM; never cached."""
+        if decision is None:
+            decision = rules.evaluate(rules.build_features(session.metrics, session.follow_up_questions, session.user_answers))
+        reboot = decision is None or decision.reboot
+        steps = [
+            "Move closer to the router, or remove obstacles between it and your device.",
+            "Disconnect devices you are not using, especially ones streaming or downloading.",
+            "Forget the network on your device and reconnect.",
+        ]
+        if reboot:
+            steps.insert(0, "Restart your router: unplug it, wait 30 seconds and plug it back in. Give it 2-3 minutes to come back.")
+        lines = ["### Your results", prompts.test_summary(session.metrics), "", "### What to try"]
+        lines += [f"- {step}" for step in steps]
+        if decision is not None:
+            lines += ["", decision.explanation]
+        lines += ["", "Did the reboot improve your connection? (Yes/No)" if reboot else "Did these steps improve your connection? (Yes/No)"]
+        return "\n".join(lines)
+
+    def _degraded_conclusion(self, session, error: LLMUnavailable, decision: rules.RebootDecision | None = None) -> str:
+        llm_scheduler.degraded.inc("conclusion")
+        logger.warning("Serving an offline conclusion (%s)", error.reason)
+        return self.offline_conclusion(session, decision)
+
+
+@dataclass(slots=True)
+class _QuestionPlan:
+    messages: list[dict]
+    cache_key: str | None
+    # Local verdict on the latest answer; None means the LLM has to decide
+    valid: bool | None
+    reask: str | None
+    previous_question: str | None
+    user_input: str | None
+    # Session context for the offline question bank
+    metrics: NetworkMetrics | None = None
+    follow_up_questions: list[str] = field(default_factory=list)
+    user_answers: list[str] = field(default_factory=list)
+
+
+# Process-wide service instance, built by the app lifespan (or lazily on first use)
+_service: TroubleshootService | None = None
+
+
+def get_troubleshoot_service() -> TroubleshootService:
+    """Return the shared TroubleshootService, creating it on first use."""
+    global _service
+    if _service is None:
+        _service = TroubleshootService()
+    return _service
+
+
+async def start_troubleshoot_service(warmup: bool = True) -> TroubleshootService:
+    """Build the shared service at startup and optionally warm its connection pool."""
+    service = get_troubleshoot_service()
+    if warmup:
+        await service.warmup()
+    return service
+
+
+async def stop_troubleshoot_service():
+    """Close the shared service's connection pool at shutdown."""
+    global _service
+    if _service is not None:
+        await _service.aclose()
+        _service = None
\ No newline at end of file
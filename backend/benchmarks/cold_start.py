@@ -0,0 +1,108 @@
+# cold_start.py
+"""Cold-start benchmark: import time of the app entry points in fresh interpreters.
+
+Each run starts a new Python process, times the import of the target module
+and collects `-X importtime` output, so results include everything a fresh
+serverless container pays before its first request. Reports the median
+import time per target and the packages that cost the most.
+
+    python -m benchmarks.cold_start                      # app.main and app.serverless
+    python -m benchmarks.cold_start app.main --runs 20 --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+TARGETS = ("app.main", "app.serverless")
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {target}
+print("total_ms", (time.perf_counter() - start) * 1000, file=sys.stderr)
+print("heavy", *sorted(m for m in ("openai", "httpx", "numpy", "tiktoken") if m in sys.modules), file=sys.stderr)
+"""
+
+
+def run_once(target: str, env: dict | None = None) -> tuple[float, dict[str, tuple[int, int]], list[str]]:
+    """Import `target` in a fresh interpreter; returns total ms, (self, cumulative) us per module and heavy modules loaded."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(target=target)],
+        capture_output=True, text=True, env={**os.environ, **(env or {})},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules, total, heavy = {}, None, []
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+            if self_us.strip().isdigit():
+                modules[name.strip()] = (int(self_us), int(cumulative_us))
+        elif line.startswith("total_ms"):
+            total = float(line.split()[1])
+        elif line.startswith("heavy"):
+            heavy = line.split()[1:]
+    return total, modules, heavy
+
+
+def by_package(modules: dict[str, tuple[int, int]]) -> dict[str, float]:
+    """Self time in ms summed per top-level package (per module for `app`)."""
+    totals = defaultdict(float)
+    for name, (self_us, _) in modules.items():
+        key = name if name.startswith("app.") or name == "app" else name.split(".")[0]
+        totals[key] += self_us / 1000
+    return totals
+
+
+def measure(target: str, runs: int, env: dict | None = None) -> dict:
+    times, packages, heavy = [], defaultdict(list), []
+    for _ in range(runs):
+        total, modules, heavy = run_once(target, env)
+        times.append(total)
+        for package, ms in by_package(modules).items():
+            packages[package].append(ms)
+    return {
+        "target": target,
+        "runs": runs,
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "max_ms": round(max(times), 1),
+        "heavy_modules": heavy,
+        "packages_ms": {p: round(statistics.median(v), 1) for p, v in packages.items()},
+    }
+
+
+def format_report(report: dict, top: int) -> str:
+    lines = [
+        f"{report['target']}: median {report['median_ms']} ms "
+        f"(min {report['min_ms']}, max {report['max_ms']}, {report['runs']} runs)",
+        f"  heavy modules loaded: {', '.join(report['heavy_modules']) or 'none'}",
+    ]
+    ranked = sorted(report["packages_ms"].items(), key=lambda item: item[1], reverse=True)[:top]
+    lines.extend(f"  {ms:>8.1f} ms  {package}" for package, ms in ranked)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", default=TARGETS)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="packages to list by self import time")
+    args = parser.parse_args()
+
+    # Settings require a key; the value is never used while importing
+    env = {"OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "cold-start")}
+    for target in args.targets:
+        try:
+            report = measure(target, args.runs, env)
+        except RuntimeError as e:
+            print(f"{target}: import failed ({e})\n")
+            continue
+        print(format_report(report, args.top) + "\n")
+
+
+if __name__ == "__main__":
+    main()
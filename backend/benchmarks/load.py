@@ -0,0 +1,354 @@
+# load.py
+"""End-to-end load benchmark for the chat API.
+
+Drives synthetic sessions through the whole conversation (greeting, auto
+tests, five follow-up questions, conclusion, post-reboot check) with a
+bounded number in flight, and reports latency percentiles per state plus
+overall throughput. Results can be saved as a baseline and later runs
+compared against it.
+
+    # Start the mock LLM and the app, run 2000 sessions, 200 at a time
+    python -m benchmarks.load --spawn --sessions 2000 --concurrency 200
+
+    # Against servers that are already running, streaming endpoint
+    python -m benchmarks.load --url http://127.0.0.1:8000 --stream
+
+    python -m benchmarks.load --spawn --save benchmarks/baselines/chat.json
+    python -m benchmarks.load --spawn --compare benchmarks/baselines/chat.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+import httpx
+import numpy as np
+
+STATES = ("greeting", "run_auto_tests", "follow_up", "conclusion", "post_reboot_check")
+PERCENTILES = (50, 95, 99)
+
+ISSUES = (
+    "My internet is really slow",
+    "WiFi keeps dropping in the evening",
+    "Video calls freeze all the time",
+    "I can't load any websites",
+)
+ANSWERS = (
+    ("three", "five or six", "just my laptop"),
+    ("yes", "no", "not sure"),
+    ("about a week ago", "yesterday", "never"),
+    ("no", "yes, my phone too"),
+    ("upstairs", "same room", "in the basement"),
+)
+FINAL_ANSWERS = ("yes it works now", "no, still slow")
+
+
+@dataclass
+class Timings:
+    """Per-state latencies in seconds, plus time to first token when streaming."""
+    latency: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    first_token: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    requests: int = 0
+
+
+def auto_test_results(rng: random.Random, samples: int = 0) -> dict:
+    """A plausible frontend auto-test payload, optionally with raw samples."""
+    speed = round(rng.uniform(2, 150), 2)
+    latency = round(rng.uniform(10, 300), 1)
+    results = {
+        "connectivity": {"connected": rng.random() > 0.05, "latency": latency},
+        "speed": {"speed": speed, "latency": latency},
+        "connectionInfo": {"type": rng.choice(("4g", "wifi", "ethernet"))},
+        "deviceType": rng.choice(("desktop", "mobile")),
+    }
+    if samples:
+        results["samples"] = {
+            "latency_ms": [round(rng.gauss(latency, latency / 5), 1) for _ in range(samples)],
+            "throughput_mbps": [round(max(0.1, rng.gauss(speed, speed / 10)), 2) for _ in range(samples)],
+        }
+    return results
+
+
+def conversation(rng: random.Random, samples: int = 0) -> list[tuple[str, dict]]:
+    """The (state, request body) pairs of one full session, in order."""
+    turns = [
+        ("greeting", {"message": rng.choice(ISSUES)}),
+        ("run_auto_tests", {"message": "", "auto_test_results": auto_test_results(rng, samples)}),
+    ]
+    for i, options in enumerate(ANSWERS):
+        turns.append(("conclusion" if i == len(ANSWERS) - 1 else "follow_up", {"message": rng.choice(options)}))
+    turns.append(("post_reboot_check", {"message": rng.choice(FINAL_ANSWERS)}))
+    return turns
+
+
+async def _send(client: httpx.AsyncClient, body: dict, stream: bool) -> float | None:
+    """Send one turn; returns the time to the first token event when streaming."""
+    if not stream:
+        response = await client.post("/api/v1/chat", json=body)
+        response.raise_for_status()
+        return None
+
+    start = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/api/v1/chat/stream", json=body) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif event == "error":
+                    raise RuntimeError("stream reported an error")
+                elif event == "done":
+                    return first_token
+    raise RuntimeError("stream ended without a done event")
+
+
+async def run_session(
+    client: httpx.AsyncClient, session_id: str, timings: Timings, rng: random.Random,
+    stream: bool = False, think_time: float = 0.0, samples: int = 0,
+):
+    """Play one conversation from greeting to the end; stops at the first failed turn."""
+    for state, body in conversation(rng, samples):
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+        start = time.perf_counter()
+        timings.requests += 1
+        try:
+            first_token = await _send(client, {"session_id": session_id, **body}, stream)
+        except (httpx.HTTPError, RuntimeError):
+            timings.errors[state] += 1
+            return
+        timings.latency[state].append(time.perf_counter() - start)
+        if first_token is not None:
+            timings.first_token[state].append(first_token)
+
+
+async def run_load(
+    client: httpx.AsyncClient, sessions: int = 1000, concurrency: int = 100,
+    stream: bool = False, think_time: float = 0.0, samples: int = 0, seed: int = 0,
+) -> dict:
+    """Run `sessions` conversations with at most `concurrency` in flight and summarize them."""
+    timings = Timings()
+    gate = asyncio.Semaphore(concurrency)
+    run_id = f"bench_{int(time.time())}_{random.Random(seed).randrange(1 << 30)}"
+
+    async def one(i: int):
+        async with gate:
+            await run_session(client, f"{run_id}_{i}", timings, random.Random(seed * 1_000_003 + i), stream, think_time, samples)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "config": {
+            "sessions": sessions, "concurrency": concurrency, "stream": stream,
+            "think_time_ms": think_time * 1000, "samples": samples,
+        },
+        # Baselines are only comparable on similar hardware
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+        "totals": {
+            "requests": timings.requests,
+            "errors": sum(timings.errors.values()),
+            "duration_s": round(elapsed, 3),
+            "rps": round(timings.requests / elapsed, 2) if elapsed else None,
+            "sessions_per_s": round(sessions / elapsed, 2) if elapsed else None,
+        },
+        "states": {
+            state: _summary(timings.latency[state], timings.first_token[state], timings.errors[state])
+            for state in STATES
+        },
+    }
+
+
+def _summary(latencies: list[float], first_tokens: list[float], errors: int) -> dict:
+    summary = {"count": len(latencies), "errors": errors}
+    if latencies:
+        ms = np.asarray(latencies) * 1000
+        summary.update({f"p{p}_ms": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))})
+        summary["mean_ms"] = round(float(ms.mean()), 2)
+        summary["max_ms"] = round(float(ms.max()), 2)
+    if first_tokens:
+        ms = np.asarray(first_tokens) * 1000
+        summary.update({f"ttft_p{p}_ms": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))})
+    return summary
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.2, min_delta_ms: float = 5.0) -> list[str]:
+    """Regressions of `report` against `baseline`, as human-readable lines.
+
+    A latency percentile regresses when it is more than `tolerance` (relative)
+    and `min_delta_ms` (absolute) above the baseline; throughput regresses when
+    it drops by more than `tolerance`. Any failed request is a regression.
+    """
+    regressions = []
+    if report["totals"]["errors"]:
+        regressions.append(f"{report['totals']['errors']} requests failed")
+    base_rps, rps = baseline["totals"].get("rps"), report["totals"].get("rps")
+    if base_rps and rps is not None and rps < base_rps * (1 - tolerance):
+        regressions.append(f"throughput {rps} rps < baseline {base_rps} rps")
+    for state, base in baseline["states"].items():
+        current = report["states"].get(state, {})
+        for key in (f"p{p}_ms" for p in PERCENTILES):
+            if key not in base or key not in current:
+                continue
+            if current[key] > base[key] * (1 + tolerance) and current[key] - base[key] > min_delta_ms:
+                regressions.append(f"{state} {key}: {current[key]} > baseline {base[key]}")
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    totals = report["totals"]
+    lines = [
+        f"{report['config']['sessions']} sessions, concurrency {report['config']['concurrency']}, "
+        f"{'streaming' if report['config']['stream'] else 'non-streaming'}",
+        f"{totals['requests']} requests in {totals['duration_s']}s: {totals['rps']} rps, "
+        f"{totals['sessions_per_s']} sessions/s, {totals['errors']} errors",
+        "",
+        f"{'state':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p50':>10}",
+    ]
+    for state, s in report["states"].items():
+        lines.append(
+            f"{state:<20}{s['count']:>8}{s.get('p50_ms', '-'):>10}{s.get('p95_ms', '-'):>10}"
+            f"{s.get('p99_ms', '-'):>10}{s.get('ttft_p50_ms', '-'):>10}"
+        )
+    return "\n".join(lines)
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def spawn_servers(args) -> list[subprocess.Popen]:
+    """Start the mock LLM and the app as subprocesses pointed at each other."""
+    mock = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.mock_llm", "--port", str(args.mock_port),
+        "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+        "--token-delay-ms", str(args.llm_token_delay_ms),
+    ])
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.mock_port}/v1",
+        "RESPONSE_CACHE_ENABLED": str(args.cache).lower(),
+    }
+    if args.workers > 1:
+        # Turns of one session land on different workers, so they need a shared store
+        env["SESSION_BACKEND"] = "sqlite"
+        env["SESSION_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench"), "sessions.db")
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning", "--backlog", "4096",
+    ], env=env)
+    processes = [mock, app]
+    try:
+        _wait_until_up(f"http://127.0.0.1:{args.mock_port}/docs", mock)
+        _wait_until_up(f"http://127.0.0.1:{args.port}/health", app)
+    except RuntimeError:
+        stop_servers(processes)
+        raise
+    return processes
+
+
+def stop_servers(processes: list[subprocess.Popen]):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _main(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        report = await run_load(
+            client, args.sessions, args.concurrency, args.stream,
+            args.think_ms / 1000, args.samples, args.seed,
+        )
+    if args.spawn:
+        report["config"].update({
+            "llm_latency_ms": args.llm_latency_ms, "llm_jitter_ms": args.llm_jitter_ms,
+            "llm_token_delay_ms": args.llm_token_delay_ms, "workers": args.workers, "cache": args.cache,
+        })
+    print(format_report(report))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions against {args.compare}:")
+            print("\n".join(f"  - {r}" for r in regressions))
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running app (default: the spawned one)")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="sessions in flight at once")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and record time to first token")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean user think time between turns")
+    parser.add_argument("--samples", type=int, default=0, help="raw samples per series in the auto-test payload")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--save", metavar="PATH", help="write the report as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="fail if the run regresses against a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+
+    spawn = parser.add_argument_group("spawned servers")
+    spawn.add_argument("--spawn", action="store_true", help="start the mock LLM and the app")
+    spawn.add_argument("--port", type=int, default=8100)
+    spawn.add_argument("--mock-port", type=int, default=9100)
+    spawn.add_argument("--workers", type=int, default=1)
+    spawn.add_argument("--cache", action=argparse.BooleanOptionalAction, default=False,
+                       help="keep the response cache on (off by default so every turn reaches the LLM)")
+    spawn.add_argument("--llm-latency-ms", type=float, default=300.0)
+    spawn.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    spawn.add_argument("--llm-token-delay-ms", type=float, default=15.0)
+    args = parser.parse_args()
+
+    if not args.spawn and not args.url:
+        parser.error("pass --url or --spawn")
+    args.url = args.url or f"http://127.0.0.1:{args.port}"
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        sys.exit(asyncio.run(_main(args)))
+    finally:
+        stop_servers(processes)
+
+
+if __name__ == "__main__":
+    main()
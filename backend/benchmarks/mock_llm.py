@@ -0,0 +1,122 @@
+# mock_llm.py
+"""OpenAI-compatible stub for benchmarks.
+
+Serves POST /v1/chat/completions with a fixed think time, optional jitter
+and, for streaming requests, a per-token delay. Replies are chosen from the
+prompt: YES for the yes/no checks, a Markdown conclusion for conclusion
+prompts, and a follow-up question otherwise.
+
+    python -m benchmarks.mock_llm --port 9100 --latency-ms 300 --token-delay-ms 15
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+QUESTIONS = (
+    "How many devices are connected to your network right now?",
+    "When did you last restart your router?",
+    "Are other devices in your home also having trouble?",
+    "Is your computer in the same room as the router?",
+    "Do you notice the slowdown at particular times of day?",
+)
+CONCLUSION = (
+    "### Analysis\n- Your speed is below what your plan should deliver.\n"
+    "- Latency spikes suggest the router is congested.\n\n"
+    "### Recommendation\n- Unplug your router, wait 30 seconds, and plug it back in.\n\n"
+    "Did the reboot improve your connection? (Yes/No)"
+)
+
+
+def build_app(latency_ms: float = 300.0, jitter_ms: float = 50.0, token_delay_ms: float = 15.0) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI")
+    counter = itertools.count()
+
+    def think_time() -> float:
+        return max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000
+
+    def reply_for(messages: list[dict]) -> str:
+        text = " ".join(str(m.get("content", "")) for m in messages)
+        if "YES or NO" in text:
+            return "YES"
+        if "personalized conclusion" in str(messages[0].get("content", "")):
+            return CONCLUSION
+        return QUESTIONS[next(counter) % len(QUESTIONS)]
+
+    def usage(messages: list[dict], reply: str) -> dict:
+        prompt = sum(len(str(m.get("content", ""))) for m in messages) // 4
+        completion = max(1, len(reply) // 4)
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    @app.head("/v1")
+    @app.head("/v1/")
+    async def warmup():
+        return JSONResponse({})
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        reply = reply_for(messages)
+        created = int(time.time())
+        completion_id = f"chatcmpl-{next(counter)}"
+
+        if not body.get("stream"):
+            await asyncio.sleep(think_time())
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage(messages, reply),
+            })
+
+        async def events():
+            # Time to first token is the think time; the rest trickles out
+            await asyncio.sleep(think_time())
+            words = reply.split(" ")
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if token_delay_ms:
+                    await asyncio.sleep(token_delay_ms / 1000)
+            if (body.get("stream_options") or {}).get("include_usage"):
+                final = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": body.get("model", "mock"), "choices": [], "usage": usage(messages, reply)}
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="think time before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="uniform +/- jitter on the think time")
+    parser.add_argument("--token-delay-ms", type=float, default=15.0, help="delay between streamed tokens")
+    args = parser.parse_args()
+    uvicorn.run(
+        build_app(args.latency_ms, args.jitter_ms, args.token_delay_ms),
+        host=args.host, port=args.port, log_level="warning", backlog=4096,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# serialization.py
+"""Micro-benchmark of the per-request JSON work on the chat path.
+
+Times, per request, parsing a chat turn body into `ChatRequest` and
+rendering a `ChatResponse`, each two ways: the path FastAPI takes by
+default (json.loads then model validation; response validation, encoding
+and json.dumps) and the path the chat routes use (validation straight from
+the JSON bytes; FastJSONResponse over the model). The auto-test turn
+carries the frontend's full payload, including raw samples.
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --samples 2000 --number 2000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from fastapi.responses import JSONResponse
+from app.core.fastjson import FastJSONResponse
+from app.models.schemas import ChatRequest, ChatResponse
+
+
+def auto_test_body(samples: int, seed: int = 0) -> bytes:
+    """A chat request carrying auto-test results shaped like the frontend's."""
+    rng = random.Random(seed)
+    probe = {
+        "sent": 50, "received": 49, "loss_pct": 2.0, "rtt_min_ms": 18.2, "rtt_p50_ms": 24.1, "rtt_p95_ms": 61.5,
+        "rtt_p99_ms": 80.3, "rtt_max_ms": 92.0, "rtt_mean_ms": 29.4, "jitter_ms": 6.1,
+    }
+    results = {
+        "connectivity": {"connected": True, "latency": 142, "timestamp": "2026-10-17T09:00:00.000Z", "probe": probe, "packetLoss": 2.0},
+        "speed": {
+            "speed": 48.21, "latency": 35, "uploadSpeed": 9.8, "streams": 4, "bytes": 33554432,
+            "serverDownloadSpeed": 51.0, "serverUploadSpeed": 10.1, "timestamp": "2026-10-17T09:00:05.000Z",
+        },
+        "connectionInfo": {"type": "4g", "downlink": 10, "rtt": 50},
+        "deviceType": "desktop",
+        "samples": {
+            "latency_ms": [round(rng.uniform(15, 80), 2) for _ in range(samples)],
+            "latency_at": [i * 100 for i in range(samples)],
+            "throughput_mbps": [round(rng.uniform(20, 60), 2) for _ in range(samples)],
+            "throughput_at": [i * 250 for i in range(samples)],
+        },
+        "test_timestamp": "2026-10-17T09:00:06.000Z",
+    }
+    return json.dumps({"message": "", "session_id": "session_1760691600000", "auto_test_results": results}).encode()
+
+
+TEXT_BODY = json.dumps({"message": "About 12 devices, mostly phones", "session_id": "session_1760691600000"}).encode()
+RESPONSE = ChatResponse(message="How many of those devices are streaming video at the same time? " * 3)
+
+
+def _default_parse(body: bytes) -> ChatRequest:
+    # fastapi.routing: await request.json(), then the body field validates the dict
+    return ChatRequest.model_validate(json.loads(body))
+
+
+def _fast_parse(body: bytes) -> ChatRequest:
+    return ChatRequest.model_validate_json(body)
+
+
+def _default_render(response: ChatResponse) -> bytes:
+    # fastapi.routing.serialize_response: validate against response_model, dump in JSON mode, json.dumps
+    content = ChatResponse.model_validate(response, from_attributes=True).model_dump(mode="json")
+    return JSONResponse(content).body
+
+
+def _fast_render(response: ChatResponse) -> bytes:
+    return FastJSONResponse(response).body
+
+
+def measure(fn, arg, number: int, repeat: int) -> float:
+    """Median microseconds per call."""
+    runs = timeit.repeat(lambda: fn(arg), number=number, repeat=repeat)
+    return statistics.median(runs) / number * 1e6
+
+
+def run(samples: int, number: int, repeat: int) -> dict:
+    body = auto_test_body(samples)
+    cases = {
+        "parse text turn": (TEXT_BODY, _default_parse, _fast_parse),
+        f"parse auto-test turn ({samples} samples/series, {len(body) // 1024} KiB)": (body, _default_parse, _fast_parse),
+        "render response": (RESPONSE, _default_render, _fast_render),
+    }
+    assert _default_parse(body) == _fast_parse(body)
+    assert json.loads(_default_render(RESPONSE)) == json.loads(_fast_render(RESPONSE))
+    report = {}
+    for name, (arg, default, fast) in cases.items():
+        before, after = measure(default, arg, number, repeat), measure(fast, arg, number, repeat)
+        report[name] = {"default_us": round(before, 2), "fast_us": round(after, 2), "speedup": round(before / after, 2)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=100, help="raw samples per series in the auto-test payload")
+    parser.add_argument("--number", type=int, default=1000, help="calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = run(args.samples, args.number, args.repeat)
+    width = max(len(name) for name in report)
+    print(f"{'':{width}}  {'default':>10}  {'fast':>10}  speedup")
+    for name, row in report.items():
+        print(f"{name:{width}}  {row['default_us']:>8.2f}us  {row['fast_us']:>8.2f}us  {row['speedup']:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
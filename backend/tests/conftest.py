@@ -0,0 +1,54 @@
+import asyncio
+import os
+from types import SimpleNamespace
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+
+class FakeCompletions:
+    """Stand-in for `AsyncOpenAI.chat.completions` that answers from a script."""
+
+    def __init__(self, reply, delay=0.0):
+        self.reply = reply
+        self.delay = delay
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        text = self.reply(kwargs) if callable(self.reply) else self.reply
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10, total_tokens=110, prompt_tokens_details=None)
+        if kwargs.get("stream"):
+            async def chunks():
+                for word in text.split(" "):
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))], usage=None)
+            return chunks()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+class FakeLLM:
+    def __init__(self, reply="How many devices are connected to your network?", delay=0.0):
+        self.chat = SimpleNamespace(completions=FakeCompletions(reply, delay))
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def reset_llm_scheduling():
+    """Keep breaker state and latency history from leaking between tests."""
+    yield
+    from app.services import llm_scheduler, model_routing
+    llm_scheduler.scheduler.reset()
+    model_routing.router.reset()
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Install a TroubleshootService backed by a scripted LLM as the shared service."""
+    import app.services.troubleshoot as troubleshoot
+    llm = FakeLLM(lambda kwargs: "YES" if "YES or NO" in str(kwargs["messages"]) else "How many devices are connected to your network?")
+    monkeypatch.setattr(troubleshoot, "_service", troubleshoot.TroubleshootService(llm=llm))
+    return llm
@@ -0,0 +1,86 @@
+import asyncio
+import time
+import numpy as np
+from app.models import metrics as metrics_module
+from app.models.metrics import NetworkMetrics, parse_test_results
+from app.models.schemas import AutoTestResults, RawSamples
+from app.services.analysis import describe
+
+
+class TestDescribe:
+
+    def test_matches_numpy_reference(self):
+        """Test that percentiles, stddev and trend agree with NumPy's own routines"""
+        rng = np.random.default_rng(3)
+        values = rng.gamma(2.0, 20.0, 3001)
+        timestamps = np.sort(rng.uniform(0, 10_000, 3001))
+        stats = describe(values, timestamps)
+
+        p5, p50, p95 = np.percentile(values, (5, 50, 95))
+        slope = np.polyfit(timestamps, values, 1)[0]
+        assert stats.count == 3001
+        assert (stats.p5, stats.median, stats.p95) == tuple(round(float(q), 3) for q in (p5, p50, p95))
+        assert abs(stats.stddev - values.std()) < 1e-3
+        assert abs(stats.trend_pct - slope * np.ptp(timestamps) / p50 * 100) < 1e-3
+
+    def test_outliers_and_trend(self):
+        """Test that isolated spikes are flagged and a falling series has a negative trend"""
+        latency = [20.0] * 50 + [21.0] * 50 + [900.0, 1200.0]
+        assert describe(latency).outliers == 2
+
+        falling = np.linspace(100, 40, 200)
+        assert describe(falling).trend_pct < -50
+
+    def test_non_finite_and_empty(self):
+        """Test that NaN readings are dropped and an empty series has no statistics"""
+        assert describe([10.0, float("nan"), 30.0]).count == 2
+        assert describe([]) is None
+
+    def test_thousands_of_samples_in_microseconds(self):
+        """Test that a few thousand samples are analysed well under a millisecond"""
+        values = np.random.default_rng(5).gamma(2.0, 20.0, 3000).tolist()
+        describe(values)
+        start = time.perf_counter()
+        for _ in range(100):
+            describe(values)
+        assert (time.perf_counter() - start) / 100 < 0.001
+
+
+class TestSampleMetrics:
+
+    def test_medians_replace_single_readings(self):
+        """Test that multi-sample runs feed medians and spread into the metrics"""
+        results = AutoTestResults(
+            connectivity={"connected": True, "latency": 900},
+            speed={"speed": 2.0},
+            samples=RawSamples(latency_ms=[30, 32, 31, 29, 900], throughput_mbps=[50, 48, 52, 51]),
+        )
+        metrics = NetworkMetrics.from_test_results(results)
+        assert metrics.latency_ms == 31.0
+        assert metrics.speed_mbps == 50.5
+        assert metrics.latency_p95_ms > 700
+        assert metrics.outlier_samples == 1
+
+    def test_single_readings_leave_spread_unknown(self):
+        """Test that runs without samples keep the old single-value metrics"""
+        metrics = NetworkMetrics.from_test_results(AutoTestResults(connectivity={"connected": True, "latency": 40}))
+        assert metrics.latency_ms == 40.0
+        assert metrics.latency_p95_ms is None and metrics.outlier_samples is None
+
+    def test_large_sample_sets_leave_the_event_loop(self, monkeypatch):
+        """Test that big sample sets are analysed in a worker thread"""
+        offloaded = []
+
+        async def to_thread(fn, *args):
+            offloaded.append(fn)
+            return fn(*args)
+
+        monkeypatch.setattr(metrics_module.settings, "analysis_offload_samples", 100)
+        monkeypatch.setattr(metrics_module.asyncio, "to_thread", to_thread)
+        small = AutoTestResults(samples=RawSamples(latency_ms=[20.0] * 10))
+        large = AutoTestResults(samples=RawSamples(latency_ms=[20.0] * 500))
+
+        asyncio.run(parse_test_results(small))
+        assert offloaded == []
+        assert asyncio.run(parse_test_results(large)).latency_ms == 20.0
+        assert len(offloaded) == 1
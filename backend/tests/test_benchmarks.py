@@ -0,0 +1,75 @@
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from app.main import app
+from benchmarks.load import STATES, compare, run_load
+from benchmarks.mock_llm import CONCLUSION, build_app
+from benchmarks.serialization import run as run_serialization
+
+
+def _run(sessions, concurrency, stream=False):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run_load(client, sessions, concurrency, stream=stream)
+    return asyncio.run(go())
+
+
+class TestLoadHarness:
+
+    def test_sessions_reach_the_end(self, fake_llm):
+        """Test that every synthetic session walks all states without errors"""
+        report = _run(sessions=6, concurrency=3)
+        assert report["totals"]["errors"] == 0
+        assert report["totals"]["requests"] == 6 * 8
+        assert {s: report["states"][s]["count"] for s in STATES} == {
+            "greeting": 6, "run_auto_tests": 6, "follow_up": 24, "conclusion": 6, "post_reboot_check": 6,
+        }
+        assert report["states"]["follow_up"]["p50_ms"] <= report["states"]["follow_up"]["p99_ms"]
+
+    def test_streaming_records_first_token(self, fake_llm):
+        """Test that streaming runs report time to first token per state"""
+        report = _run(sessions=2, concurrency=2, stream=True)
+        assert report["totals"]["errors"] == 0
+        assert "ttft_p50_ms" in report["states"]["run_auto_tests"]
+
+    def test_compare_flags_regressions(self):
+        """Test that slower percentiles, lower throughput and errors are regressions, small noise is not"""
+        baseline = {"totals": {"rps": 100.0, "errors": 0}, "states": {"follow_up": {"p50_ms": 100.0, "p95_ms": 10.0}}}
+        same = {"totals": {"rps": 95.0, "errors": 0}, "states": {"follow_up": {"p50_ms": 110.0, "p95_ms": 14.0}}}
+        assert compare(same, baseline) == []
+        worse = {"totals": {"rps": 50.0, "errors": 2}, "states": {"follow_up": {"p50_ms": 200.0, "p95_ms": 14.0}}}
+        assert len(compare(worse, baseline)) == 3
+
+
+class TestMockLLM:
+
+    def test_replies_follow_the_prompt(self):
+        """Test that the stub answers validations with YES and conclusion prompts with a conclusion"""
+        client = TestClient(build_app(latency_ms=0, jitter_ms=0, token_delay_ms=0))
+
+        def reply(messages):
+            response = client.post("/v1/chat/completions", json={"model": "m", "messages": messages})
+            return response.json()["choices"][0]["message"]["content"]
+
+        assert reply([{"role": "system", "content": "Answer only: YES or NO"}]) == "YES"
+        assert reply([{"role": "system", "content": "providing intelligent, personalized conclusions"}]) == CONCLUSION
+        assert reply([{"role": "system", "content": "Ask one question"}]).endswith("?")
+
+    def test_stream_ends_with_usage_and_done(self):
+        """Test that streamed replies carry a usage chunk when asked for and finish with [DONE]"""
+        client = TestClient(build_app(latency_ms=0, jitter_ms=0, token_delay_ms=0))
+        body = {"model": "m", "stream": True, "stream_options": {"include_usage": True},
+                "messages": [{"role": "user", "content": "hi"}]}
+        lines = [l for l in client.post("/v1/chat/completions", json=body).text.splitlines() if l]
+        assert lines[-1] == "data: [DONE]"
+        assert '"usage"' in lines[-2]
+
+
+class TestSerialization:
+
+    def test_fast_path_matches_default(self):
+        """Test that the serialization benchmark checks both paths agree and reports each case"""
+        report = run_serialization(samples=10, number=5, repeat=1)
+        assert len(report) == 3
+        assert all(row["default_us"] > 0 and row["fast_us"] > 0 for row in report.values())
@@ -112,6 +112,141 @@ class TestChatFlow:
         assert session.state == ConversationState.GREETING
         assert session.issue_description == ""
 
+    def test_service_is_shared(self):
+        """Test that every caller gets the same pooled TroubleshootService"""
+        from app.services.troubleshoot import get_troubleshoot_service
+        assert get_troubleshoot_service() is get_troubleshoot_service()
+
+    def test_health_reports_pool_stats(self, client):
+        """Test that /health exposes LLM connection pool statistics"""
+        response = client.get("/health")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "OK"
+        assert data["llm_pool"]["closed"] is False
+        assert "idle" in data["llm_pool"]
+
+    def test_pool_is_reused_and_reported(self):
+        """Test that LLM requests share one kept-alive connection and show up in the pool stats"""
+        import asyncio
+        from app.services.llm_client import build_http_client, build_transport, pool_stats
+
+        async def main():
+            server, port, _ = await _http_server()
+            transport = build_transport()
+            async with build_http_client(transport) as http_client:
+                for _ in range(3):
+                    response = await http_client.get(f"http://127.0.0.1:{port}/")
+                    assert response.text == "ok"
+                stats = pool_stats(http_client, transport)
+            server.close()
+            return stats, pool_stats(http_client, transport)
+
+        stats, closed = asyncio.run(main())
+        assert stats["connections"] == 1 and stats["idle"] == 1
+        assert closed["closed"] is True
+
+    def test_environment_proxy_is_honoured(self, monkeypatch):
+        """Test that HTTP_PROXY still applies to the LLM client built on the shared pool"""
+        import asyncio
+        from app.services.llm_client import build_http_client
+
+        async def main():
+            server, port, seen = await _http_server()
+            monkeypatch.setenv("HTTP_PROXY", f"http://127.0.0.1:{port}")
+            monkeypatch.delenv("NO_PROXY", raising=False)
+            monkeypatch.delenv("no_proxy", raising=False)
+            async with build_http_client() as http_client:
+                response = await http_client.get("http://llm.example.invalid/v1/models")
+            server.close()
+            return response, seen
+
+        response, seen = asyncio.run(main())
+        assert response.text == "ok"
+        # A proxy receives the absolute URL in the request line
+        assert seen[0].startswith(b"GET http://llm.example.invalid/v1/models")
+
+
+async def _http_server():
+    """Local HTTP/1.1 server answering "ok" to every request; also records request heads."""
+    import asyncio
+    seen = []
+
+    async def handle(reader, writer):
+        try:
+            while head := await reader.readuntil(b"\r\n\r\n"):
+                seen.append(head)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1], seen
+
+
+class TestRequestValidation:
+
+    @pytest.fixture
+    def client(self):
+        return TestClient(app)
+
+    def test_malformed_test_results_are_rejected(self, client):
+        """Test that non-numeric readings in the auto-test payload get a 422 pointing at the field"""
+        response = client.post("/api/v1/chat", json={
+            "message": "", "session_id": "strict_1", "auto_test_results": {"speed": {"speed": "fast"}},
+        })
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "auto_test_results", "speed", "speed"]
+
+    def test_invalid_json_is_rejected(self, client):
+        """Test that a body that is not JSON gets a 422 like any other invalid body"""
+        response = client.post("/api/v1/chat", content=b"{not json", headers={"content-type": "application/json"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["type"] == "json_invalid"
+
+    def test_chat_body_is_documented(self, client):
+        """Test that the OpenAPI document still describes the chat request body and its nested models"""
+        operation = client.get("/openapi.json").json()["paths"]["/api/v1/chat"]["post"]
+        schema = operation["requestBody"]["content"]["application/json"]["schema"]
+        assert {"message", "session_id"} <= set(schema["required"])
+        assert "$ref" not in str(schema)
+
+
+class TestSolutionAnalysis:
+
+    @pytest.fixture
+    def client(self):
+        return TestClient(app)
+
+    def _finish_questions(self, client, session_id, speed, latency, fast_mode=None):
+        """Drive a conversation through /chat until the question budget is used up; returns the conclusion."""
+        client.post("/api/v1/chat", json={"message": "My WiFi is slow", "session_id": session_id})
+        client.post("/api/v1/chat", json={
+            "message": "", "session_id": session_id,
+            "auto_test_results": {"connectivity": {"connected": True}, "speed": {"speed": speed, "latency": latency}},
+        })
+        for _ in range(5):
+            data = client.post("/api/v1/chat", json={
+                "message": "About 4 devices", "session_id": session_id, "fast_mode": fast_mode,
+            }).json()
+        return data
+
+    def test_reboot_decision_reaches_the_conclusion(self, client, fake_llm):
+        """Test that the reboot rules run when the questions run out and their verdict is passed to the conclusion"""
+        self._finish_questions(client, "analysis_1", 2.0, 40.0)
+        prompt = str(fake_llm.chat.completions.calls[-1]["messages"])
+        assert "Reboot Recommended: Yes (Download speed is below 5 Mbps" in prompt
+        assert sessions.get("analysis_1").state == ConversationState.POST_REBOOT_CHECK
+
+    def test_no_reboot_when_rules_say_it_will_not_help(self, client, fake_llm):
+        """Test that a healthy connection gets a conclusion without reboot instructions"""
+        data = self._finish_questions(client, "analysis_2", 80.0, 20.0, fast_mode=True)
+        assert "Speed and latency look healthy" in data["message"]
+        assert "Restart your router" not in data["message"]
+        assert data["message"].endswith("Did these steps improve your connection? (Yes/No)")
+        assert sessions.get("analysis_2").state == ConversationState.POST_REBOOT_CHECK
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
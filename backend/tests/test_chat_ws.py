@@ -0,0 +1,130 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.core.config import settings
+from app.main import app
+from app.routes import chat_ws
+from app.routes.chat import sessions
+
+AUTO_TESTS = {"connectivity": {"connected": True, "latency": 60}, "speed": {"speed": 8}}
+
+
+def turn(ws, **frame):
+    """Send one message frame and collect the server frames up to its done or error."""
+    ws.send_text(json.dumps({"type": "message", **frame}))
+    frames = []
+    while True:
+        frames.append(ws.receive_json())
+        if frames[-1]["type"] in ("done", "error"):
+            return frames
+
+
+class StalledSocket:
+    """In-memory client that sends one frame and then never reads."""
+
+    def __init__(self, frame):
+        self.frames = [{"type": "websocket.receive", "text": json.dumps(frame)}]
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def receive(self):
+        if self.frames:
+            return self.frames.pop(0)
+        await asyncio.Event().wait()
+
+    async def send_text(self, data):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+class TestWebSocketChat:
+
+    def test_conversation_pushes_progress_tokens_and_done(self, fake_llm):
+        """Test that turns over one connection push progress, then tokens, then the final response"""
+        with TestClient(app).websocket_connect("/api/v1/chat/ws/ws_1") as ws:
+            greeting = turn(ws, message="My video calls drop")
+            assert greeting[-1]["state"] == "run_auto_tests"
+
+            frames = turn(ws, message="", auto_test_results=AUTO_TESTS)
+        kinds = [f["type"] for f in frames]
+        stages = [f["stage"] for f in frames if f["type"] == "progress"]
+        assert stages == ["analyzing_results", "generating_question"]
+        assert kinds.index("progress") < kinds.index("token") and kinds[-1] == "done"
+        done = frames[-1]
+        assert done["state"] == "follow_up_questions"
+        assert "".join(f["text"] for f in frames if f["type"] == "token").strip() == done["message"]
+        assert sessions.get("ws_1").follow_up_questions == ["How many devices are connected to your network?"]
+
+    def test_rest_and_websocket_share_the_session(self, fake_llm):
+        """Test that a conversation started over REST continues over the WebSocket"""
+        client = TestClient(app)
+        client.post("/api/v1/chat", json={"message": "Slow WiFi", "session_id": "ws_2"})
+        with client.websocket_connect("/api/v1/chat/ws/ws_2") as ws:
+            assert turn(ws, message="", auto_test_results=AUTO_TESTS)[-1]["state"] == "follow_up_questions"
+
+    def test_ping_and_bad_frames(self, fake_llm):
+        """Test that pings are answered and malformed frames get an error without closing the connection"""
+        with TestClient(app).websocket_connect("/api/v1/chat/ws/ws_3") as ws:
+            ws.send_text(json.dumps({"type": "ping"}))
+            assert ws.receive_json() == {"type": "pong"}
+            ws.send_text("not json")
+            assert ws.receive_json()["type"] == "error"
+            ws.send_text(json.dumps({"type": "message"}))
+            assert ws.receive_json()["type"] == "error"
+            assert turn(ws, message="Slow WiFi")[-1]["type"] == "done"
+
+
+class TestWebSocketLimits:
+
+    def test_heartbeat_then_idle_close(self, fake_llm, monkeypatch):
+        """Test that a silent client gets heartbeats and is closed once idle too long"""
+        monkeypatch.setattr(settings, "ws_heartbeat_seconds", 0.02)
+        monkeypatch.setattr(settings, "ws_idle_timeout_seconds", 0.1)
+        with TestClient(app).websocket_connect("/api/v1/chat/ws/ws_4") as ws:
+            assert ws.receive_json() == {"type": "ping"}
+            with pytest.raises(WebSocketDisconnect) as closed:
+                while True:
+                    ws.receive_json()
+        assert closed.value.code == 1001
+
+    def test_oversized_frame_closes(self, fake_llm, monkeypatch):
+        """Test that a frame over the size limit closes the connection with 1009"""
+        monkeypatch.setattr(settings, "ws_max_message_bytes", 100)
+        with TestClient(app).websocket_connect("/api/v1/chat/ws/ws_5") as ws:
+            ws.send_text(json.dumps({"type": "message", "message": "x" * 200}))
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+        assert closed.value.code == 1009
+
+    def test_frame_limit_counts_bytes(self, fake_llm, monkeypatch):
+        """Test that the size limit is applied to encoded bytes, not characters"""
+        monkeypatch.setattr(settings, "ws_max_message_bytes", 100)
+        with TestClient(app).websocket_connect("/api/v1/chat/ws/ws_5b") as ws:
+            # 40 characters, 160 bytes of UTF-8
+            ws.send_text(json.dumps({"type": "message", "message": "\U0001F4F6" * 40}, ensure_ascii=False))
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+        assert closed.value.code == 1009
+
+    def test_connection_ceiling(self, fake_llm, monkeypatch):
+        """Test that connections beyond the per-process ceiling are refused"""
+        monkeypatch.setattr(settings, "ws_max_connections", 0)
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with TestClient(app).websocket_connect("/api/v1/chat/ws/ws_6"):
+                pass
+        assert refused.value.code == 1013
+
+    def test_client_that_stops_reading_is_dropped(self, fake_llm, monkeypatch):
+        """Test that a turn blocked on a client that does not read is ended with 1008 instead of waiting forever"""
+        monkeypatch.setattr(settings, "ws_send_timeout_seconds", 0.05)
+        socket = StalledSocket({"type": "message", "message": "Slow WiFi"})
+        asyncio.run(asyncio.wait_for(chat_ws.chat_ws(socket, "ws_7"), 2))
+        assert socket.close_code == 1008
+        # The turn never finished, so nothing was committed
+        assert sessions.get("ws_7") is None
@@ -0,0 +1,179 @@
+import asyncio
+import httpx
+from app.main import app
+from app.routes.chat import sessions
+from app.services import coordination
+from app.services.coordination import TurnCoordinator
+
+
+def _client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def _results(speed=8):
+    return {"connectivity": {"connected": True}, "speed": {"speed": speed}}
+
+
+class TestTurnCoordinator:
+
+    def test_turns_of_a_session_run_one_at_a_time(self):
+        """Test that a second turn for the same session waits for the first to finish"""
+        coordinator = TurnCoordinator()
+        order = []
+
+        async def turn(name):
+            async with coordinator.session_lock("s"):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        async def main():
+            await asyncio.gather(turn("a"), turn("b"))
+            return coordinator.stats()
+
+        stats = asyncio.run(main())
+        assert order == ["a start", "a end", "b start", "b end"]
+        assert stats["locked_sessions"] == 0
+
+    def test_identical_requests_share_one_run(self):
+        """Test that requests with the same key in flight get the first one's result"""
+        coordinator = TurnCoordinator()
+        runs = []
+
+        async def turn():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        async def main():
+            key = ("chat", "s", "content", "x")
+            return await asyncio.gather(*(coordinator.run(key, turn) for _ in range(5)))
+
+        assert asyncio.run(main()) == ["answer"] * 5
+        assert len(runs) == 1
+
+    def test_cancelled_leader_hands_over_to_a_follower(self):
+        """Test that joined requests run the turn themselves when the first request is cancelled"""
+        coordinator = TurnCoordinator()
+        runs = []
+
+        async def turn():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return len(runs)
+
+        async def main():
+            key = ("chat", "s", "content", "x")
+            leader = asyncio.create_task(coordinator.run(key, turn))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(coordinator.run(key, turn))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(main()) == 2
+
+    def test_errors_reach_joined_requests_and_are_not_replayed(self):
+        """Test that a failed turn fails its followers and a retry runs again"""
+        coordinator = TurnCoordinator()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        async def main():
+            key = ("chat", "s", "key", "k1")
+            results = await asyncio.gather(*(coordinator.run(key, failing) for _ in range(2)), return_exceptions=True)
+
+            async def ok():
+                return "ok"
+            return results, await coordinator.run(key, ok)
+
+        results, retry = asyncio.run(main())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert retry == "ok"
+
+    def test_replays_expire_and_are_bounded(self):
+        """Test that remembered results honour the TTL and the entry ceiling"""
+        coordinator = TurnCoordinator(replay_ttl=0.0, max_replays=2)
+
+        async def main():
+            for i in range(3):
+                await coordinator.run(("chat", "s", "key", str(i)), lambda: asyncio.sleep(0, result=i))
+            return coordinator.existing(("chat", "s", "key", "2"))
+
+        assert asyncio.run(main()) is None
+        assert coordinator.stats()["replayable"] <= 2
+
+
+class TestChatCoordination:
+
+    def test_double_submit_runs_one_turn(self, fake_llm):
+        """Test that two identical concurrent /chat requests make one LLM call and get the same reply"""
+        fake_llm.chat.completions.delay = 0.05
+        joined = coordination.deduplicated.values().get(("in_flight",), 0)
+
+        async def main():
+            async with _client() as client:
+                await client.post("/api/v1/chat", json={"message": "My WiFi is slow in room 1", "session_id": "coord_1"})
+                body = {"message": "", "session_id": "coord_1", "auto_test_results": _results()}
+                return await asyncio.gather(*(client.post("/api/v1/chat", json=body) for _ in range(2)))
+
+        calls_before = len(fake_llm.chat.completions.calls)
+        first, second = asyncio.run(main())
+        assert first.json() == second.json()
+        assert len(fake_llm.chat.completions.calls) - calls_before == 1
+        assert sessions.get("coord_1").follow_up_questions == [first.json()["message"].split("\n\n")[-1]]
+        assert coordination.deduplicated.values()[("in_flight",)] == joined + 1
+
+    def test_idempotency_key_replays_finished_turn(self, fake_llm):
+        """Test that a retry with the same Idempotency-Key gets the same reply without advancing the session"""
+        async def main():
+            async with _client() as client:
+                await client.post("/api/v1/chat", json={"message": "My WiFi is slow in room 2", "session_id": "coord_2"})
+                await client.post("/api/v1/chat", json={"message": "", "session_id": "coord_2", "auto_test_results": _results()})
+                body = {"message": "3 devices", "session_id": "coord_2"}
+                headers = {"Idempotency-Key": "answer-1"}
+                first = await client.post("/api/v1/chat", json=body, headers=headers)
+                retry = await client.post("/api/v1/chat", json=body, headers=headers)
+                return first, retry
+
+        first, retry = asyncio.run(main())
+        assert first.json() == retry.json()
+        assert sessions.get("coord_2").current_question_index == 1
+
+    def test_different_concurrent_turns_apply_in_order(self, fake_llm):
+        """Test that concurrent answers for one session each see the state the previous one saved"""
+        fake_llm.chat.completions.delay = 0.02
+
+        async def main():
+            async with _client() as client:
+                await client.post("/api/v1/chat", json={"message": "My WiFi is slow in room 3", "session_id": "coord_3"})
+                await client.post("/api/v1/chat", json={"message": "", "session_id": "coord_3", "auto_test_results": _results()})
+                await asyncio.gather(*(
+                    client.post("/api/v1/chat", json={"message": f"answer {i}", "session_id": "coord_3"})
+                    for i in range(3)
+                ))
+
+        waits = coordination.lock_wait_seconds.snapshot()["count"]
+        asyncio.run(main())
+        session = sessions.get("coord_3")
+        assert session.current_question_index == 3
+        assert session.user_answers == ["answer 0", "answer 1", "answer 2"]
+        assert coordination.lock_wait_seconds.snapshot()["count"] >= waits + 5
+
+    def test_stream_follower_gets_leader_result(self, fake_llm):
+        """Test that an identical streaming request joins the running one and receives its done event"""
+        fake_llm.chat.completions.delay = 0.05
+
+        async def main():
+            async with _client() as client:
+                await client.post("/api/v1/chat", json={"message": "My WiFi is slow in room 4", "session_id": "coord_4"})
+                body = {"message": "", "session_id": "coord_4", "auto_test_results": _results()}
+                return await asyncio.gather(*(client.post("/api/v1/chat/stream", json=body) for _ in range(2)))
+
+        calls_before = len(fake_llm.chat.completions.calls)
+        responses = asyncio.run(main())
+        done = [r.text.split("event: done\ndata: ")[1].strip() for r in responses]
+        assert done[0] == done[1]
+        assert len(fake_llm.chat.completions.calls) - calls_before == 1
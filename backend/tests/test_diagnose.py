@@ -0,0 +1,112 @@
+import asyncio
+import io
+import json
+from fastapi.testclient import TestClient
+from app.diagnose import run
+from app.main import app
+from app.services.diagnosis import LineTooLong, diagnose_lines, iter_lines
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+ROW = {"issue": "Video calls drop", "auto_test_results": {"connectivity": {"connected": True, "latency": 60}, "speed": {"speed": 8}}}
+
+
+def jsonl(*rows):
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+async def chunked(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+class TestLines:
+
+    def test_lines_split_across_chunks(self):
+        """Test that lines are reassembled whatever the chunk boundaries, including a last line without newline"""
+        data = b'{"a": 1}\n{"b": 2}\n\n{"c": 3}'
+        for size in (1, 3, 100):
+            lines = asyncio.run(collect(iter_lines(chunked(data, size), 100)))
+            assert lines == [b'{"a": 1}', b'{"b": 2}', b"", b'{"c": 3}']
+
+    def test_long_line_is_reported_and_skipped(self):
+        """Test that an over-long line becomes one LineTooLong and the next line still arrives"""
+        data = b"x" * 50 + b"\nok\n"
+        lines = asyncio.run(collect(iter_lines(chunked(data, 7), 10)))
+        assert isinstance(lines[0], LineTooLong)
+        assert lines[1:] == [b"ok"]
+
+
+class TestBatchEndpoint:
+
+    def test_streams_results_errors_and_summary(self, fake_llm):
+        """Test that each row yields a result or an error with its line number, followed by a summary"""
+        body = jsonl({"id": "a", **ROW}, {"id": "b"}) + b"not json\n"
+        response = TestClient(app).post("/api/v1/diagnose/batch", content=body)
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        results = [json.loads(line) for line in response.text.splitlines()]
+
+        by_line = {r["line"]: r for r in results if "line" in r}
+        assert by_line[1]["id"] == "a"
+        assert by_line[1]["metrics"]["speed_mbps"] == 8.0
+        assert "reboot" in by_line[1] and by_line[1]["conclusion"]
+        assert by_line[2]["id"] == "b" and "auto_test_results" in by_line[2]["error"]
+        assert by_line[3]["error"].startswith("Invalid row")
+        assert results[-1]["summary"]["rows"] == 3
+        assert results[-1]["summary"]["ok"] == 1
+
+    def test_fast_batch_makes_no_llm_calls(self, fake_llm):
+        """Test that fast batches answer from the rules and offline conclusions only"""
+        response = TestClient(app).post("/api/v1/diagnose/batch?fast=true", content=jsonl(ROW, ROW))
+        assert json.loads(response.text.splitlines()[-1])["summary"]["ok"] == 2
+        assert fake_llm.chat.completions.calls == []
+
+
+class TestConcurrency:
+
+    def test_rows_in_flight_are_bounded(self):
+        """Test that no more than `concurrency` rows call the LLM at once and all rows finish"""
+        active, peak = 0, 0
+
+        llm = FakeLLM("Reboot the router.")
+        create = llm.chat.completions.create
+
+        async def counted(**kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            try:
+                await asyncio.sleep(0.01)
+                return await create(**kwargs)
+            finally:
+                active -= 1
+
+        llm.chat.completions.create = counted
+        service = TroubleshootService(llm=llm)
+        rows = [json.dumps({**ROW, "issue": f"issue {i}"}) for i in range(12)]
+
+        async def lines():
+            for row in rows:
+                yield row
+
+        results = asyncio.run(collect(diagnose_lines(lines(), service, concurrency=3, conclusion=True)))
+        assert results[-1]["summary"]["ok"] == 12
+        assert 1 < peak <= 3
+
+
+class TestCli:
+
+    def test_cli_writes_ndjson(self, tmp_path):
+        """Test that the command-line runner diagnoses a file and returns the summary"""
+        source = tmp_path / "rows.jsonl"
+        source.write_bytes(jsonl({"id": "1", **ROW}, {"id": "2", **ROW}))
+        output = io.BytesIO()
+        with open(source, "rb") as f:
+            summary = asyncio.run(run(f, output, concurrency=2, fast=True, service=TroubleshootService(llm=FakeLLM())))
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        assert summary["ok"] == 2
+        assert sorted(r["id"] for r in results if "id" in r) == ["1", "2"]
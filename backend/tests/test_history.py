@@ -0,0 +1,125 @@
+import time
+import numpy as np
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.metrics import NetworkMetrics
+from app.services import history
+from app.services.history import CONNECTION_TYPES, DEVICE_TYPES, RECORD, HistoryStore
+
+
+def synthetic_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(n, dtype=RECORD)
+    rows["ended_at"] = 1_700_000_000 + np.arange(n)
+    rows["connection"] = rng.integers(0, len(CONNECTION_TYPES), n)
+    rows["device"] = rng.integers(0, len(DEVICE_TYPES), n)
+    rows["outcome"] = np.where(rng.random(n) < 0.3, 0, 1)
+    rows["questions"] = rng.integers(1, 6, n)
+    rows["connected"] = 1
+    rows["speed_mbps"] = rng.gamma(2.0, 20.0, n)
+    rows["latency_ms"] = rng.gamma(2.0, 25.0, n)
+    rows["packet_loss_pct"] = np.nan
+    rows["jitter_ms"] = np.nan
+    return rows
+
+
+class TestHistoryStore:
+
+    def test_append_and_aggregate(self, tmp_path):
+        """Test that finished sessions are stored and aggregated by category"""
+        store = HistoryStore(str(tmp_path / "history.bin"))
+        store.append(NetworkMetrics(connected=True, speed_mbps=10.0, latency_ms=40.0, connection_type="wifi", device_type="desktop"), "resolved", 5)
+        store.append(NetworkMetrics(connected=True, speed_mbps=30.0, latency_ms=20.0, connection_type="wifi", device_type="desktop"), "escalated", 5)
+        store.append(NetworkMetrics(connection_type="satellite"), "resolved", 3)
+
+        result = store.aggregates()
+        assert result["sessions"] == 3
+        assert result["resolution_by_connection"]["wifi"] == {"sessions": 2, "resolved": 1, "rate": 0.5}
+        assert result["resolution_by_connection"]["other"]["resolved"] == 1
+        assert result["metrics_by_device"]["desktop"]["speed_mbps"] == {"p50": 20.0, "p95": 29.0}
+        assert result["metrics_by_device"]["unknown"]["latency_ms"] == {"p50": None, "p95": None}
+        assert result["questions"] == {"3": 1, "5": 2}
+
+    def test_torn_tail_is_ignored(self, tmp_path):
+        """Test that a partially written last record does not corrupt reads"""
+        path = tmp_path / "history.bin"
+        store = HistoryStore(str(path))
+        store.append(NetworkMetrics(), "resolved", 1)
+        with open(path, "ab") as f:
+            f.write(b"\x00" * (RECORD.itemsize // 2))
+        assert len(store.rows()) == 1
+
+    def test_millions_of_rows_under_a_second(self, tmp_path):
+        """Test that aggregates over two million rows come back well under a second"""
+        store = HistoryStore(str(tmp_path / "history.bin"))
+        rows = synthetic_rows(2_000_000)
+        store.append_many(rows)
+
+        start = time.perf_counter()
+        result = store.aggregates()
+        assert time.perf_counter() - start < 1.0
+
+        assert result["sessions"] == 2_000_000
+        wifi = CONNECTION_TYPES.index("wifi")
+        expected = (rows["outcome"][rows["connection"] == wifi] == 0).mean()
+        assert abs(result["resolution_by_connection"]["wifi"]["rate"] - expected) < 1e-4
+        assert sum(result["questions"].values()) == 2_000_000
+
+    def test_since_filter(self, tmp_path):
+        """Test that aggregates can be restricted to recent sessions"""
+        store = HistoryStore(str(tmp_path / "history.bin"))
+        store.append_many(synthetic_rows(1000))
+        assert store.aggregates(since=1_700_000_000 + 900)["sessions"] == 100
+
+
+class TestHistoryRecording:
+
+    def test_finished_conversation_is_recorded(self, tmp_path, monkeypatch, fake_llm):
+        """Test that the outcome of a finished conversation reaches the admin aggregates"""
+        monkeypatch.setattr(history, "history", HistoryStore(str(tmp_path / "history.bin")))
+        client = TestClient(app)
+        session_id = "history-1"
+        client.post("/api/v1/chat", json={"message": "WiFi is slow", "session_id": session_id})
+        client.post("/api/v1/chat", json={
+            "message": "", "session_id": session_id,
+            "auto_test_results": {"connectivity": {"connected": True}, "speed": {"speed": 8}, "connectionInfo": {"type": "4g"}, "deviceType": "mobile"},
+        })
+        for answer in ["three devices", "yes", "about a week ago", "no", "upstairs"]:
+            client.post("/api/v1/chat", json={"message": answer, "session_id": session_id})
+        response = client.post("/api/v1/chat", json={"message": "no, still slow", "session_id": session_id})
+        assert response.json()["is_conversation_ended"]
+
+        result = client.get("/api/v1/admin/history").json()
+        assert result["sessions"] == 1
+        assert result["resolution_by_connection"]["4g"] == {"sessions": 1, "resolved": 0, "rate": 0.0}
+        assert result["metrics_by_device"]["mobile"]["speed_mbps"]["p50"] == 8.0
+
+    def test_conflicting_save_is_not_recorded(self, tmp_path, monkeypatch, fake_llm):
+        """Test that a last turn retried after a save conflict is recorded once"""
+        from app.routes.chat import sessions
+        from app.services.session_store import SessionConflict
+        monkeypatch.setattr(history, "history", HistoryStore(str(tmp_path / "history.bin")))
+        client = TestClient(app)
+        session_id = "history-2"
+        client.post("/api/v1/chat", json={"message": "WiFi is slow", "session_id": session_id})
+        client.post("/api/v1/chat", json={
+            "message": "", "session_id": session_id, "auto_test_results": {"connectivity": {"connected": True}, "speed": {"speed": 8}},
+        })
+        for answer in ["three devices", "yes", "about a week ago", "no", "upstairs"]:
+            client.post("/api/v1/chat", json={"message": answer, "session_id": session_id})
+
+        def conflict(session_id, session):
+            raise SessionConflict(session_id)
+
+        last_turn = {"message": "no, still slow", "session_id": session_id}
+        with monkeypatch.context() as patch:
+            patch.setattr(sessions, "save", conflict)
+            assert "event: error" in client.post("/api/v1/chat/stream", json=last_turn).text
+        assert history.history.aggregates()["sessions"] == 0
+        assert "event: done" in client.post("/api/v1/chat/stream", json=last_turn).text
+        assert history.history.aggregates()["sessions"] == 1
+
+    def test_disabled_store(self, monkeypatch):
+        """Test that the aggregates endpoint explains when history is off"""
+        monkeypatch.setattr(history, "history", None)
+        assert TestClient(app).get("/api/v1/admin/history").status_code == 404
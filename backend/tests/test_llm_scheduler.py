@@ -0,0 +1,258 @@
+import asyncio
+import time
+from contextlib import aclosing
+import httpx
+import openai
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routes.chat import sessions
+from app.services import llm_scheduler
+from app.services.llm_scheduler import LLMScheduler, LLMUnavailable
+from app.services.question_bank import DEFAULT_BANK
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def rate_limited(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, request=_REQUEST, headers=headers), body=None)
+
+
+def bad_request():
+    return openai.BadRequestError("bad", response=httpx.Response(400, request=_REQUEST), body=None)
+
+
+def scheduler(**overrides):
+    options = dict(max_concurrency=2, max_queue=2, deadline=1.0, max_retries=2,
+                   retry_base=0.001, retry_max=0.002, breaker_failures=3, breaker_cooldown=0.05)
+    return LLMScheduler(**{**options, **overrides})
+
+
+class TestAdmission:
+
+    def test_concurrency_is_capped(self):
+        """Test that no more than max_concurrency calls run at once"""
+        s = scheduler(max_queue=10)
+        running, peak = 0, 0
+
+        async def attempt():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return "ok"
+
+        async def main():
+            return await asyncio.gather(*(s.call("question", attempt) for _ in range(6)))
+
+        assert asyncio.run(main()) == ["ok"] * 6
+        assert peak == 2
+        assert s.stats()["in_flight"] == 0
+
+    def test_full_queue_rejects(self):
+        """Test that calls beyond the slots and the queue fail fast with queue_full"""
+        s = scheduler(max_concurrency=1, max_queue=1)
+
+        async def main():
+            results = await asyncio.gather(
+                *(s.call("question", lambda: asyncio.sleep(0.02, result="ok")) for _ in range(3)),
+                return_exceptions=True,
+            )
+            return results
+
+        results = asyncio.run(main())
+        assert results[:2] == ["ok", "ok"]
+        assert isinstance(results[2], LLMUnavailable) and results[2].reason == "queue_full"
+
+    def test_deadline_covers_queueing(self):
+        """Test that a call still queued at its deadline gives up with deadline"""
+        s = scheduler(max_concurrency=1, deadline=0.02)
+
+        async def main():
+            return await asyncio.gather(
+                s.call("question", lambda: asyncio.sleep(0.01, result="ok")),
+                s.call("question", lambda: asyncio.sleep(0.01, result="ok"), deadline=0.005),
+                return_exceptions=True,
+            )
+
+        first, second = asyncio.run(main())
+        assert first == "ok"
+        assert isinstance(second, LLMUnavailable) and second.reason == "deadline"
+        assert s.stats() | {"in_flight": 0, "queued": 0} == s.stats()
+
+
+class TestRetries:
+
+    def test_retryable_errors_are_retried(self):
+        """Test that rate limits are retried and the call then succeeds"""
+        s = scheduler()
+        errors = [rate_limited(), rate_limited()]
+
+        async def attempt():
+            if errors:
+                raise errors.pop()
+            return "ok"
+
+        assert asyncio.run(s.call("question", attempt)) == "ok"
+        assert s.stats()["consecutive_failures"] == 0
+
+    def test_retry_after_is_honoured(self):
+        """Test that the backoff waits at least as long as the Retry-After header"""
+        assert scheduler()._backoff(0, rate_limited(retry_after=0.5)) >= 0.5
+
+    def test_retries_stop_at_budget(self):
+        """Test that a call gives up with exhausted once its retries are used"""
+        s = scheduler(max_retries=1, breaker_failures=10)
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            raise rate_limited()
+
+        with pytest.raises(LLMUnavailable) as e:
+            asyncio.run(s.call("question", attempt))
+        assert e.value.reason == "exhausted"
+        assert len(calls) == 2
+
+    def test_client_errors_are_not_retried(self):
+        """Test that a 400 fails at once without counting towards the breaker"""
+        s = scheduler()
+
+        async def attempt():
+            raise bad_request()
+
+        with pytest.raises(LLMUnavailable) as e:
+            asyncio.run(s.call("question", attempt))
+        assert e.value.reason == "rejected"
+        assert s.stats()["consecutive_failures"] == 0
+
+
+class TestCircuitBreaker:
+
+    def test_breaker_opens_fails_fast_and_recovers(self):
+        """Test that repeated failures open the breaker and a successful probe closes it"""
+        s = scheduler(max_retries=0)
+
+        async def failing():
+            raise rate_limited()
+
+        async def main():
+            for _ in range(3):
+                with pytest.raises(LLMUnavailable):
+                    await s.call("question", failing)
+            assert s.state == "open"
+            with pytest.raises(LLMUnavailable) as e:
+                await s.call("question", lambda: asyncio.sleep(0, result="ok"))
+            assert e.value.reason == "circuit_open"
+
+            await asyncio.sleep(0.06)
+            assert s.state == "half_open"
+            return await s.call("question", lambda: asyncio.sleep(0, result="ok"))
+
+        assert asyncio.run(main()) == "ok"
+        assert s.state == "closed"
+
+    def test_failed_probe_reopens(self):
+        """Test that a failing half-open probe opens the breaker for another cooldown"""
+        s = scheduler(max_retries=0, breaker_failures=1)
+
+        async def failing():
+            raise rate_limited()
+
+        async def main():
+            with pytest.raises(LLMUnavailable):
+                await s.call("question", failing)
+            await asyncio.sleep(0.06)
+            with pytest.raises(LLMUnavailable):
+                await s.call("question", failing)
+
+        asyncio.run(main())
+        assert s.state == "open"
+
+
+class TestStreaming:
+
+    def test_stream_retries_before_first_chunk_and_holds_slot(self):
+        """Test that opening a stream is retried and the slot is held until it ends"""
+        s = scheduler(max_concurrency=1)
+        errors = [rate_limited()]
+
+        async def chunks():
+            for word in ("one", "two"):
+                assert s.stats()["in_flight"] == 1
+                yield word
+
+        async def open_stream():
+            if errors:
+                raise errors.pop()
+            return chunks()
+
+        async def main():
+            return [chunk async for chunk in s.stream("question", open_stream)]
+
+        assert asyncio.run(main()) == ["one", "two"]
+        assert s.stats()["in_flight"] == 0
+
+    def test_stream_closed_when_caller_stops_early(self):
+        """Test that the provider stream is closed when the caller stops reading before the end"""
+        s = scheduler()
+        closed = []
+
+        class Stream:
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                return "token"
+
+            async def close(self):
+                closed.append(True)
+
+        async def open_stream():
+            return Stream()
+
+        async def main():
+            async with aclosing(s.stream("question", open_stream)) as stream:
+                async for _ in stream:
+                    break
+
+        asyncio.run(main())
+        assert closed == [True]
+        assert s.stats()["in_flight"] == 0
+
+
+class TestDegradedResponses:
+
+    @pytest.fixture
+    def open_breaker(self, monkeypatch):
+        import app.services.troubleshoot as troubleshoot
+        s = scheduler(breaker_cooldown=60.0)
+        s._state, s._opened_at = "open", time.monotonic()
+        llm = FakeLLM()
+        monkeypatch.setattr(troubleshoot, "_service", TroubleshootService(llm=llm, scheduler=s))
+        return llm
+
+    def test_chat_serves_generic_question_when_breaker_is_open(self, open_breaker):
+        """Test that an unavailable LLM yields a question from the offline bank instead of a 500"""
+        degraded = llm_scheduler.degraded.values().get(("question",), 0)
+        client = TestClient(app)
+        client.post("/api/v1/chat", json={"message": "Video calls freeze upstairs", "session_id": "degraded_1"})
+        response = client.post("/api/v1/chat", json={
+            "message": "", "session_id": "degraded_1",
+            "auto_test_results": {"connectivity": {"connected": True}, "speed": {"speed": 8}},
+        })
+        assert response.status_code == 200
+        assert response.json()["message"].endswith(DEFAULT_BANK.get("congestion_devices").text)
+        assert open_breaker.chat.completions.calls == []
+        assert llm_scheduler.degraded.values()[("question",)] == degraded + 1
+        assert sessions.get("degraded_1").follow_up_questions
+
+    def test_admin_reports_scheduler(self, open_breaker):
+        """Test that the admin endpoint shows the breaker state and queue"""
+        stats = TestClient(app).get("/api/v1/admin/llm").json()
+        assert stats["state"] == "open"
+        assert stats["queued"] == 0
@@ -0,0 +1,90 @@
+import io
+import json
+import logging
+import queue
+import time
+from app.core.logging_config import DrainingQueueListener, JsonFormatter, NonBlockingQueueHandler, SessionFilter, bind_session, in_sample
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+class SlowStream(io.StringIO):
+    def write(self, text):
+        time.sleep(0.05)
+        return super().write(text)
+
+
+class TestStructuredLogging:
+
+    def test_records_are_json_with_session_and_extras(self):
+        """Test that records become JSON lines carrying the bound session id and extra fields"""
+        out = io.StringIO()
+        handler = NonBlockingQueueHandler(queue.Queue())
+        handler.addFilter(SessionFilter(1.0))
+        listener = DrainingQueueListener(handler.queue, logging.StreamHandler(out))
+        listener.handlers[0].setFormatter(JsonFormatter())
+        listener.start()
+        bind_session("s1")
+        try:
+            make_logger("test.json", handler).info("Answer %s of %d", "three", 5, extra={"state": "follow_up"})
+        finally:
+            bind_session(None)
+            listener.stop()
+        entry = json.loads(out.getvalue())
+        assert entry["message"] == "Answer three of 5"
+        assert entry["session_id"] == "s1" and entry["state"] == "follow_up"
+        assert entry["level"] == "INFO" and entry["logger"] == "test.json"
+
+    def test_arguments_are_not_rendered_below_the_level(self):
+        """Test that arguments of a disabled record are never converted to text"""
+        rendered = []
+
+        class Expensive:
+            def __str__(self):
+                rendered.append(1)
+                return "expensive"
+
+        logger = make_logger("test.lazy", NonBlockingQueueHandler(queue.Queue()))
+        logger.debug("Metrics: %s", Expensive())
+        assert rendered == []
+        logger.info("Metrics: %s", Expensive())
+        assert rendered == [1]
+
+    def test_sampled_records_follow_whole_sessions(self):
+        """Test that sampling keeps or drops every sampled record of a session together"""
+        ids = [f"session_{i}" for i in range(2000)]
+        kept = [i for i in ids if in_sample(i, 0.1)]
+        assert 100 < len(kept) < 300
+        assert all(in_sample(i, 0.1) for i in kept)
+
+        handler = NonBlockingQueueHandler(queue.Queue())
+        handler.addFilter(SessionFilter(0.1))
+        logger = make_logger("test.sampled", handler)
+        dropped_id = next(i for i in ids if not in_sample(i, 0.1))
+        logger.info("verbose", extra={"sampled": True, "session_id": dropped_id})
+        logger.info("verbose", extra={"sampled": True, "session_id": kept[0]})
+        logger.info("always", extra={"session_id": dropped_id})
+        messages = [handler.queue.get_nowait().msg for _ in range(handler.queue.qsize())]
+        assert messages == ["verbose", "always"]
+
+    def test_slow_output_never_blocks_the_caller(self):
+        """Test that a slow writer fills the queue and extra records are dropped instead of waiting"""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=10))
+        listener = DrainingQueueListener(handler.queue, logging.StreamHandler(SlowStream()))
+        listener.start()
+        logger = make_logger("test.slow", handler)
+        try:
+            start = time.perf_counter()
+            for i in range(200):
+                logger.info("record %d", i)
+            elapsed = time.perf_counter() - start
+        finally:
+            listener.stop()
+        assert elapsed < 0.5
+        assert handler.dropped >= 150
@@ -0,0 +1,85 @@
+import dataclasses
+import json
+import pytest
+from pydantic import ValidationError
+from app.models.metrics import NetworkMetrics, display
+from app.models.schemas import AutoTestResults, ConnectionType, DeviceType
+from app.models.session import ChatSession
+
+PAYLOAD = {
+    "connectivity": {"connected": True, "latency": 42, "packetLoss": "1.5"},
+    "speed": {"speed": 25.5, "latency": 180},
+    "connectionInfo": {"type": "4G"},
+    "deviceType": "desktop",
+}
+
+
+class TestNetworkMetrics:
+
+    def test_parses_frontend_payload(self):
+        """Test that the auto-test payload becomes typed, normalized metrics"""
+        metrics = NetworkMetrics.from_test_results(AutoTestResults(**PAYLOAD))
+        assert metrics == NetworkMetrics(
+            connected=True, speed_mbps=25.5, latency_ms=42.0, packet_loss_pct=1.5,
+            connection_type="4g", device_type="desktop",
+        )
+        assert NetworkMetrics.from_test_results(AutoTestResults.model_validate_json(json.dumps(PAYLOAD))) == metrics
+
+    def test_missing_values_are_none(self):
+        """Test that absent, failed or placeholder measurements are unknown rather than zero"""
+        metrics = NetworkMetrics.from_test_results(AutoTestResults.model_validate({
+            "connectivity": {"connected": False, "error": "timeout"},
+            "speed": {"speed": None, "latency": None},
+            "connectionInfo": {"type": "unknown"},
+            "deviceType": None,
+        }))
+        assert metrics == NetworkMetrics(connected=False)
+        assert NetworkMetrics.from_test_results(None) == NetworkMetrics()
+
+    @pytest.mark.parametrize("payload", [
+        {"speed": {"speed": "n/a"}},
+        {"speed": {"speed": -1}},
+        {"connectivity": {"latency": float("inf")}},
+        {"connectivity": {"packetLoss": 150}},
+        {"connectionInfo": {"type": 5}},
+    ])
+    def test_malformed_values_are_rejected(self, payload):
+        """Test that non-numeric, negative, non-finite and out-of-range readings fail validation"""
+        with pytest.raises(ValidationError):
+            AutoTestResults.model_validate(payload)
+
+    def test_labels_map_to_known_types(self):
+        """Test that connection and device types ignore case, and labels we do not know become 'other'"""
+        results = AutoTestResults.model_validate({"connectionInfo": {"type": " WiFi "}, "deviceType": "smart-tv", "extra": 1})
+        assert results.connectionInfo.type is ConnectionType.WIFI
+        assert results.deviceType is DeviceType.OTHER
+        assert "extra" not in results.model_dump()
+
+    def test_speed_test_latency_is_fallback(self):
+        """Test that the speed test's latency is used when the connectivity test has none"""
+        metrics = NetworkMetrics.from_test_results(AutoTestResults(connectivity={"connected": True}, speed={"speed": 5, "latency": 180}))
+        assert metrics.latency_ms == 180.0
+
+    def test_metrics_are_immutable(self):
+        """Test that parsed metrics cannot be changed after the fact"""
+        metrics = NetworkMetrics(speed_mbps=10.0)
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            metrics.speed_mbps = 20.0
+        assert not hasattr(metrics, "__dict__")
+
+    def test_display(self):
+        """Test that metrics render without trailing zeros and unknowns read 'unknown'"""
+        assert display(25.0) == "25"
+        assert display(25.5) == "25.5"
+        assert display(None) == "unknown"
+        assert display(True) == "True"
+
+    def test_session_round_trip(self):
+        """Test that metrics survive serialization, and older sessions get them parsed on load"""
+        session = ChatSession(auto_test_results=AutoTestResults(**PAYLOAD))
+        session.metrics = NetworkMetrics.from_test_results(session.auto_test_results)
+        assert ChatSession.from_dict(session.to_dict()).metrics == session.metrics
+
+        legacy = session.to_dict()
+        del legacy["metrics"]
+        assert ChatSession.from_dict(legacy).metrics == session.metrics
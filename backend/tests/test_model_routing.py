@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import model_routing
+from app.services.model_routing import ModelRouter, Route, build_routes
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+
+def router(**routes):
+    return ModelRouter({name: Route(name, "m", None, **fields) for name, fields in routes.items()}, min_samples=5)
+
+
+class TestRoutes:
+
+    def test_classifiers_use_small_capped_model(self):
+        """Test that YES/NO call sites go to the small model with a few output tokens"""
+        llm = FakeLLM("NO")
+        service = TroubleshootService(llm=llm)
+        asyncio.run(service.should_reboot_router(None, ["maybe"]))
+        call = llm.chat.completions.calls[-1]
+        assert call["model"] == model_routing.SMALL_MODEL
+        assert call["max_tokens"] == 3
+
+    def test_conclusion_stays_on_large_model(self):
+        """Test that conclusions are routed to the large model"""
+        assert model_routing.DEFAULT_ROUTES["conclusion"].model == model_routing.LARGE_MODEL
+
+    def test_truncated_conclusion_is_counted_and_not_cached(self):
+        """Test that a conclusion cut off by max_tokens is flagged and not kept in the response cache"""
+        from types import SimpleNamespace
+        from app.models.session import ChatSession
+        from app.services.response_cache import response_cache
+
+        class Truncating:
+            async def create(self, **kwargs):
+                choice = SimpleNamespace(message=SimpleNamespace(content="1. Restart"), finish_reason="length")
+                return SimpleNamespace(choices=[choice], usage=None)
+
+        response_cache.clear()
+        llm = FakeLLM()
+        llm.chat.completions = Truncating()
+        service = TroubleshootService(llm=llm)
+        before = model_routing.truncated.values().get(("conclusion",), 0)
+
+        asyncio.run(service.generate_conclusion(ChatSession(issue_description="WiFi is slow")))
+        assert model_routing.truncated.values()[("conclusion",)] == before + 1
+        assert response_cache.stats()["entries"] == 0
+
+    def test_truncated_question_is_not_cached(self):
+        """Test that a question cut off by max_tokens is not kept in the response cache, streamed or not"""
+        from types import SimpleNamespace
+        from app.services.response_cache import response_cache
+
+        class Truncating:
+            async def create(self, **kwargs):
+                if kwargs.get("stream"):
+                    async def chunks():
+                        delta = SimpleNamespace(content="How many devices")
+                        yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason="length")], usage=None)
+                    return chunks()
+                choice = SimpleNamespace(message=SimpleNamespace(content="How many devices"), finish_reason="length")
+                return SimpleNamespace(choices=[choice], usage=None)
+
+        async def stream(service):
+            return "".join([token async for token in service.stream_next_question("WiFi is slow", None, [], 0, [])])
+
+        response_cache.clear()
+        llm = FakeLLM()
+        llm.chat.completions = Truncating()
+        service = TroubleshootService(llm=llm)
+
+        assert asyncio.run(service.generate_next_question("WiFi is slow", None, [], 0, [])) == "How many devices"
+        assert asyncio.run(stream(service)) == "How many devices"
+        assert response_cache.stats()["entries"] == 0
+
+    def test_overrides_replace_fields(self):
+        """Test that LLM_ROUTES-style overrides change one field and keep the rest"""
+        routes = build_routes({"question": {"model": "gpt-4o-mini", "slo_seconds": 2}, "summary": {"model": "x"}})
+        assert routes["question"].model == "gpt-4o-mini"
+        assert routes["question"].slo_seconds == 2
+        assert routes["question"].max_tokens == model_routing.DEFAULT_ROUTES["question"].max_tokens
+        assert routes["summary"].model == "x"
+
+
+class TestHedging:
+
+    def test_slow_call_is_hedged_and_first_answer_wins(self):
+        """Test that a call past its hedge delay sends a duplicate and takes the faster reply"""
+        r = router(question={"slo_seconds": 0.02, "hedge": True})
+        delays = [0.5, 0.0]
+        cancelled = []
+
+        async def attempt():
+            delay = delays.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return delay
+
+        async def main():
+            result = await r.call("question", attempt)
+            await asyncio.sleep(0)
+            return result
+
+        assert asyncio.run(main()) == 0.0
+        assert cancelled == [0.5]
+        assert r.stats()["question"]["hedge_win_rate"] == 1.0
+
+    def test_fast_call_is_not_hedged(self):
+        """Test that calls answering before the hedge delay run once"""
+        r = router(question={"slo_seconds": 0.5, "hedge": True})
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            return "ok"
+
+        assert asyncio.run(r.call("question", attempt)) == "ok"
+        assert calls == [1]
+        assert r.stats()["question"]["hedged"] == 0
+
+    @pytest.mark.parametrize("hedge,can_hedge", [(False, True), (True, False)])
+    def test_hedging_can_be_off(self, hedge, can_hedge):
+        """Test that unhedged routes and a saturated scheduler never duplicate a call"""
+        r = router(question={"slo_seconds": 0.001, "hedge": hedge})
+        calls = []
+
+        async def attempt():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        asyncio.run(r.call("question", attempt, can_hedge=can_hedge))
+        assert calls == [1]
+
+    def test_failed_primary_falls_back_to_hedge(self):
+        """Test that a primary failing after the hedge was sent does not fail the call"""
+        r = router(question={"slo_seconds": 0.01, "hedge": True})
+        plans = [(0.03, ValueError("boom")), (0.05, None)]
+
+        async def attempt():
+            delay, error = plans.pop(0)
+            await asyncio.sleep(delay)
+            if error:
+                raise error
+            return "hedge"
+
+        assert asyncio.run(r.call("question", attempt)) == "hedge"
+
+    def test_both_failing_raises(self):
+        """Test that the call fails when both requests fail"""
+        r = router(question={"slo_seconds": 0.01, "hedge": True})
+
+        async def attempt():
+            await asyncio.sleep(0.02)
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            asyncio.run(r.call("question", attempt))
+
+    def test_hedge_delay_tracks_p95_under_slo(self):
+        """Test that the hedge delay follows the recent p95 and never exceeds the SLO"""
+        r = router(question={"slo_seconds": 1.0, "hedge": True})
+        assert r.hedge_delay("question") == 1.0
+        for seconds in (0.1, 0.1, 0.1, 0.1, 0.2):
+            r.observe("question", seconds)
+        assert r.hedge_delay("question") == 0.2
+        for _ in range(10):
+            r.observe("question", 3.0)
+        assert r.hedge_delay("question") == 1.0
+        assert r.stats()["question"]["slo_misses"] == 10
+
+
+class TestRoutingStats:
+
+    def test_admin_reports_routes(self):
+        """Test that the admin endpoint lists each call site's route and hedge delay"""
+        stats = TestClient(app).get("/api/v1/admin/routing").json()
+        assert stats["validation"]["model"] == model_routing.SMALL_MODEL
+        assert "hedge_delay_seconds" in stats["question"]
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from app.services import nlu
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+
+class TestAnswerClassifier:
+
+    @pytest.mark.parametrize("question,answer,value", [
+        ("Are other devices affected as well?", "yes", True),
+        ("Are other devices affected as well?", "Nope, just this one", False),
+        ("How many devices are connected to your network?", "about 6", 6.0),
+        ("How many devices are connected to your network?", "a few", 3.0),
+        ("When did you last restart your router?", "2 days ago", 2880.0),
+        ("What type of device are you using?", "my iPhone", "phone"),
+    ])
+    def test_confident_answers(self, question, answer, value):
+        """Test that well-formed answers are accepted locally with high confidence"""
+        result = nlu.classify_validity(question, answer)
+        assert result.label == "valid"
+        assert result.value == value
+        assert result.confidence >= 0.75
+
+    def test_empty_and_gibberish_rejected(self):
+        """Test that empty and mashed input is rejected with high confidence"""
+        assert nlu.classify_validity("Is it plugged in?", "   ").label == "invalid"
+        assert nlu.classify_validity("Is it plugged in?", "qwrtz").label == "invalid"
+
+    @pytest.mark.parametrize("question,answer,value", [
+        ("What type of device are you using?", "PC", "desktop"),
+        ("What type of device are you using?", "TV", "tv"),
+        ("Is it plugged in?", "n", False),
+        ("Is it plugged in?", "y", True),
+    ])
+    def test_short_answers_are_not_gibberish(self, question, answer, value):
+        """Test that terse but real answers pass the keyboard-mashing check"""
+        result = nlu.classify_validity(question, answer)
+        assert result.label == "valid"
+        assert result.value == value
+        assert result.confidence >= 0.75
+
+    @pytest.mark.parametrize("question", [
+        "How many devices are connected to your network?",
+        "When did you last restart your router?",
+        "What type of device are you using?",
+    ])
+    def test_yes_to_non_yes_no_question_left_to_llm(self, question):
+        """Test that a bare yes to a how-many, when or which-device question is not accepted locally"""
+        assert nlu.classify_validity(question, "yes").confidence < 0.75
+
+    def test_ambiguous_answer_has_low_confidence(self):
+        """Test that short free text is left for the LLM to judge"""
+        assert nlu.classify_validity("Is it plugged in?", "eyes").confidence < 0.75
+
+
+class TestResolutionClassifier:
+
+    @pytest.mark.parametrize("message,resolved", [
+        ("Yes", True),
+        ("yes it works now", True),
+        ("It's fixed, thanks!", True),
+        ("not fine", False),
+        ("no better", False),
+        ("still slow", False),
+        ("no, still slow", False),
+        ("yes, no more drops", True),
+        ("nothing works", False),
+    ])
+    def test_negation_aware(self, message, resolved):
+        """Test that negations flip the meaning of positive words"""
+        result = nlu.classify_resolution(message)
+        assert result.value is resolved
+        assert result.confidence >= 0.5
+
+    @pytest.mark.parametrize("message", [
+        "I don't think it's fixed",
+        "it is not really any better",
+    ])
+    def test_distant_negation_not_resolved(self, message):
+        """Test that a negator earlier in the clause is never read as resolved with confidence"""
+        result = nlu.classify_resolution(message)
+        assert result.value is False or result.confidence < 0.75
+
+    @pytest.mark.parametrize("message", ["no problems now", "no issues anymore"])
+    def test_negated_problem_is_resolved(self, message):
+        """Test that a negator in front of a problem word counts towards resolved"""
+        assert nlu.classify_resolution(message).value is True
+
+    def test_conflicting_clauses_defer_to_llm(self):
+        """Test that a bare "no" followed by a positive clause is not decided locally"""
+        assert nlu.classify_resolution("no, it works now").confidence < 0.75
+
+    def test_no_substring_matches(self):
+        """Test that words merely containing a keyword are not treated as resolved"""
+        assert nlu.classify_resolution("eyes").confidence < 0.75
+
+
+class TestFastPath:
+
+    def test_llm_only_called_below_threshold(self):
+        """Test that confident decisions skip the LLM and are counted"""
+        llm = FakeLLM("NO")
+        service = TroubleshootService(llm=llm)
+        before = nlu.stats.snapshot().get("resolution", {}).get("fast_path", 0)
+
+        assert asyncio.run(service.is_issue_resolved("yes it works now")) is True
+        assert llm.chat.completions.calls == []
+        assert nlu.stats.snapshot()["resolution"]["fast_path"] == before + 1
+
+        assert asyncio.run(service.is_issue_resolved("eyes")) is False
+        assert len(llm.chat.completions.calls) == 1
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import time
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.main import app
+from app.routes.chat import sessions
+from app.services.probe import FRAME, run_probe, summarize
+
+
+class EchoSocket:
+    """In-memory client that echoes frames after `delay`, dropping those whose seq is in `drop`."""
+
+    def __init__(self, delay=0.001, drop=()):
+        self.delay = delay
+        self.drop = set(drop)
+        self.inbox: asyncio.Queue = asyncio.Queue()
+
+    async def send_bytes(self, data):
+        seq, _ = FRAME.unpack(data)
+        if seq not in self.drop:
+            message = {"type": "websocket.receive", "bytes": data}
+            asyncio.get_running_loop().call_later(self.delay, self.inbox.put_nowait, message)
+
+    async def receive(self):
+        return await self.inbox.get()
+
+
+class TestProbeStatistics:
+
+    def test_summary(self):
+        """Test that percentiles, jitter and loss are computed from round-trip times"""
+        rtts = {0: 0.010, 1: 0.020, 2: 0.010, 4: 0.030}
+        result = summarize(5, rtts)
+        assert (result.sent, result.received, result.loss_pct) == (5, 4, 20.0)
+        assert result.rtt_min_ms == 10.0 and result.rtt_max_ms == 30.0
+        assert result.rtt_p50_ms == 15.0
+        assert result.jitter_ms == 13.333
+
+    def test_nothing_received(self):
+        """Test that a probe with no echoes reports full loss and unknown RTTs"""
+        result = summarize(10, {})
+        assert result.loss_pct == 100.0 and result.rtt_p50_ms is None
+
+    def test_dropped_frames_count_as_loss(self):
+        """Test that frames never echoed are reported as lost after the grace period"""
+        socket = EchoSocket(drop={1, 3})
+        result = asyncio.run(run_probe(socket, count=10, interval=0.001, grace=0.05))
+        assert result.sent == 10 and result.received == 8
+        assert result.loss_pct == 20.0
+
+    def test_text_frames_are_ignored(self):
+        """Test that a text frame from the client does not end the probe"""
+        async def probe():
+            socket = EchoSocket()
+            socket.inbox.put_nowait({"type": "websocket.receive", "text": '{"type": "ping"}'})
+            return await run_probe(socket, count=5, interval=0.001, grace=0.5)
+
+        result = asyncio.run(probe())
+        assert result.received == 5 and result.loss_pct == 0.0
+
+    def test_hundreds_of_probes_share_one_loop(self):
+        """Test that concurrent probes overlap instead of running one after another"""
+        async def many():
+            return await asyncio.gather(*(
+                run_probe(EchoSocket(delay=0.005), count=20, interval=0.005, grace=0.5) for _ in range(300)
+            ))
+
+        start = time.perf_counter()
+        results = asyncio.run(many())
+        elapsed = time.perf_counter() - start
+        assert all(r.loss_pct == 0 for r in results)
+        # One probe takes ~0.1 s; 300 run serially would take 30 s
+        assert elapsed < 5
+
+
+class TestProbeEndpoint:
+
+    def test_loopback_probe_updates_session(self, fake_llm):
+        """Test that a WebSocket probe over loopback attaches its result to the session metrics"""
+        client = TestClient(app)
+        client.post("/api/v1/chat", json={"message": "My WiFi keeps dropping", "session_id": "probe-1"})
+
+        with client.websocket_connect("/api/v1/probe/probe-1?count=20&interval_ms=2") as ws:
+            while True:
+                message = ws.receive()
+                if message.get("bytes") is not None:
+                    ws.send_bytes(message["bytes"])
+                else:
+                    result = json.loads(message["text"])
+                    break
+        assert result["type"] == "result"
+        assert result["sent"] == 20 and result["loss_pct"] == 0.0
+        assert result["rtt_p50_ms"] is not None
+
+        # The probe ran before the client reported its own tests and is kept when it does
+        client.post("/api/v1/chat", json={
+            "message": "", "session_id": "probe-1",
+            "auto_test_results": {"connectivity": {"connected": True, "latency": 30}, "speed": {"speed": 40}},
+        })
+        metrics = sessions.get("probe-1").metrics
+        assert metrics.packet_loss_pct == 0.0
+        assert metrics.jitter_ms == result["jitter_ms"]
+        assert metrics.latency_ms == 30.0
+
+    def test_count_is_capped(self, monkeypatch):
+        """Test that clients cannot request more frames than the configured maximum"""
+        monkeypatch.setattr(settings, "probe_max_count", 5)
+        client = TestClient(app)
+        frames = 0
+        with client.websocket_connect("/api/v1/probe/unknown-session?count=1000&interval_ms=1") as ws:
+            while True:
+                message = ws.receive()
+                if message.get("bytes") is None:
+                    break
+                frames += 1
+                ws.send_bytes(message["bytes"])
+        assert frames == 5
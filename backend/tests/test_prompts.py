@@ -0,0 +1,88 @@
+import asyncio
+from dataclasses import replace
+from app.models.metrics import NetworkMetrics
+from app.services import prompts
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+RESULTS = NetworkMetrics(connected=True, speed_mbps=12.0, latency_ms=80.0, connection_type="wifi", device_type="laptop")
+
+
+class TestPromptLayout:
+
+    def test_static_prefix_is_shared_across_sessions(self):
+        """Test that the system message does not depend on the session or turn"""
+        first = prompts.question_messages("My wifi is slow", RESULTS, [], [], 0)
+        later = prompts.question_messages(
+            "Video calls keep dropping", replace(RESULTS, speed_mbps=3.0), ["Is the router on?"], ["yes"], 1,
+        )
+        assert first[0] == later[0]
+        assert first[0]["role"] == "system"
+        assert "Video calls keep dropping" in later[1]["content"]
+        assert "Q1: Is the router on?\nA1: yes" in later[1]["content"]
+
+    def test_classifier_prompts_have_static_prefix(self):
+        """Test that the resolution and reboot prompts keep per-session data out of the system message"""
+        first = prompts.resolution_messages("yes thanks")
+        later = prompts.resolution_messages("still dropping")
+        assert first[0] == later[0]
+        assert "still dropping" in later[1]["content"]
+
+        first = prompts.reboot_messages(RESULTS, [], [])
+        later = prompts.reboot_messages(replace(RESULTS, speed_mbps=3.0), ["Is the router on?"], ["yes"])
+        assert first[0] == later[0]
+        assert "Q1: Is the router on?\nA1: yes" in later[1]["content"]
+        assert "maybe" in prompts.reboot_messages(RESULTS, [], ["maybe"])[1]["content"]
+
+    def test_pending_question_is_listed(self):
+        """Test that a question asked but not yet answered is still shown to the model"""
+        messages = prompts.question_messages("slow", RESULTS, ["Is the router on?"], [], 1)
+        assert "(no answer yet)" in messages[1]["content"]
+
+
+class TestHistoryBudget:
+
+    def test_history_within_budget_is_verbatim(self):
+        """Test that a short history is sent unchanged"""
+        lines = prompts.history_lines(["How many devices?"], ["three"], budget=100)
+        assert lines == ["Q1: How many devices?\nA1: three"]
+
+    def test_older_pairs_are_compacted_then_dropped(self):
+        """Test that long histories shrink from the oldest end and the latest pair survives"""
+        questions = [f"Question {i}: " + "word " * 40 + "is it on?" for i in range(8)]
+        answers = ["answer " * 40 for _ in range(8)]
+        full = sum(prompts.count_tokens(f"Q{i+1}: {q}\nA{i+1}: {a}") for i, (q, a) in enumerate(zip(questions, answers)))
+
+        lines = prompts.history_lines(questions, answers, budget=200)
+        assert sum(prompts.count_tokens(line) for line in lines) < full
+        assert lines[-1] == f"Q8: {questions[-1]}\nA8: {answers[-1]}"
+        assert lines[0].endswith("earlier questions omitted)")
+
+        # A budget that fits the shortened pairs keeps all of them
+        lines = prompts.history_lines(questions, answers, budget=600)
+        assert len(lines) == 8
+        assert lines[0].startswith("Q1: ") and "…" in lines[0]
+
+    def test_input_tokens_stop_growing(self, monkeypatch):
+        """Test that prompt size levels off once the history budget is reached"""
+        monkeypatch.setattr(prompts.settings, "prompt_history_token_budget", 150)
+        sizes = []
+        for turn in range(12):
+            questions = [f"Have you tried step {i} with the router and your devices?" for i in range(turn)]
+            answers = ["Yes, I tried that this morning and it did not help at all." for _ in range(turn)]
+            sizes.append(prompts.count_message_tokens(prompts.question_messages("slow", RESULTS, questions, answers, turn)))
+        assert sizes[-1] - sizes[-4] < 40
+        assert sizes[-1] <= prompts.count_message_tokens(prompts.question_messages("slow", RESULTS, [], [], 0)) + 200
+
+
+class TestTokenStats:
+
+    def test_usage_recorded_per_call_site(self):
+        """Test that billed, cached and estimated input tokens are recorded per call"""
+        prompts.stats.sites.clear()
+        service = TroubleshootService(llm=FakeLLM("How many devices are connected?"))
+        asyncio.run(service.generate_next_question("slow wifi", None, [], 0, []))
+        site = prompts.stats.snapshot()["question"]
+        assert site["calls"] == 1
+        assert site["prompt_tokens"] == 100
+        assert site["estimated_tokens"] > 0
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import statistics
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models.metrics import NetworkMetrics
+from app.routes.chat import sessions
+from app.services import question_bank
+from app.services.question_bank import CATEGORIES, DEFAULT_BANK, QuestionBank, load_bank
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+SLOW = NetworkMetrics(connected=True, speed_mbps=8.0, latency_ms=60.0)
+
+
+def text(question_id):
+    return DEFAULT_BANK.get(question_id).text
+
+
+class TestQuestionBank:
+
+    def test_bank_covers_every_category(self):
+        """Test that the built-in bank has an entry question for each prompt category and a version"""
+        entries = {q.category for q in DEFAULT_BANK.questions if q.entry}
+        assert entries == set(CATEGORIES)
+        assert DEFAULT_BANK.version
+
+    @pytest.mark.parametrize("metrics,first", [
+        (NetworkMetrics(connected=False), "physical_offline"),
+        (NetworkMetrics(connected=True, speed_mbps=8.0, packet_loss_pct=4.0), "signal_distance"),
+        (NetworkMetrics(connected=True, speed_mbps=90.0, latency_ms=20.0), "device_rejoin"),
+        (SLOW, "congestion_devices"),
+    ])
+    def test_metrics_choose_the_first_category(self, metrics, first):
+        """Test that the test results decide which category is asked about first"""
+        assert DEFAULT_BANK.next_question(metrics, [], []).id == first
+
+    def test_answers_pick_branches(self):
+        """Test that parsed answers lead to follow-up questions within or across categories"""
+        assert DEFAULT_BANK.next_question(SLOW, [text("congestion_devices")], ["about 12"]).id == "congestion_heavy_use"
+        assert DEFAULT_BANK.next_question(SLOW, [text("congestion_devices")], ["two"]).id == "physical_other_devices"
+        asked = [text("congestion_devices"), text("physical_other_devices")]
+        assert DEFAULT_BANK.next_question(SLOW, asked, ["2", "no, just my laptop"]).id == "device_rejoin"
+
+    def test_answer_of_the_wrong_kind_does_not_branch(self):
+        """Test that a bare "no" to a when-question is not read as zero minutes"""
+        asked = [text("congestion_devices"), text("physical_other_devices"), text("router_last_restart")]
+        question = DEFAULT_BANK.next_question(SLOW, asked, ["2", "yes", "no"])
+        assert question.id != "router_changes"
+
+    def test_ethernet_skips_signal_questions(self):
+        """Test that wired connections are not asked about WiFi signal"""
+        metrics = NetworkMetrics(connected=True, speed_mbps=8.0, packet_loss_pct=4.0, connection_type="ethernet")
+        assert DEFAULT_BANK.next_question(metrics, [], []).category != "signal"
+
+    def test_exhausted_bank_closes(self):
+        """Test that once every category was asked the bank falls back to its closing question"""
+        asked = [q.text for q in DEFAULT_BANK.questions]
+        answers = ["not sure"] * len(asked)
+        assert DEFAULT_BANK.question_text(SLOW, asked, answers) == DEFAULT_BANK.closing
+
+    def test_load_bank_from_json(self, tmp_path):
+        """Test that a JSON bank loads with guards, branches and its version"""
+        path = tmp_path / "bank.json"
+        path.write_text(json.dumps({
+            "version": "test-1",
+            "questions": [
+                {"id": "a", "category": "router", "text": "When did you last restart your router?",
+                 "branches": [{"when": {"answer": [">=", 1440]}, "next": "b"}]},
+                {"id": "b", "category": "router", "text": "Is the router in a cupboard?", "entry": False},
+            ],
+            "orders": [{"when": {"connected": ["==", False]}, "categories": ["router"]}],
+        }))
+        bank = load_bank(str(path))
+        assert bank.version == "test-1"
+        assert bank.next_question(SLOW, ["When did you last restart your router?"], ["3 days ago"]).id == "b"
+
+    def test_invalid_bank_is_rejected(self):
+        """Test that branches to unknown questions and unknown categories are refused"""
+        with pytest.raises(ValueError):
+            QuestionBank("bad", (question_bank.Question("a", "router", "Q?", branches=(((), "missing"),)),))
+        with pytest.raises(ValueError):
+            QuestionBank("bad", (question_bank.Question("a", "weather", "Q?"),))
+
+
+class TestFastMode:
+
+    def test_fast_session_runs_without_llm(self, fake_llm):
+        """Test that a fast-mode conversation reaches its conclusion without a single LLM call"""
+        client = TestClient(app)
+        session_id = "fast_1"
+        client.post("/api/v1/chat", json={"message": "Zoom keeps freezing", "session_id": session_id, "fast_mode": True})
+        client.post("/api/v1/chat", json={
+            "message": "", "session_id": session_id,
+            "auto_test_results": {"connectivity": {"connected": True, "latency": 60}, "speed": {"speed": 8}},
+        })
+        for answer in ("12", "yes", "yes", "two days ago"):
+            response = client.post("/api/v1/chat", json={"message": answer, "session_id": session_id})
+        conclusion = client.post("/api/v1/chat", json={"message": "maybe", "session_id": session_id}).json()["message"]
+
+        assert fake_llm.chat.completions.calls == []
+        assert sessions.get(session_id).fast_mode is True
+        assert sessions.get(session_id).follow_up_questions[:2] == [text("congestion_devices"), text("congestion_heavy_use")]
+        assert conclusion.endswith("(Yes/No)")
+        assert response.status_code == 200
+
+    def test_fast_turn_is_sub_millisecond(self):
+        """Test that picking a question in fast mode stays well under a millisecond"""
+        service = TroubleshootService(llm=FakeLLM())
+        asked = [text("congestion_devices"), text("congestion_heavy_use")]
+
+        async def main():
+            times = []
+            for _ in range(200):
+                start = time.perf_counter()
+                await service.generate_next_question("Slow WiFi", SLOW, ["12", "yes"], 2, asked, fast=True)
+                times.append(time.perf_counter() - start)
+            return statistics.median(times)
+
+        assert asyncio.run(main()) < 0.001
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from dataclasses import replace
+from app.models.metrics import NetworkMetrics
+from app.services.response_cache import ResponseCache, canonical_issue, context_key, response_cache
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+RESULTS = NetworkMetrics(connected=True, speed_mbps=23.1, latency_ms=48.0, connection_type="wifi", device_type="desktop")
+
+
+class TestContextKey:
+
+    def test_equivalent_contexts_share_a_key(self):
+        """Test that wording, exact numbers and answer phrasing are normalized away"""
+        first = context_key("question", "WiFi is slow", RESULTS, ["Are other devices affected?"], ["yes"], 1)
+        second = context_key(
+            "question", "my wi-fi is really slow!",
+            replace(RESULTS, speed_mbps=19.7, latency_ms=41.0),
+            ["Are other devices affected?"], ["Yeah, all of them"], 1,
+        )
+        assert first == second
+
+    def test_different_buckets_differ(self):
+        """Test that materially different speed or answers produce different keys"""
+        base = context_key("question", "WiFi is slow", RESULTS, ["Are other devices affected?"], ["yes"], 1)
+        assert base != context_key("question", "WiFi is slow", replace(RESULTS, speed_mbps=150.0), ["Are other devices affected?"], ["yes"], 1)
+        assert base != context_key("question", "WiFi is slow", RESULTS, ["Are other devices affected?"], ["no"], 1)
+        assert canonical_issue("Internet keeps dropping") == canonical_issue("wifi drops")
+
+    def test_questions_are_part_of_the_key(self):
+        """Test that the same answer to a different question produces a different key"""
+        base = context_key("question", "WiFi is slow", RESULTS, ["Are other devices affected?"], ["yes"], 1)
+        assert base != context_key("question", "WiFi is slow", RESULTS, ["Have you restarted the router?"], ["yes"], 1)
+
+
+class TestResponseCache:
+
+    def test_lru_and_ttl(self, monkeypatch):
+        """Test LRU eviction and TTL expiry counters"""
+        import app.services.response_cache as module
+        now = [1000.0]
+        monkeypatch.setattr(module.time, "time", lambda: now[0])
+
+        cache = ResponseCache(max_entries=2, ttl=60)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+
+        now[0] += 61
+        assert cache.get("a") is None
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["expired"] == 1
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test that the SQLite tier serves entries to a fresh cache instance"""
+        path = str(tmp_path / "cache.db")
+        ResponseCache(max_entries=10, ttl=60, disk_path=path).set("k", "question")
+
+        restarted = ResponseCache(max_entries=10, ttl=60, disk_path=path)
+        assert restarted.get("k") == "question"
+        assert restarted.stats()["disk_hits"] == 1
+
+    def test_repeated_path_skips_llm(self):
+        """Test that a second session on the same normalized path is served from cache"""
+        response_cache.clear()
+        llm = FakeLLM("Is the router in the same room as your computer?")
+        service = TroubleshootService(llm=llm)
+        results = NetworkMetrics(connected=True, speed_mbps=12.0, latency_ms=60.0, connection_type="wifi")
+
+        asyncio.run(service.generate_next_question("WiFi is slow", results, [], 0, []))
+        calls = len(llm.chat.completions.calls)
+
+        start = time.perf_counter()
+        question = asyncio.run(service.generate_next_question("my wifi is slow", results, [], 0, []))
+        assert time.perf_counter() - start < 0.05
+        assert question == "Is the router in the same room as your computer?"
+        assert len(llm.chat.completions.calls) == calls
+
+    def test_conclusion_not_shared_across_measurements(self):
+        """Test that a cached conclusion is not served for a session with different exact numbers"""
+        from app.models.session import ChatSession
+        response_cache.clear()
+        llm = FakeLLM("Your speed is 12.0 Mbps.")
+        service = TroubleshootService(llm=llm)
+
+        first = ChatSession(issue_description="WiFi is slow", metrics=replace(RESULTS, speed_mbps=12.0))
+        asyncio.run(service.generate_conclusion(first))
+        asyncio.run(service.generate_conclusion(first))
+        assert len(llm.chat.completions.calls) == 1
+
+        second = ChatSession(issue_description="WiFi is slow", metrics=replace(RESULTS, speed_mbps=13.0))
+        asyncio.run(service.generate_conclusion(second))
+        assert len(llm.chat.completions.calls) == 2
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from app.models.metrics import NetworkMetrics
+from app.services import rules
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+
+def features(**overrides):
+    base = {name: None for name in rules.FEATURES}
+    base.update(overrides)
+    return base
+
+
+class TestRebootRules:
+
+    @pytest.mark.parametrize("overrides,rule,reboot", [
+        ({"connected": False}, "offline", True),
+        ({"connected": True, "speed_mbps": 2.0, "latency_ms": 40}, "very_slow", True),
+        ({"connected": True, "speed_mbps": 50, "latency_ms": 350}, "high_latency", True),
+        ({"connected": True, "speed_mbps": 2.0, "last_reboot_minutes": 20}, "rebooted_within_hour", False),
+        ({"connected": True, "speed_mbps": 80, "latency_ms": 30}, "healthy", False),
+    ])
+    def test_rule_fires_with_explanation(self, overrides, rule, reboot):
+        """Test that the first matching rule decides and explains itself"""
+        decision = rules.evaluate(features(**overrides))
+        assert decision.rule == rule
+        assert decision.reboot is reboot
+        assert decision.explanation
+
+    def test_uncovered_case_returns_none(self):
+        """Test that moderate metrics fall through to the LLM"""
+        assert rules.evaluate(features(connected=True, speed_mbps=12, latency_ms=120)) is None
+
+    def test_answers_become_features(self):
+        """Test that reboot timing and scope are read from the collected answers"""
+        result = rules.build_features(
+            NetworkMetrics(connected=True, speed_mbps=12.0, latency_ms=60.0),
+            ["When did you last restart your router?", "Are other devices affected too?"],
+            ["about 3 weeks ago", "no, only my laptop"],
+        )
+        assert result["last_reboot_minutes"] == 3 * 10080
+        assert result["other_devices_affected"] is False
+        assert rules.evaluate(result).rule == "stale_router"
+
+    def test_llm_only_for_uncovered_cases(self):
+        """Test that should_reboot_router uses the LLM only when no rule matches"""
+        llm = FakeLLM("YES")
+        service = TroubleshootService(llm=llm)
+
+        slow = NetworkMetrics(connected=True, speed_mbps=1.5, latency_ms=40.0)
+        decision = asyncio.run(service.should_reboot_router(slow, []))
+        assert (decision.rule, decision.source) == ("very_slow", "rules")
+        assert llm.chat.completions.calls == []
+
+        moderate = NetworkMetrics(connected=True, speed_mbps=12.0, latency_ms=120.0)
+        decision = asyncio.run(service.should_reboot_router(moderate, []))
+        assert decision.source == "llm" and decision.reboot is True
+        assert "Device Type: unknown" in str(llm.chat.completions.calls[0]["messages"])
+
+
+class TestBatchEvaluation:
+
+    def test_batch_matches_scalar(self):
+        """Test that vectorized evaluation agrees with row-by-row evaluation"""
+        rng = np.random.default_rng(7)
+        n = 2000
+        columns = {
+            "connected": rng.choice([1.0, 0.0, np.nan], n, p=[0.85, 0.1, 0.05]),
+            "speed_mbps": np.where(rng.random(n) < 0.05, np.nan, rng.gamma(2.0, 15.0, n)),
+            "latency_ms": rng.gamma(2.0, 50.0, n),
+            "last_reboot_minutes": np.where(rng.random(n) < 0.7, np.nan, rng.uniform(0, 20000, n)),
+        }
+        fired = rules.evaluate_batch(columns)
+
+        for i in range(n):
+            row = {k: (None if np.isnan(v[i]) else float(v[i])) for k, v in columns.items()}
+            if row["connected"] is not None:
+                row["connected"] = bool(row["connected"])
+            decision = rules.evaluate(features(**row))
+            expected = -1 if decision is None else [r.name for r in rules.DEFAULT_RULES].index(decision.rule)
+            assert fired[i] == expected
+
+    def test_rules_load_from_json(self, tmp_path):
+        """Test that a rule set can be swapped in from a JSON decision table"""
+        path = tmp_path / "rules.json"
+        path.write_text(json.dumps([
+            {"name": "slow_ethernet", "when": {"connection_type": ["in", ["ethernet"]], "speed_mbps": ["<", 50]},
+             "reboot": True, "explanation": "Wired and slow."},
+        ]))
+        custom = rules.load_rules(str(path))
+
+        decision = rules.evaluate(features(connection_type="ethernet", speed_mbps=20), custom)
+        assert decision.rule == "slow_ethernet"
+        fired = rules.evaluate_batch(
+            {"connection_type": np.array(["ethernet", "wifi", None], dtype=object), "speed_mbps": np.array([20.0, 20.0, 20.0])},
+            custom,
+        )
+        assert fired.tolist() == [0, -1, -1]
@@ -0,0 +1,51 @@
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import pytest
+
+BACKEND = pathlib.Path(__file__).parent.parent
+
+
+def import_in_fresh_interpreter(code: str) -> dict:
+    env = {**os.environ, "SERVERLESS": "true", "OPENAI_API_KEY": "sk-test"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestColdStart:
+
+    def test_startup_skips_heavy_imports(self):
+        """Test that importing the app loads neither the OpenAI SDK, httpx nor NumPy"""
+        loaded = import_in_fresh_interpreter(
+            "import json, sys\n"
+            "import app.main\n"
+            "from app.core.config import settings\n"
+            "print(json.dumps({'serverless': settings.serverless,"
+            " 'heavy': [m for m in ('openai', 'httpx', 'numpy') if m in sys.modules]}))"
+        )
+        assert loaded == {"serverless": True, "heavy": []}
+
+
+class TestLambdaHandler:
+
+    def test_invocations_reuse_app_and_loop(self):
+        """Test that the handler serves API Gateway events and keeps its event loop across invocations"""
+        pytest.importorskip("mangum")
+        result = import_in_fresh_interpreter(
+            "import asyncio, json\n"
+            "from app import serverless\n"
+            "def event(body):\n"
+            "    return {'version': '2.0', 'routeKey': '$default', 'rawPath': '/api/v1/chat', 'rawQueryString': '',\n"
+            "            'headers': {'content-type': 'application/json'}, 'body': json.dumps(body), 'isBase64Encoded': False,\n"
+            "            'requestContext': {'http': {'method': 'POST', 'path': '/api/v1/chat', 'sourceIp': '127.0.0.1',\n"
+            "                               'protocol': 'HTTP/1.1'}, 'stage': '$default'}}\n"
+            "first = serverless.handler(event({'message': 'slow', 'session_id': 'lambda_1'}), None)\n"
+            "loop = asyncio.get_event_loop()\n"
+            "second = serverless.handler(event({'message': '', 'session_id': 'lambda_2'}), None)\n"
+            "print(json.dumps({'status': [first['statusCode'], second['statusCode']],"
+            " 'same_loop': asyncio.get_event_loop() is loop and not loop.is_closed()}))"
+        )
+        assert result == {"status": [200, 200], "same_loop": True}
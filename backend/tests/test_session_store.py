@@ -0,0 +1,207 @@
+import pytest
+from app.models.schemas import AutoTestResults, ConversationState
+from app.models.session import ChatSession
+from app.services.session_store import InMemorySessionStore, SessionConflict, SQLiteSessionStore
+
+
+def make_session():
+    session = ChatSession()
+    session.state = ConversationState.FOLLOW_UP_QUESTIONS
+    session.issue_description = "My WiFi is slow"
+    session.auto_test_results = AutoTestResults(
+        connectivity={"connected": True, "latency": 45},
+        speed={"speed": 25.5},
+        connectionInfo={"type": "wifi"},
+        deviceType="desktop",
+    )
+    session.follow_up_questions = ["Is your router plugged in?"]
+    session.user_answers = ["Yes"]
+    session.current_question_index = 1
+    return session
+
+
+class TestSessionStores:
+
+    @pytest.fixture(params=["memory", "sqlite"])
+    def store(self, request, tmp_path):
+        if request.param == "memory":
+            store = InMemorySessionStore()
+        else:
+            store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+        yield store
+        store.close()
+
+    def test_round_trip(self, store):
+        """Test that a saved session comes back with the same state"""
+        store.save("s1", make_session())
+        loaded = store.get("s1")
+
+        assert loaded.state == ConversationState.FOLLOW_UP_QUESTIONS
+        assert loaded.issue_description == "My WiFi is slow"
+        assert loaded.auto_test_results.speed.speed == 25.5
+        assert loaded.follow_up_questions == ["Is your router plugged in?"]
+        assert loaded.user_answers == ["Yes"]
+        assert loaded.current_question_index == 1
+
+    def test_mapping_protocol(self, store):
+        """Test that the store can be used like the dict it replaces"""
+        store["s2"] = ChatSession()
+        assert "s2" in store
+        assert "missing" not in store
+        assert len(store) == 1
+        del store["s2"]
+        with pytest.raises(KeyError):
+            store["s2"]
+
+    def test_async_round_trip(self, store):
+        """Test that the async accessors used by the routes read and write the same sessions"""
+        import asyncio
+
+        async def main():
+            await store.asave("s6", make_session())
+            return await store.aget("s6")
+
+        assert asyncio.run(main()).user_answers == ["Yes"]
+        assert store.get("s6").user_answers == ["Yes"]
+
+    def test_sqlite_count_skips_expired(self, tmp_path, monkeypatch):
+        """Test that expired rows waiting to be purged are not counted as live sessions"""
+        import app.services.session_store as session_store
+        now = [1000.0]
+        monkeypatch.setattr(session_store.time, "time", lambda: now[0])
+
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+        store.save("old", ChatSession())
+        now[0] += 61
+        store.save("new", ChatSession())
+        assert len(store) == 1
+        store.close()
+
+    def test_sqlite_shared_between_workers(self, tmp_path):
+        """Test that two store instances on one file see each other's writes"""
+        path = str(tmp_path / "shared.db")
+        worker_a = SQLiteSessionStore(path)
+        worker_b = SQLiteSessionStore(path)
+
+        worker_a.save("s3", make_session())
+        assert worker_b.get("s3").user_answers == ["Yes"]
+
+        worker_a.close()
+        worker_b.close()
+
+    def test_sqlite_rejects_stale_writes(self, tmp_path):
+        """Test that a save based on an outdated copy is refused instead of overwriting a newer one"""
+        path = str(tmp_path / "shared.db")
+        worker_a = SQLiteSessionStore(path)
+        worker_b = SQLiteSessionStore(path)
+        worker_a.save("s4", make_session())
+
+        copy_a, copy_b = worker_a.get("s4"), worker_b.get("s4")
+        copy_a.user_answers.append("No")
+        worker_a.save("s4", copy_a)
+        copy_b.user_answers.append("Maybe")
+        with pytest.raises(SessionConflict):
+            worker_b.save("s4", copy_b)
+        with pytest.raises(SessionConflict):
+            worker_b.save("s4", make_session())
+
+        assert worker_b.get("s4").user_answers == ["Yes", "No"]
+        # The winner's copy tracks the new version and can keep saving
+        worker_a.save("s4", copy_a)
+
+        worker_a.close()
+        worker_b.close()
+
+    def test_conflicting_turn_returns_409(self, monkeypatch, fake_llm):
+        """Test that a turn whose save loses the race is reported as a conflict"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routes.chat import sessions
+
+        def conflict(session_id, session):
+            raise SessionConflict(session_id)
+
+        monkeypatch.setattr(sessions, "save", conflict)
+        response = TestClient(app).post("/api/v1/chat", json={"message": "Hello", "session_id": "conflict-1"})
+        assert response.status_code == 409
+
+    def test_sqlite_adds_version_to_old_tables(self, tmp_path):
+        """Test that a database created before versioned saves is upgraded in place"""
+        import sqlite3
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+        conn.close()
+
+        store = SQLiteSessionStore(path)
+        store.save("s5", make_session())
+        session = store.get("s5")
+        assert session.version == 1
+        store.save("s5", session)
+        assert store.get("s5").version == 2
+        store.close()
+
+
+class TestBoundedSessionCache:
+
+    def test_lru_eviction_by_entry_count(self):
+        """Test that the least recently used session is evicted first"""
+        store = InMemorySessionStore(max_entries=2)
+        store.save("a", ChatSession())
+        store.save("b", ChatSession())
+        store.get("a")  # "b" is now least recently used
+        store.save("c", ChatSession())
+
+        assert "a" in store and "c" in store
+        assert "b" not in store
+        assert store.stats()["evictions"]["max_entries"] == 1
+
+    def test_idle_sessions_expire(self, monkeypatch):
+        """Test that sessions idle beyond the TTL are dropped"""
+        import app.services.session_store as session_store
+        now = [1000.0]
+        monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+
+        store = InMemorySessionStore(ttl=60)
+        store.save("old", ChatSession())
+        now[0] += 61
+        store.save("new", ChatSession())
+
+        assert "old" not in store
+        assert "new" in store
+        assert store.stats()["evictions"]["expired"] == 1
+
+    def test_memory_ceiling(self):
+        """Test that sessions are evicted once approximate bytes exceed the ceiling"""
+        session = make_session()
+        store = InMemorySessionStore(max_bytes=int(session.approx_size() * 2.5))
+        for i in range(5):
+            store.save(f"s{i}", make_session())
+
+        stats = store.stats()
+        assert stats["sessions"] == 2
+        assert stats["approx_bytes"] <= stats["max_bytes"]
+        assert stats["evictions"]["max_bytes"] == 3
+
+    def test_session_is_compact_and_history_capped(self):
+        """Test that ChatSession has no __dict__ and bounds its history"""
+        from app.core.config import settings
+        session = ChatSession()
+        assert not hasattr(session, "__dict__")
+
+        for i in range(settings.session_history_limit + 5):
+            session.record_answer(i, "x" * (settings.session_max_answer_chars + 10))
+        assert len(session.user_answers) == settings.session_history_limit
+        assert all(len(a) == settings.session_max_answer_chars for a in session.user_answers)
+
+    def test_admin_endpoint_reports_stats(self):
+        """Test that the admin endpoint reports live sessions and bytes held"""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        client = TestClient(app)
+        client.post("/api/v1/chat", json={"message": "Hello", "session_id": "admin_stats"})
+
+        data = client.get("/api/v1/admin/sessions").json()
+        assert data["sessions"] >= 1
+        assert data["approx_bytes"] > 0
+        assert "evictions" in data
@@ -0,0 +1,52 @@
+import asyncio
+import time
+from app.services import speculation
+from app.services.troubleshoot import TroubleshootService
+from conftest import FakeLLM
+
+QUESTION = "Could you describe what the lights on your router are doing?"
+NEXT = "How many devices are connected to your network?"
+
+
+def make_service(validation_reply, delay=0.2):
+    def reply(kwargs):
+        return validation_reply if "YES or NO" in str(kwargs["messages"]) else NEXT
+    return TroubleshootService(llm=FakeLLM(reply, delay=delay))
+
+
+class TestSpeculativeValidation:
+
+    def test_overlap_saves_latency(self):
+        """Test that validation and generation run concurrently when the answer is valid"""
+        service = make_service("YES")
+        before = speculation.stats.snapshot()
+
+        start = time.perf_counter()
+        # "blinking" is too short for the local classifier, so the LLM validates it
+        question = asyncio.run(service.generate_next_question("WiFi slow", None, ["blinking"], 0, [QUESTION]))
+        elapsed = time.perf_counter() - start
+
+        assert question == NEXT
+        assert elapsed < 0.35  # two serial 0.2s calls would take 0.4s
+        after = speculation.stats.snapshot()
+        assert after["speculated"] == before["speculated"] + 1
+        assert after["saved_seconds_total"] > before["saved_seconds_total"]
+
+    def test_rejected_answer_discards_question(self):
+        """Test that a rejected answer re-asks the question and counts wasted work"""
+        service = make_service("NO")
+        before = speculation.stats.snapshot()
+
+        question = asyncio.run(service.generate_next_question("WiFi slow", None, ["blinking"], 0, [QUESTION]))
+
+        assert question == QUESTION
+        assert speculation.stats.snapshot()["wasted"] == before["wasted"] + 1
+
+    def test_streaming_buffers_until_validated(self):
+        """Test that streamed tokens are only released after validation passes"""
+        service = make_service("YES")
+
+        async def collect():
+            return "".join([t async for t in service.stream_next_question("WiFi slow", None, ["blinking"], 0, [QUESTION])])
+
+        assert asyncio.run(collect()).strip() == NEXT
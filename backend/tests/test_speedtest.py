@@ -0,0 +1,74 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import speedtest
+from app.services.speedtest import SQLiteSpeedTestRegistry, payload_chunks
+
+
+class TestPayload:
+
+    def test_chunks_are_views_of_one_buffer(self):
+        """Test that download chunks share the preallocated buffer instead of copying it"""
+        size = len(speedtest.payload_buffer()) * 2 + 123
+        chunks = list(payload_chunks(size, chunk_size=64 * 1024))
+        assert sum(len(c) for c in chunks) == size
+        assert all(isinstance(c, memoryview) and c.obj is speedtest.payload_buffer() for c in chunks)
+
+
+class TestSpeedTestRoutes:
+
+    def test_download_streams_requested_size(self):
+        """Test that a download returns exactly the requested number of bytes"""
+        client = TestClient(app)
+        response = client.get("/api/v1/speedtest/download", params={"size": 1_000_000})
+        assert response.status_code == 200
+        assert response.headers["content-length"] == "1000000"
+        assert response.headers["cache-control"] == "no-store"
+        assert response.content == speedtest.payload_buffer()[:1_000_000]
+
+    def test_upload_is_counted(self):
+        """Test that an upload is drained and its size and timing reported"""
+        client = TestClient(app)
+        response = client.post("/api/v1/speedtest/upload", content=b"x" * 3_000_000)
+        data = response.json()
+        assert data["bytes"] == 3_000_000
+        assert data["complete"] and data["seconds"] >= 0
+
+    def test_parallel_streams_are_aggregated(self):
+        """Test that streams sharing a test id are summed over their combined span"""
+        client = TestClient(app)
+        for stream in ("0", "1", "2"):
+            client.get("/api/v1/speedtest/download", params={"size": 500_000, "test_id": "t1", "stream": stream})
+        client.post("/api/v1/speedtest/upload", params={"test_id": "t1"}, content=b"x" * 200_000)
+
+        summary = client.get("/api/v1/speedtest/t1").json()
+        assert summary["download"]["streams"] == 3
+        assert summary["download"]["bytes"] == 1_500_000
+        assert summary["download"]["complete"]
+        assert summary["upload"]["bytes"] == 200_000
+        assert len(summary["streams"]) == 4
+
+    def test_limits(self):
+        """Test that oversized downloads are rejected and unknown tests are 404"""
+        client = TestClient(app)
+        too_big = speedtest.settings.speedtest_max_bytes + 1
+        assert client.get("/api/v1/speedtest/download", params={"size": too_big}).status_code == 422
+        assert client.get("/api/v1/speedtest/missing").status_code == 404
+
+
+class TestSharedRegistry:
+
+    def test_streams_on_different_workers_are_aggregated(self, tmp_path):
+        """Test that streams timed by separate processes share one summary through SQLite"""
+        path = str(tmp_path / "sessions.db")
+        workers = [SQLiteSpeedTestRegistry(path, ttl=60), SQLiteSpeedTestRegistry(path, ttl=60)]
+        for stream, worker in enumerate(workers):
+            timing = worker.stream("t2", str(stream), "download")
+            timing.start()
+            timing.bytes += 1000
+            timing.finish()
+
+        summary = workers[0].get("t2").summary("download")
+        assert summary["streams"] == 2
+        assert summary["bytes"] == 2000
+        assert summary["complete"]
+        assert workers[1].get("unknown") is None
@@ -0,0 +1,58 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routes.chat import sessions, ConversationState
+
+
+def parse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.split("\n\n"):
+        lines = [line for line in block.splitlines() if not line.startswith(":")]
+        if not lines:
+            continue
+        event = lines[0].removeprefix("event: ")
+        data = json.loads(lines[1].removeprefix("data: "))
+        events.append((event, data))
+    return events
+
+
+class TestChatStreaming:
+
+    @pytest.fixture
+    def client(self):
+        return TestClient(app)
+
+    def test_stream_emits_tokens_then_done(self, client, fake_llm):
+        """Test that a streamed turn sends token events followed by a done event"""
+        session_id = "stream_session_1"
+        client.post("/api/v1/chat/stream", json={"message": "My WiFi is slow", "session_id": session_id})
+
+        response = client.post("/api/v1/chat/stream", json={
+            "message": "",
+            "session_id": session_id,
+            "auto_test_results": {"connectivity": {"connected": True}, "speed": {"speed": 25.5}},
+        })
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = parse_events(response.text)
+        tokens = [data["text"] for event, data in events if event == "token"]
+        assert len(tokens) > 2
+        event, done = events[-1]
+        assert event == "done"
+        assert done["state"] == ConversationState.FOLLOW_UP_QUESTIONS.value
+        assert done["is_conversation_ended"] is False
+        assert done["message"] == "".join(tokens).strip()
+
+    def test_session_committed_only_after_stream(self, client, fake_llm):
+        """Test that a failed stream leaves the stored session untouched"""
+        session_id = "stream_session_2"
+        client.post("/api/v1/chat", json={"message": "WiFi drops", "session_id": session_id})
+
+        async def broken(**kwargs):
+            raise RuntimeError("provider down")
+        fake_llm.chat.completions.create = broken
+
+        response = client.post("/api/v1/chat/stream", json={"message": "", "session_id": session_id})
+        assert parse_events(response.text)[-1][0] == "error"
+        assert sessions[session_id].state == ConversationState.RUN_AUTO_TESTS
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import telemetry
+from app.services.telemetry import Registry
+from app.services.troubleshoot import TroubleshootService
+
+
+class TestRegistry:
+
+    def test_histogram_renders_cumulative_buckets(self):
+        """Test that histogram buckets are cumulative and end with +Inf, sum and count"""
+        registry = Registry()
+        h = registry.histogram("demo_seconds", "Demo.", ("site",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            h.observe(value, "a")
+        text = registry.render()
+        assert 'demo_seconds_bucket{site="a",le="0.1"} 1' in text
+        assert 'demo_seconds_bucket{site="a",le="1"} 3' in text
+        assert 'demo_seconds_bucket{site="a",le="+Inf"} 4' in text
+        assert 'demo_seconds_count{site="a"} 4' in text
+        assert 'demo_seconds_sum{site="a"} 4.25' in text
+
+    def test_label_values_are_escaped(self):
+        """Test that quotes, backslashes and newlines in label values are escaped"""
+        registry = Registry()
+        registry.counter("demo_total", "Demo.", ("v",)).inc('a"b\\c\nd')
+        assert 'demo_total{v="a\\"b\\\\c\\nd"} 1' in registry.render()
+
+    def test_collected_values_are_read_at_scrape_time(self):
+        """Test that a metric backed by a function reports its current value"""
+        registry = Registry()
+        state = {"n": 1}
+        registry.gauge("demo_items", "Demo.", collect=lambda: {(): state["n"]})
+        state["n"] = 7
+        assert "demo_items 7" in registry.render()
+
+    def test_observe_is_cheap(self):
+        """Test that recording stays in the microsecond range on the hot path"""
+        h = Registry().histogram("demo_seconds", "Demo.", ("site",))
+        start = time.perf_counter()
+        for i in range(100_000):
+            h.observe(i / 100_000, "question")
+        assert time.perf_counter() - start < 1.0
+
+
+class TestInstrumentation:
+
+    def test_chat_turn_and_llm_call_are_recorded(self, fake_llm):
+        """Test that a chat turn is timed by state and its LLM call by call site"""
+        turns = telemetry.chat_turn_seconds.snapshot("chat", "run_auto_tests")["count"]
+        calls = telemetry.llm_calls.values().get(("question", "ok"), 0)
+        client = TestClient(app)
+        client.post("/api/v1/chat", json={"message": "My WiFi is slow", "session_id": "telemetry_1"})
+        client.post("/api/v1/chat", json={
+            "message": "", "session_id": "telemetry_1",
+            "auto_test_results": {"connectivity": {"connected": True}, "speed": {"speed": 8}},
+        })
+        assert telemetry.chat_turn_seconds.snapshot("chat", "run_auto_tests")["count"] == turns + 1
+        assert telemetry.llm_calls.values()[("question", "ok")] == calls + 1
+
+        text = client.get("/metrics").text
+        assert 'wifi_chat_turn_seconds_count{endpoint="chat",state="greeting"}' in text
+        assert 'wifi_llm_tokens_total{call_site="question",kind="prompt"}' in text
+        assert "wifi_active_sessions " in text
+
+    def test_llm_timeouts_are_counted(self):
+        """Test that a timed-out LLM call is counted as a timeout, not a generic error"""
+        class TimingOut:
+            async def create(self, **kwargs):
+                raise TimeoutError()
+
+        service = TroubleshootService(llm=type("LLM", (), {"chat": type("Chat", (), {"completions": TimingOut()})()})())
+        before = telemetry.llm_calls.values().get(("validation", "timeout"), 0)
+        # Validation fails open, so the turn goes on
+        assert asyncio.run(service._validate_with_llm("maybe", "Is the router on?")) is True
+        assert telemetry.llm_calls.values()[("validation", "timeout")] == before + 1
@@ -1,5 +1,5 @@
 import { useState, useCallback, useEffect } from 'react';
-import { sendChatMessage } from '../services/api';
+import { streamChatMessage } from '../services/api';
 import { WiFiTester } from '../services/wifiTesting';
 
 export const useWifiBot = () => {
@@ -21,19 +21,43 @@ export const useWifiBot = () => {
         }]);
     }, []);
 
+    // Stream a bot reply into a single message that grows as tokens arrive
+    const streamReply = useCallback(async (message, autoTestResults) => {
+        let started = false;
+        const response = await streamChatMessage(message, sessionId, autoTestResults, (token) => {
+            if (!started) {
+                started = true;
+                addMessage(token);
+                return;
+            }
+            setMessages(prev => {
+                const last = prev[prev.length - 1];
+                return [...prev.slice(0, -1), { ...last, content: last.content + token }];
+            });
+        });
+        // Replace the streamed text with the final message as sent by the server
+        if (response.message) {
+            if (started) {
+                setMessages(prev => [...prev.slice(0, -1), { ...prev[prev.length - 1], content: response.message }]);
+            } else {
+                addMessage(response.message);
+            }
+        }
+        return response;
+    }, [sessionId, addMessage]);
+
     // Automatically run test and send results after greeting
     useEffect(() => {
         if (messages.length === 1 && messages[0].isUser && !conversationEnded) {
             (async () => {
                 setIsTesting(true);
-                const autoData = await wifiTester.gatherAutomaticData();
+                const autoData = await wifiTester.gatherAutomaticData(sessionId);
                 const autoTestResults = wifiTester.formatAutoTestResults(autoData);
                 setIsTesting(false);
                 // Send empty message, but with autoTestResults
                 setIsLoading(true);
                 try {
-                    const response = await sendChatMessage("", sessionId, autoTestResults);
-                    if (response.message) addMessage(response.message);
+                    const response = await streamReply("", autoTestResults);
                     if (response.next_question && !response.is_conversation_ended) {
                         setPendingQuestion(response.next_question);
                     } else {
@@ -47,7 +71,7 @@ export const useWifiBot = () => {
                 }
             })();
         }
-    }, [messages, conversationEnded, sessionId, addMessage]);
+    }, [messages, conversationEnded, streamReply, sessionId]);
 
     const sendMessage = useCallback(async (message) => {
         if (!message.trim() || conversationEnded) return;
@@ -63,12 +87,11 @@ export const useWifiBot = () => {
             // On first message, run tests
             if (messages.length === 0) {
                 setIsTesting(true);
-                const autoData = await wifiTester.gatherAutomaticData();
+                const autoData = await wifiTester.gatherAutomaticData(sessionId);
                 autoTestResults = wifiTester.formatAutoTestResults(autoData);
                 setIsTesting(false);
             }
-            const response = await sendChatMessage(message, sessionId, autoTestResults);
-            if (response.message) addMessage(response.message);
+            const response = await streamReply(message, autoTestResults);
             if (response.next_question && !response.is_conversation_ended) {
                 setPendingQuestion(response.next_question);
             } else {
@@ -80,7 +103,7 @@ export const useWifiBot = () => {
         } finally {
             setIsLoading(false);
         }
-    }, [messages.length, sessionId, addMessage, conversationEnded]);
+    }, [messages.length, addMessage, streamReply, conversationEnded, sessionId]);
 
     // Show pending question as soon as it is set
     useEffect(() => {
@@ -14,4 +14,52 @@ export const sendChatMessage = async (message, sessionId, autoTestResults = null
   });
   
   return response.json();
-};
\ No newline at end of file
+};
+
+// Streams a chat turn over server-sent events. `onToken` receives text as it
+// arrives; the promise resolves with the final `done` payload
+// ({ message, is_conversation_ended, state, ... }).
+export const streamChatMessage = async (message, sessionId, autoTestResults = null, onToken = () => {}) => {
+  const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'Accept': 'text/event-stream',
+    },
+    body: JSON.stringify({
+      message: message,
+      session_id: sessionId,
+      auto_test_results: autoTestResults
+    }),
+  });
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === 'token') onToken(payload.text);
+      else if (event === 'done') return payload;
+      else if (event === 'error') throw new Error(payload.detail);
+    }
+  }
+  throw new Error('Stream ended before the response completed');
+};
@@ -1,3 +1,18 @@
+const API_BASE_URL = '/api/v1';
+const SPEED_TEST_STREAMS = 4;
+const DOWNLOAD_BYTES_PER_STREAM = 8 * 1024 * 1024;
+const UPLOAD_BYTES_PER_STREAM = 2 * 1024 * 1024;
+const PROBE_TIMEOUT_MS = 10000;
+const LATENCY_PINGS = 10;
+const THROUGHPUT_WINDOW_MS = 100;
+
+const sum = values => values.reduce((total, value) => total + value, 0);
+
+const toMbps = (bytes, ms) => parseFloat(((bytes * 8) / (ms / 1000) / 1e6).toFixed(2));
+
+const newTestId = () =>
+    (globalThis.crypto?.randomUUID?.() ?? `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
+
 
 export class WiFiTester {
     async testConnectivity() {
@@ -25,25 +40,51 @@ export class WiFiTester {
         }
     }
 
+    // Parallel download then upload against the backend's speed test endpoints.
+    // Several streams are needed to fill fast links; the backend times each
+    // stream too, so its summary is returned alongside the browser's numbers.
     async measureSpeed() {
+        const testId = newTestId();
         try {
-            // Use httpbin.org bytes endpoint which allows CORS
-            const imageUrl = 'https://httpbin.org/bytes/50000'; 
-            const fileSizeBytes = 50000;
-
-            const startTime = Date.now();
-            const response = await fetch(imageUrl);
-            await response.blob();
-            const endTime = Date.now();
+            const started = performance.now();
+            let firstByteMs = null;
+            // Throughput of all streams together over consecutive short windows
+            const throughput = { throughput_mbps: [], throughput_at: [] };
+            let windowStart = started;
+            let windowBytes = 0;
+            const onBytes = (bytes) => {
+                windowBytes += bytes;
+                const now = performance.now();
+                if (now - windowStart >= THROUGHPUT_WINDOW_MS) {
+                    throughput.throughput_mbps.push(toMbps(windowBytes, now - windowStart));
+                    throughput.throughput_at.push(Math.round(now - started));
+                    windowStart = now;
+                    windowBytes = 0;
+                }
+            };
+            const received = await Promise.all(
+                Array.from({ length: SPEED_TEST_STREAMS }, (_, stream) =>
+                    this.downloadStream(testId, stream, () => {
+                        if (firstByteMs === null) firstByteMs = performance.now() - started;
+                    }, onBytes)
+                )
+            );
+            const downloadMs = performance.now() - started;
 
-            const durationMs = endTime - startTime;
-            const durationSeconds = durationMs / 1000;
-            const speedBps = fileSizeBytes / durationSeconds;
-            const speedMbps = (speedBps * 8) / (1024 * 1024);
+            const upload = await this.measureUpload(testId);
+            const server = await fetch(`${API_BASE_URL}/speedtest/${testId}`)
+                .then(response => (response.ok ? response.json() : null))
+                .catch(() => null);
 
             return {
-                speed: parseFloat(speedMbps.toFixed(2)),
-                latency: durationMs,
+                speed: toMbps(sum(received), downloadMs),
+                latency: Math.round(firstByteMs ?? downloadMs),
+                uploadSpeed: upload,
+                streams: SPEED_TEST_STREAMS,
+                bytes: sum(received),
+                serverDownloadSpeed: server?.download?.mbps ?? null,
+                serverUploadSpeed: server?.upload?.mbps ?? null,
+                samples: throughput,
                 timestamp: new Date().toISOString()
             };
         } catch (error) {
@@ -57,7 +98,90 @@ export class WiFiTester {
         }
     }
 
-    async gatherAutomaticData() {
+    async downloadStream(testId, stream, onFirstByte, onBytes = () => {}) {
+        const params = new URLSearchParams({ size: DOWNLOAD_BYTES_PER_STREAM, test_id: testId, stream });
+        const response = await fetch(`${API_BASE_URL}/speedtest/download?${params}`, { cache: 'no-store' });
+        onFirstByte();
+        if (!response.body) {
+            const bytes = (await response.arrayBuffer()).byteLength;
+            onBytes(bytes);
+            return bytes;
+        }
+        // Count bytes as they arrive rather than buffering the whole payload
+        const reader = response.body.getReader();
+        let bytes = 0;
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) return bytes;
+            bytes += value.byteLength;
+            onBytes(value.byteLength);
+        }
+    }
+
+    // Repeated one-byte requests, so a single slow round trip can't decide the latency
+    async measureLatencySamples() {
+        const samples = { latency_ms: [], latency_at: [] };
+        const origin = performance.now();
+        for (let i = 0; i < LATENCY_PINGS; i++) {
+            const start = performance.now();
+            try {
+                await fetch(`${API_BASE_URL}/speedtest/download?size=1`, { cache: 'no-store' });
+            } catch (error) {
+                continue;
+            }
+            samples.latency_ms.push(parseFloat((performance.now() - start).toFixed(2)));
+            samples.latency_at.push(Math.round(start - origin));
+        }
+        return samples;
+    }
+
+    async measureUpload(testId) {
+        try {
+            // One zero-filled buffer reused as the body of every stream
+            const payload = new Uint8Array(UPLOAD_BYTES_PER_STREAM);
+            const started = performance.now();
+            await Promise.all(
+                Array.from({ length: SPEED_TEST_STREAMS }, (_, stream) => {
+                    const params = new URLSearchParams({ test_id: testId, stream });
+                    return fetch(`${API_BASE_URL}/speedtest/upload?${params}`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/octet-stream' },
+                        body: payload
+                    });
+                })
+            );
+            return toMbps(payload.byteLength * SPEED_TEST_STREAMS, performance.now() - started);
+        } catch (error) {
+            console.error('Upload test failed:', error);
+            return null;
+        }
+    }
+
+    // Echo the backend's sequenced probe frames over a WebSocket; the server
+    // measures RTT percentiles, jitter and loss, stores them on the session
+    // and sends them back in a final `result` message.
+    runProbe(sessionId) {
+        return new Promise((resolve) => {
+            const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+            const socket = new WebSocket(`${scheme}://${window.location.host}${API_BASE_URL}/probe/${encodeURIComponent(sessionId)}`);
+            socket.binaryType = 'arraybuffer';
+            const timer = setTimeout(() => { socket.close(); resolve(null); }, PROBE_TIMEOUT_MS);
+            const finish = (result) => { clearTimeout(timer); resolve(result); };
+
+            socket.onmessage = (event) => {
+                if (typeof event.data === 'string') {
+                    const { type, ...result } = JSON.parse(event.data);
+                    if (type === 'result') finish(result);
+                } else {
+                    socket.send(event.data);
+                }
+            };
+            socket.onerror = () => finish(null);
+            socket.onclose = () => finish(null);
+        });
+    }
+
+    async gatherAutomaticData(sessionId = null) {
         console.log('Starting automatic WiFi tests...');
         const data = {};
 
@@ -65,9 +189,20 @@ export class WiFiTester {
         data.connectivity = await this.testConnectivity();
         console.log('Connectivity result:', data.connectivity);
 
+        if (sessionId && typeof WebSocket !== 'undefined') {
+            console.log('Probing round-trip times...');
+            const probe = await this.runProbe(sessionId);
+            if (probe) {
+                data.connectivity = { ...data.connectivity, probe, packetLoss: probe.loss_pct };
+            }
+            console.log('Probe result:', probe);
+        }
+
         if (data.connectivity.connected) {
             console.log('Testing speed...');
-            data.speed = await this.measureSpeed();
+            const { samples: throughput, ...speed } = await this.measureSpeed();
+            data.speed = speed;
+            data.samples = { ...(await this.measureLatencySamples()), ...throughput };
             console.log('Speed result:', data.speed);
         }
 
@@ -92,6 +227,7 @@ export class WiFiTester {
             speed: autoData.speed || { speed: 0, latency: 0 },
             connectionInfo: autoData.connectionInfo || { type: 'unknown' },
             deviceType: autoData.deviceType || 'unknown',
+            samples: autoData.samples,
             test_timestamp: new Date().toISOString()
         };
     }